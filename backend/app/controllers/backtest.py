@@ -1,10 +1,13 @@
 """
 Backtesting API endpoints
 """
+import asyncio
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
 from app.services.backtesting_service import BacktestingEngine
+from app.services.expressions import ExpressionError
+from app.services.upstream import UpstreamTimeoutError, run_upstream
 
 router = APIRouter(prefix="/api/backtest", tags=["backtest"])
 
@@ -13,7 +16,7 @@ class BacktestRequest(BaseModel):
     symbol: str
     start_date: str  # YYYY-MM-DD
     end_date: str    # YYYY-MM-DD
-    strategy: str    # "rsi", "sma_crossover"
+    strategy: str    # "rsi", "sma_crossover", "expression"
     initial_capital: float = 100000
     
     # Optional parameters for strategies
@@ -21,6 +24,7 @@ class BacktestRequest(BaseModel):
     rsi_overbought: Optional[int] = 70
     sma_fast: Optional[int] = 50
     sma_slow: Optional[int] = 200
+    signal: Optional[str] = None  # expression strategy: hold while true, e.g. "ema(close,12) > ema(close,26)"
 
 
 @router.post("/run")
@@ -28,7 +32,8 @@ async def run_backtest(request: BacktestRequest):
     """Run a backtest with specified strategy"""
     try:
         if request.strategy == "rsi":
-            result = BacktestingEngine.backtest_rsi_strategy(
+            result = await run_upstream(
+                BacktestingEngine.backtest_rsi_strategy,
                 request.symbol,
                 request.start_date,
                 request.end_date,
@@ -37,7 +42,8 @@ async def run_backtest(request: BacktestRequest):
                 request.initial_capital
             )
         elif request.strategy == "sma_crossover":
-            result = BacktestingEngine.backtest_sma_crossover(
+            result = await run_upstream(
+                BacktestingEngine.backtest_sma_crossover,
                 request.symbol,
                 request.start_date,
                 request.end_date,
@@ -45,6 +51,20 @@ async def run_backtest(request: BacktestRequest):
                 request.sma_slow or 200,
                 request.initial_capital
             )
+        elif request.strategy == "expression":
+            if not request.signal:
+                raise HTTPException(status_code=400, detail="The expression strategy needs a signal")
+            try:
+                result = await run_upstream(
+                    BacktestingEngine.backtest_expression,
+                    request.symbol,
+                    request.start_date,
+                    request.end_date,
+                    request.signal,
+                    request.initial_capital
+                )
+            except ExpressionError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         else:
             raise HTTPException(status_code=400, detail=f"Unknown strategy: {request.strategy}")
         
@@ -56,6 +76,8 @@ async def run_backtest(request: BacktestRequest):
         }
     except HTTPException:
         raise
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -71,7 +93,8 @@ async def backtest_rsi(
 ):
     """Backtest RSI strategy"""
     try:
-        result = BacktestingEngine.backtest_rsi_strategy(
+        result = await run_upstream(
+            BacktestingEngine.backtest_rsi_strategy,
             symbol, start_date, end_date,
             rsi_oversold, rsi_overbought,
             initial_capital
@@ -86,6 +109,8 @@ async def backtest_rsi(
             },
             "result": result.to_dict()
         }
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -101,7 +126,8 @@ async def backtest_sma(
 ):
     """Backtest SMA crossover strategy"""
     try:
-        result = BacktestingEngine.backtest_sma_crossover(
+        result = await run_upstream(
+            BacktestingEngine.backtest_sma_crossover,
             symbol, start_date, end_date,
             fast_period, slow_period,
             initial_capital
@@ -116,6 +142,8 @@ async def backtest_sma(
             },
             "result": result.to_dict()
         }
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -128,8 +156,10 @@ async def compare_strategies(
 ):
     """Compare multiple strategies on same stock"""
     try:
-        rsi_result = BacktestingEngine.backtest_rsi_strategy(symbol, start_date, end_date)
-        sma_result = BacktestingEngine.backtest_sma_crossover(symbol, start_date, end_date)
+        rsi_result, sma_result = await asyncio.gather(
+            run_upstream(BacktestingEngine.backtest_rsi_strategy, symbol, start_date, end_date),
+            run_upstream(BacktestingEngine.backtest_sma_crossover, symbol, start_date, end_date)
+        )
         
         return {
             "symbol": symbol,
@@ -145,5 +175,7 @@ async def compare_strategies(
                 }
             }
         }
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,18 +1,26 @@
 """
 Advanced Charting API endpoints
 """
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from typing import List, Optional
 from app.services.charting_service import ChartingService
+from app.services.etags import conditional_get
+from app.services.periods import parse_since
+from app.services.serialization import FORMATS, count
+from app.services.upstream import UpstreamTimeoutError, run_upstream
 
 router = APIRouter(prefix="/api/charting", tags=["charting"])
 
 
 @router.get("/candlesticks/{symbol}")
 async def get_candlesticks(
+    request: Request,
+    response: Response,
     symbol: str,
     period: str = Query("1mo", description="Time period"),
-    interval: str = Query("1d", description="Data interval")
+    interval: str = Query("1d", description="Data interval"),
+    format: str = Query("rows", description="Response layout: rows or columnar"),
+    since: Optional[str] = Query(None, description="Client's last candle time; only it and newer candles are returned")
 ):
     """Get candlestick data for charting"""
     try:
@@ -22,88 +30,154 @@ async def get_candlesticks(
         valid_periods = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"]
         if period not in valid_periods:
             raise ValueError(f"Invalid period: {period}")
+        if format not in FORMATS:
+            raise ValueError(f"Invalid format: {format}")
+        try:
+            since_ts = parse_since(since) if since else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        data = ChartingService.get_candlestick_data(symbol, period)
+        not_modified = await conditional_get(request, response, symbol, period)
+        if not_modified:
+            return not_modified
         
-        if not data:
+        data = await run_upstream(ChartingService.get_candlestick_data, symbol, period, format, since_ts)
+        
+        # An empty delta just means nothing newer than the client's candle
+        if not count(data) and since_ts is None:
             raise HTTPException(status_code=404, detail=f"No data found for {symbol}")
         
-        return {"symbol": symbol, "data": data, "count": len(data)}
+        return {"symbol": symbol, "data": data, "count": count(data)}
     except HTTPException:
         raise
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         print(f"Error in get_candlesticks: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching candlestick data: {str(e)}")
 
 
 @router.get("/heikin-ashi/{symbol}")
-async def get_heikin_ashi(symbol: str, period: str = Query("1mo")):
+async def get_heikin_ashi(
+    request: Request,
+    response: Response,
+    symbol: str,
+    period: str = Query("1mo"),
+    format: str = Query("rows", description="Response layout: rows or columnar"),
+    since: Optional[str] = Query(None, description="Client's last candle time; only it and newer candles are returned")
+):
     """Get Heikin Ashi candlesticks"""
     try:
-        data = ChartingService.get_heikin_ashi(symbol, period)
+        if format not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid format: {format}")
+        try:
+            since_ts = parse_since(since) if since else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        not_modified = await conditional_get(request, response, symbol, period)
+        if not_modified:
+            return not_modified
+        data = await run_upstream(ChartingService.get_heikin_ashi, symbol, period, format, since_ts)
         return {"symbol": symbol, "data": data}
+    except HTTPException:
+        raise
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/compare")
-async def compare_stocks(symbols: List[str]):
+async def compare_stocks(
+    symbols: List[str],
+    format: str = Query("rows", description="Response layout: rows or columnar")
+):
     """Compare multiple stocks on same chart"""
     try:
         if len(symbols) < 2:
             raise HTTPException(status_code=400, detail="Need at least 2 symbols")
         if len(symbols) > 5:
             raise HTTPException(status_code=400, detail="Maximum 5 symbols allowed")
+        if format not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid format: {format}")
         
-        data = ChartingService.compare_stocks(symbols)
+        data = await run_upstream(ChartingService.compare_stocks, symbols, format=format)
         return {"symbols": symbols, "data": data}
+    except HTTPException:
+        raise
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/fibonacci/{symbol}")
-async def get_fibonacci(symbol: str, period: str = Query("1mo")):
+async def get_fibonacci(request: Request, response: Response, symbol: str, period: str = Query("1mo")):
     """Get Fibonacci retracement levels"""
     try:
-        levels = ChartingService.get_fibonacci_levels(symbol, period)
+        not_modified = await conditional_get(request, response, symbol, period)
+        if not_modified:
+            return not_modified
+        levels = await run_upstream(ChartingService.get_fibonacci_levels, symbol, period)
         return {"symbol": symbol, "levels": levels}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/pivot-points/{symbol}")
-async def get_pivot_points(symbol: str):
+async def get_pivot_points(request: Request, response: Response, symbol: str):
     """Get daily pivot points"""
     try:
-        points = ChartingService.get_pivot_points(symbol)
+        not_modified = await conditional_get(request, response, symbol, "1d")
+        if not_modified:
+            return not_modified
+        points = await run_upstream(ChartingService.get_pivot_points, symbol)
         return {"symbol": symbol, "points": points}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/support-resistance/{symbol}")
 async def get_support_resistance(
+    request: Request,
+    response: Response,
     symbol: str,
     period: str = Query("1mo"),
     num_levels: int = Query(3, ge=1, le=5)
 ):
     """Get support and resistance levels"""
     try:
-        levels = ChartingService.get_support_resistance(symbol, period, num_levels)
+        not_modified = await conditional_get(request, response, symbol, period)
+        if not_modified:
+            return not_modified
+        levels = await run_upstream(ChartingService.get_support_resistance, symbol, period, num_levels)
         return {"symbol": symbol, "levels": levels}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/channels/{symbol}")
 async def get_channels(
+    request: Request,
+    response: Response,
     symbol: str,
     period: str = Query("1mo"),
     window: int = Query(20, ge=5, le=50)
 ):
     """Get Donchian channels"""
     try:
-        channels = ChartingService.calculate_channels(symbol, period, window)
+        not_modified = await conditional_get(request, response, symbol, period)
+        if not_modified:
+            return not_modified
+        channels = await run_upstream(ChartingService.calculate_channels, symbol, period, window)
         return {"symbol": symbol, "channels": channels}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,74 +1,144 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from app.services.indicator_service import IndicatorService
-from app.services.data_service import DataService
+from app.services.etags import conditional_get
+from app.services.expressions import ExpressionError
+from app.services.indicator_cache import indicator_cache
+from app.services.indicator_store import indicator_store
+from app.services.request_frames import RequestFrames
+from app.services.serialization import epoch_seconds
+from app.services.upstream import run_upstream
 from typing import List, Optional
 
 router = APIRouter()
 indicator_service = IndicatorService()
-data_service = DataService()
+
+@router.get("/cache/stats")
+async def get_indicator_cache_stats():
+    """Hit, miss and extension counters of the shared indicator cache"""
+    return indicator_cache.stats()
 
 @router.get("/{symbol}")
 async def get_indicators(
+    request: Request,
+    response: Response,
     symbol: str, 
     indicators: str = "sma,rsi,macd",
     period: str = "1y"
 ):
     """Get technical indicators for a stock"""
-    # Get stock data first
-    stock_data = data_service.get_stock_data(symbol, period)
-    if "error" in stock_data:
-        raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
+    # Precomputed and on-demand values differ, so the ETag says which one answers
+    frames = RequestFrames()
+    not_modified = await conditional_get(request, response, symbol, period, frames=frames,
+                                         version=lambda bars: indicator_store.version(bars, symbol))
+    if not_modified:
+        return not_modified
     
-    history = stock_data.get("history", [])
-    if not history:
-        raise HTTPException(status_code=404, detail="No historical data available")
+    bars = await run_upstream(frames.bars, symbol, period)
+    if bars.empty:
+        raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
     
-    # Calculate requested indicators
+    # All requested indicators come from one engine pass over the bars
     requested_indicators = indicators.split(",")
-    result = {"symbol": symbol, "indicators": {}}
+    values = await run_upstream(indicator_service.calculate_indicators, bars, requested_indicators, symbol, period)
     
-    close_prices = [item["Close"] for item in history]
-    high_prices = [item["High"] for item in history]
-    low_prices = [item["Low"] for item in history]
+    return {"symbol": symbol, "indicators": values}
+
+@router.get("/{symbol}/all")
+async def get_all_indicators(request: Request, response: Response, symbol: str, period: str = "1y"):
+    """Get all available indicators for a stock"""
+    frames = RequestFrames()
+    not_modified = await conditional_get(request, response, symbol, period, frames=frames,
+                                         version=lambda bars: indicator_store.version(bars, symbol))
+    if not_modified:
+        return not_modified
     
-    if "sma" in requested_indicators:
-        result["indicators"]["sma_20"] = indicator_service.calculate_sma(close_prices, 20)
-        result["indicators"]["sma_50"] = indicator_service.calculate_sma(close_prices, 50)
+    bars = await run_upstream(frames.bars, symbol, period)
+    if bars.empty:
+        raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
     
-    if "ema" in requested_indicators:
-        result["indicators"]["ema_12"] = indicator_service.calculate_ema(close_prices, 12)
-        result["indicators"]["ema_26"] = indicator_service.calculate_ema(close_prices, 26)
+    indicators = await run_upstream(indicator_service.calculate_indicators, bars, symbol=symbol, period=period)
+    
+    return {
+        "symbol": symbol,
+        "indicators": indicators
+    }
+
+@router.get("/{symbol}/timeframes")
+async def get_multi_timeframe_indicators(
+    request: Request,
+    response: Response,
+    symbol: str,
+    timeframes: str = Query("1d,1wk", description="Comma-separated intervals, e.g. 1d,1wk,1mo"),
+    indicators: str = "sma,rsi,macd",
+    period: str = "1y",
+    interval: str = "1d"
+):
+    """
+    Indicators at several timeframes from one read of the base bars
     
-    if "rsi" in requested_indicators:
-        result["indicators"]["rsi"] = indicator_service.calculate_rsi(close_prices)
+    Coarser timeframes are resampled from the `interval` bars and every
+    series is aligned to the base bars' "time", e.g. daily and weekly RSI
+    side by side: /AAPL/timeframes?timeframes=1d,1wk&indicators=rsi
+    """
+    requested_timeframes = [timeframe.strip() for timeframe in timeframes.split(",") if timeframe.strip()]
+    if not requested_timeframes or len(requested_timeframes) > 5:
+        raise HTTPException(status_code=400, detail="Between 1 and 5 timeframes per request")
     
-    if "macd" in requested_indicators:
-        result["indicators"]["macd"] = indicator_service.calculate_macd(close_prices)
+    frames = RequestFrames()
+    not_modified = await conditional_get(request, response, symbol, period, interval, frames=frames,
+                                         version=lambda bars: indicator_store.version(bars, symbol, interval))
+    if not_modified:
+        return not_modified
     
-    if "bollinger" in requested_indicators:
-        result["indicators"]["bollinger"] = indicator_service.calculate_bollinger_bands(close_prices)
+    bars = await run_upstream(frames.bars, symbol, period, interval)
+    if bars.empty:
+        raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
     
-    if "stochastic" in requested_indicators:
-        result["indicators"]["stochastic"] = indicator_service.calculate_stochastic(
-            high_prices, low_prices, close_prices
-        )
+    try:
+        values = await run_upstream(indicator_service.calculate_timeframes, bars, requested_timeframes,
+                                    [name.strip() for name in indicators.split(",")], interval, symbol, period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return result
+    return {
+        "symbol": symbol,
+        "interval": interval,
+        "time": epoch_seconds(bars.index).tolist(),
+        "timeframes": values
+    }
 
-@router.get("/{symbol}/all")
-async def get_all_indicators(symbol: str, period: str = "1y"):
-    """Get all available indicators for a stock"""
-    stock_data = data_service.get_stock_data(symbol, period)
-    if "error" in stock_data:
-        raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
+@router.get("/{symbol}/expr")
+async def evaluate_expressions(
+    request: Request,
+    response: Response,
+    symbol: str,
+    expr: List[str] = Query(..., description="Expressions, e.g. ema(close,12)-ema(close,26)"),
+    period: str = "1y"
+):
+    """
+    Evaluate indicator expressions over a stock's bars
+    
+    Example: /AAPL/expr?expr=rsi(close,14)<30 and close>sma(close,200)&expr=ema(close,12)-ema(close,26)
+    """
+    if len(expr) > 20:
+        raise HTTPException(status_code=400, detail="At most 20 expressions per request")
     
-    history = stock_data.get("history", [])
-    if not history:
-        raise HTTPException(status_code=404, detail="No historical data available")
+    frames = RequestFrames()
+    not_modified = await conditional_get(request, response, symbol, period, frames=frames)
+    if not_modified:
+        return not_modified
     
-    indicators = indicator_service.calculate_all_indicators(history)
+    bars = await run_upstream(frames.bars, symbol, period)
+    if bars.empty:
+        raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
+    
+    try:
+        values = await run_upstream(indicator_service.evaluate_expressions, bars, expr, symbol, period)
+    except ExpressionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "symbol": symbol,
-        "indicators": indicators
-    }
\ No newline at end of file
+        "time": epoch_seconds(bars.index).tolist(),
+        "values": values
+    }
@@ -1,101 +1,214 @@
 """
 Advanced Indicators API endpoints
 """
-from fastapi import APIRouter, HTTPException, Query
-from app.services.advanced_indicators import AdvancedIndicatorsService
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel
+from typing import Dict, List, Union
+from app.services.advanced_indicators import AdvancedIndicatorsService, BATCH_INDICATORS
+from app.services.etags import conditional_get
+from app.services.request_frames import RequestFrames, request_frames
+from app.services.upstream import UpstreamTimeoutError, run_upstream
 
 router = APIRouter(prefix="/api/indicators", tags=["indicators"])
 
 
 @router.get("/atr/{symbol}")
-async def get_atr(symbol: str, period: int = Query(14, ge=5, le=50)):
+async def get_atr(request: Request, response: Response, symbol: str, period: int = Query(14, ge=5, le=50),
+                  frames: RequestFrames = Depends(request_frames)):
     """Average True Range - volatility indicator"""
     try:
-        data = AdvancedIndicatorsService.calculate_atr(symbol, period)
+        warmup = AdvancedIndicatorsService.warmup("atr", period=period)
+        not_modified = await conditional_get(request, response, symbol, "1mo", frames=frames, warmup=warmup)
+        if not_modified:
+            return not_modified
+        data = await run_upstream(AdvancedIndicatorsService.calculate_atr, symbol, period, frames=frames)
         return {"symbol": symbol, "indicator": "ATR", "period": period, "data": data}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/adx/{symbol}")
-async def get_adx(symbol: str, period: int = Query(14, ge=5, le=50)):
+async def get_adx(request: Request, response: Response, symbol: str, period: int = Query(14, ge=5, le=50),
+                  frames: RequestFrames = Depends(request_frames)):
     """Average Directional Index - trend strength"""
     try:
-        data = AdvancedIndicatorsService.calculate_adx(symbol, period)
+        warmup = AdvancedIndicatorsService.warmup("adx", period=period)
+        not_modified = await conditional_get(request, response, symbol, "1mo", frames=frames, warmup=warmup)
+        if not_modified:
+            return not_modified
+        data = await run_upstream(AdvancedIndicatorsService.calculate_adx, symbol, period, frames=frames)
         return {"symbol": symbol, "indicator": "ADX", "period": period, "data": data}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/ichimoku/{symbol}")
-async def get_ichimoku(symbol: str):
+async def get_ichimoku(request: Request, response: Response, symbol: str,
+                       frames: RequestFrames = Depends(request_frames)):
     """Ichimoku Cloud indicator"""
     try:
-        data = AdvancedIndicatorsService.calculate_ichimoku(symbol)
+        warmup = AdvancedIndicatorsService.warmup("ichimoku")
+        not_modified = await conditional_get(request, response, symbol, "1mo", frames=frames, warmup=warmup)
+        if not_modified:
+            return not_modified
+        data = await run_upstream(AdvancedIndicatorsService.calculate_ichimoku, symbol, frames=frames)
         return {"symbol": symbol, "indicator": "Ichimoku", "data": data}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/obv/{symbol}")
-async def get_obv(symbol: str):
+async def get_obv(request: Request, response: Response, symbol: str,
+                  frames: RequestFrames = Depends(request_frames)):
     """On Balance Volume"""
     try:
-        data = AdvancedIndicatorsService.calculate_obv(symbol)
+        warmup = AdvancedIndicatorsService.warmup("obv")
+        not_modified = await conditional_get(request, response, symbol, "1mo", frames=frames, warmup=warmup)
+        if not_modified:
+            return not_modified
+        data = await run_upstream(AdvancedIndicatorsService.calculate_obv, symbol, frames=frames)
         return {"symbol": symbol, "indicator": "OBV", "data": data}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/vwap/{symbol}")
-async def get_vwap(symbol: str):
+async def get_vwap(request: Request, response: Response, symbol: str,
+                   frames: RequestFrames = Depends(request_frames)):
     """Volume Weighted Average Price"""
     try:
-        data = AdvancedIndicatorsService.calculate_vwap(symbol)
+        warmup = AdvancedIndicatorsService.warmup("vwap")
+        not_modified = await conditional_get(request, response, symbol, "1mo", frames=frames, warmup=warmup)
+        if not_modified:
+            return not_modified
+        data = await run_upstream(AdvancedIndicatorsService.calculate_vwap, symbol, frames=frames)
         return {"symbol": symbol, "indicator": "VWAP", "data": data}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/macd/{symbol}")
 async def get_macd(
+    request: Request,
+    response: Response,
     symbol: str,
     fast: int = Query(12, ge=5, le=30),
     slow: int = Query(26, ge=10, le=50),
-    signal: int = Query(9, ge=5, le=20)
+    signal: int = Query(9, ge=5, le=20),
+    frames: RequestFrames = Depends(request_frames)
 ):
     """MACD - Moving Average Convergence Divergence"""
     try:
-        data = AdvancedIndicatorsService.calculate_macd(symbol, fast, slow, signal)
+        warmup = AdvancedIndicatorsService.warmup("macd", fast=fast, slow=slow, signal=signal)
+        not_modified = await conditional_get(request, response, symbol, "1mo", frames=frames, warmup=warmup)
+        if not_modified:
+            return not_modified
+        data = await run_upstream(AdvancedIndicatorsService.calculate_macd, symbol, fast, slow, signal, frames=frames)
         return {"symbol": symbol, "indicator": "MACD", "parameters": {"fast": fast, "slow": slow, "signal": signal}, "data": data}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/stochastic/{symbol}")
 async def get_stochastic(
+    request: Request,
+    response: Response,
     symbol: str,
     period: int = Query(14, ge=5, le=50),
     smooth_k: int = Query(3, ge=1, le=10),
-    smooth_d: int = Query(3, ge=1, le=10)
+    smooth_d: int = Query(3, ge=1, le=10),
+    frames: RequestFrames = Depends(request_frames)
 ):
     """Stochastic Oscillator"""
     try:
-        data = AdvancedIndicatorsService.calculate_stochastic(symbol, period, smooth_k, smooth_d)
+        warmup = AdvancedIndicatorsService.warmup("stochastic", period=period, smooth_k=smooth_k, smooth_d=smooth_d)
+        not_modified = await conditional_get(request, response, symbol, "1mo", frames=frames, warmup=warmup)
+        if not_modified:
+            return not_modified
+        data = await run_upstream(AdvancedIndicatorsService.calculate_stochastic, symbol, period, smooth_k, smooth_d, frames=frames)
         return {"symbol": symbol, "indicator": "Stochastic", "parameters": {"period": period, "smooth_k": smooth_k, "smooth_d": smooth_d}, "data": data}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/bollinger-bands/{symbol}")
 async def get_bollinger_bands(
+    request: Request,
+    response: Response,
     symbol: str,
     period: int = Query(20, ge=5, le=50),
-    std_dev: float = Query(2.0, ge=0.5, le=4.0)
+    std_dev: float = Query(2.0, ge=0.5, le=4.0),
+    frames: RequestFrames = Depends(request_frames)
 ):
     """Bollinger Bands"""
     try:
-        data = AdvancedIndicatorsService.calculate_bollinger_bands(symbol, period, std_dev)
+        warmup = AdvancedIndicatorsService.warmup("bollinger_bands", period=period, std_dev=std_dev)
+        not_modified = await conditional_get(request, response, symbol, "1mo", frames=frames, warmup=warmup)
+        if not_modified:
+            return not_modified
+        data = await run_upstream(AdvancedIndicatorsService.calculate_bollinger_bands, symbol, period, std_dev, frames=frames)
         return {"symbol": symbol, "indicator": "Bollinger Bands", "parameters": {"period": period, "std_dev": std_dev}, "data": data}
+    except UpstreamTimeoutError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class IndicatorSpec(BaseModel):
+    name: str
+    params: Dict[str, Union[int, float]] = {}
+
+
+class BatchIndicatorsRequest(BaseModel):
+    indicators: List[IndicatorSpec]
+
+
+@router.post("/batch/{symbol}")
+async def get_indicators_batch(symbol: str, request: BatchIndicatorsRequest,
+                               frames: RequestFrames = Depends(request_frames)):
+    """
+    Several advanced indicators computed from one read of the bars
+    
+    The bars cover the display window plus the longest warm-up any of the
+    indicators needs; ?latest=true returns only the latest values.
+    
+    Body: {"indicators": [{"name": "macd", "params": {"fast": 12, "slow": 26}}, {"name": "atr"}]}
+    """
+    if not request.indicators:
+        raise HTTPException(status_code=400, detail="No indicators requested")
+    if len(request.indicators) > 20:
+        raise HTTPException(status_code=400, detail="Maximum 20 indicators per batch")
+    for spec in request.indicators:
+        if spec.name not in BATCH_INDICATORS:
+            raise HTTPException(status_code=400, detail=f"Unknown indicator: {spec.name}")
+        if any(not 0 < value <= 200 for value in spec.params.values()):
+            raise HTTPException(status_code=400, detail=f"Parameters for {spec.name} must be between 0 and 200")
+    
+    try:
+        results = await run_upstream(
+            AdvancedIndicatorsService.calculate_batch,
+            symbol,
+            [spec.model_dump() for spec in request.indicators],
+            frames=frames
+        )
+        return {"symbol": symbol, "indicators": results}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,37 +1,97 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import time
+import pandas as pd
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.services.bar_store import bar_store
+from app.services.candlestick_patterns import PATTERN_BITS, PATTERN_SIGNALS
+from app.services.pattern_scan import DETECTORS, pattern_scanner
 from app.services.pattern_service import PatternService
 from app.services.data_service import DataService
+from app.services.upstream import run_upstream
 
 router = APIRouter()
 pattern_service = PatternService()
 data_service = DataService()
 
+@router.get("/scan")
+async def scan_patterns(
+    symbols: Optional[List[str]] = Query(None, description="Symbols to scan; all stored symbols when omitted"),
+    detectors: str = Query("candlestick", description="Comma-separated: candlestick, support_resistance, trends"),
+    patterns: Optional[str] = Query(None, description="Comma-separated candlestick patterns, e.g. bullish_engulfing"),
+    lookback: int = Query(1, ge=1, le=250, description="Candlestick matches on the last N bars"),
+    period: str = "3mo",
+    interval: str = "1d",
+    matches_only: bool = Query(True, description="Skip symbols without candlestick matches (errors still stream)")
+):
+    """
+    Run pattern detectors across a symbol universe from the bar store
+    
+    Streams newline-delimited JSON: one line per symbol as its chunk
+    finishes on the process pool, then a summary line with "done": true.
+    Symbols that failed (e.g. no stored bars) always stream, as lines with
+    an "error"; the summary counts them under "errors", and under
+    "matched" the symbols with candlestick matches.
+    
+    Example: /scan?patterns=bullish_engulfing  (who printed a bullish engulfing on the last bar)
+    """
+    requested_detectors = [name.strip() for name in detectors.split(",") if name.strip()]
+    unknown = [name for name in requested_detectors if name not in DETECTORS]
+    if not requested_detectors or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown detectors: {unknown}; choose from {list(DETECTORS)}")
+    requested_patterns = [name.strip() for name in patterns.split(",") if name.strip()] if patterns else None
+    unknown = [name for name in requested_patterns or [] if name not in PATTERN_BITS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown patterns: {unknown}")
+    
+    universe = [symbol.upper() for symbol in symbols] if symbols else bar_store.symbols(interval)
+    if len(universe) > 5000:
+        raise HTTPException(status_code=400, detail="At most 5000 symbols per scan")
+    filter_matches = matches_only and "candlestick" in requested_detectors
+    
+    async def lines():
+        started = time.perf_counter()
+        matched = errors = 0
+        async for result in pattern_scanner.scan(universe, interval, period, requested_detectors,
+                                                 requested_patterns, lookback):
+            if "error" in result:
+                errors += 1
+            elif result.get("candlestick"):
+                matched += 1
+            elif filter_matches:
+                continue
+            yield json.dumps(result) + "\n"
+        yield json.dumps({
+            "done": True,
+            "scanned": len(universe),
+            "matched": matched,
+            "errors": errors,
+            "seconds": round(time.perf_counter() - started, 3)
+        }) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/{symbol}/candlestick")
 async def get_candlestick_patterns(symbol: str, period: str = "3mo"):
     """Get candlestick patterns for a stock"""
-    stock_data = data_service.get_stock_data(symbol, period)
-    if "error" in stock_data:
+    bars = await run_upstream(data_service.get_history, symbol, period)
+    if bars.empty:
         raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
     
-    history = stock_data.get("history", [])
-    if not history:
-        raise HTTPException(status_code=404, detail="No historical data available")
-    
-    patterns = pattern_service.detect_candlestick_patterns(history)
+    # Recent patterns: matches in the last 30 bars
+    matches = pattern_service.detect_candlestick_patterns(bars, start=len(bars) - 30)
+    dates = pd.DatetimeIndex(bars.index).strftime("%Y-%m-%d")
+    signals = {1: 'bullish', -1: 'bearish', 0: 'neutral'}
     
-    # Find recent patterns (non-zero values in last 30 days)
-    recent_patterns = {}
-    for pattern_name, values in patterns.items():
-        recent_signals = []
-        for i, value in enumerate(values[-30:], start=len(values)-30):
-            if value != 0:
-                recent_signals.append({
-                    'date': history[i]['Date'],
-                    'signal': 'bullish' if value > 0 else 'bearish',
-                    'strength': abs(value)
-                })
-        if recent_signals:
-            recent_patterns[pattern_name] = recent_signals
+    recent_patterns = {
+        pattern_name: [{
+            'date': dates[i],
+            'signal': signals[PATTERN_SIGNALS[pattern_name]],
+            'strength': 1
+        } for i in indices]
+        for pattern_name, indices in matches.items()
+    }
     
     return {
         'symbol': symbol,
@@ -41,7 +101,7 @@ async def get_candlestick_patterns(symbol: str, period: str = "3mo"):
 @router.get("/{symbol}/support-resistance")
 async def get_support_resistance(symbol: str, period: str = "6mo"):
     """Get support and resistance levels"""
-    stock_data = data_service.get_stock_data(symbol, period)
+    stock_data = await run_upstream(data_service.get_stock_data, symbol, period)
     if "error" in stock_data:
         raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
     
@@ -61,7 +121,7 @@ async def get_support_resistance(symbol: str, period: str = "6mo"):
 @router.get("/{symbol}/trends")
 async def get_trend_lines(symbol: str, period: str = "6mo"):
     """Get trend lines"""
-    stock_data = data_service.get_stock_data(symbol, period)
+    stock_data = await run_upstream(data_service.get_stock_data, symbol, period)
     if "error" in stock_data:
         raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
     
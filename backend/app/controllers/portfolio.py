@@ -6,6 +6,7 @@ from app.controllers.auth import get_current_user
 from app.models.user import User
 from app.models.portfolio import Portfolio, Transaction
 from app.services.data_service import DataService
+from app.services.upstream import run_upstream
 from pydantic import BaseModel
 from datetime import datetime
 from typing import List
@@ -59,8 +60,10 @@ async def get_portfolio(
     portfolio_cost = 0
     holdings_with_prices = []
     
+    quotes = await run_upstream(data_service.get_many_quotes, list(holdings.keys()))
+    
     for symbol, holding in holdings.items():
-        quote = data_service.get_real_time_quote(symbol)
+        quote = quotes[symbol.upper()]
         current_price = quote.get('price', 0)
         
         current_value = holding['quantity'] * current_price
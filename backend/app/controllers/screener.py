@@ -3,7 +3,9 @@ Stock Screener API endpoints
 """
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional, Dict, Any
+from app.services.expressions import ExpressionError
 from app.services.screener_service import ScreenerService
+from app.services.upstream import UpstreamTimeoutError, run_upstream
 
 router = APIRouter(prefix="/api/screener", tags=["screener"])
 
@@ -12,10 +14,12 @@ router = APIRouter(prefix="/api/screener", tags=["screener"])
 async def get_stock_info(symbol: str):
     """Get comprehensive stock information"""
     try:
-        info = ScreenerService.get_stock_info(symbol)
+        info = await run_upstream(ScreenerService.get_stock_info, symbol)
         if not info:
             raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
         return info
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -30,7 +34,8 @@ async def screen_stocks(
     min_volume: Optional[int] = Query(None),
     rsi_oversold: Optional[bool] = Query(None),
     rsi_overbought: Optional[bool] = Query(None),
-    sma_crossover: Optional[str] = Query(None)
+    sma_crossover: Optional[str] = Query(None),
+    expression: Optional[str] = Query(None, description="e.g. rsi(close,14) < 30 and close > sma(close,200)")
 ):
     """
     Screen stocks based on multiple criteria
@@ -46,13 +51,17 @@ async def screen_stocks(
             "min_volume": min_volume,
             "rsi_oversold": rsi_oversold,
             "rsi_overbought": rsi_overbought,
-            "sma_crossover": sma_crossover
+            "sma_crossover": sma_crossover,
+            "expression": expression
         }
         
         # Remove None values
         criteria = {k: v for k, v in criteria.items() if v is not None}
         
-        results = ScreenerService.screen_by_criteria(symbols, criteria)
+        try:
+            results = await run_upstream(ScreenerService.screen_by_criteria, symbols, criteria)
+        except ExpressionError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "criteria": criteria,
@@ -60,6 +69,29 @@ async def screen_stocks(
             "matches": len(results),
             "results": results
         }
+    except HTTPException:
+        raise
+    except UpstreamTimeoutError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/technicals")
+async def get_technicals(
+    symbols: List[str] = Query(..., description="List of stock symbols"),
+    period: str = Query("1y")
+):
+    """Latest RSI, 50/200 SMAs and ATR for many symbols, computed together"""
+    try:
+        technicals = await run_upstream(ScreenerService.calculate_technicals, symbols, period)
+        return {
+            "period": period,
+            "count": len(technicals),
+            "technicals": technicals
+        }
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -68,7 +100,7 @@ async def screen_stocks(
 async def get_rsi(symbol: str, period: int = Query(14, ge=5, le=50)):
     """Get current RSI for a stock"""
     try:
-        rsi = ScreenerService.calculate_rsi(symbol, period)
+        rsi = await run_upstream(ScreenerService.calculate_rsi, symbol, period)
         if rsi is None:
             raise HTTPException(status_code=404, detail=f"Could not calculate RSI for {symbol}")
         
@@ -78,6 +110,8 @@ async def get_rsi(symbol: str, period: int = Query(14, ge=5, le=50)):
             "period": period,
             "signal": "oversold" if rsi < 30 else ("overbought" if rsi > 70 else "neutral")
         }
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -90,7 +124,7 @@ async def get_sma_crossover(
 ):
     """Check SMA crossover status"""
     try:
-        data = ScreenerService.calculate_sma_50_200(symbol)
+        data = await run_upstream(ScreenerService.calculate_sma_50_200, symbol)
         if not data:
             raise HTTPException(status_code=404, detail=f"Could not calculate SMAs for {symbol}")
         
@@ -100,6 +134,8 @@ async def get_sma_crossover(
             "sma_200": data.get("sma_200"),
             "crossover": data.get("crossover")
         }
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,5 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from app.services.data_service import DataService
+from app.services.etags import conditional_get
+from app.services.periods import parse_since
+from app.services.request_frames import RequestFrames
+from app.services.serialization import FORMATS
+from app.services.upstream import UpstreamTimeoutError, run_upstream
 from typing import Optional
 import yfinance as yf
 
@@ -11,20 +16,32 @@ async def search_stocks(query: str):
     """Search for stocks by symbol or name"""
     try:
         print(f"Searching for stocks with query: {query}")
-        results = data_service.search_stocks(query)
+        results = await run_upstream(data_service.search_stocks, query)
         print(f"Search results: {len(results)} stocks found")
         return {"results": results}
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         print(f"Search error: {str(e)}")
         return {"results": []}
 
 @router.get("/{symbol}")
-async def get_stock_info(symbol: str, period: str = "1y"):
+async def get_stock_info(request: Request, response: Response, symbol: str, period: str = "1y",
+                         format: str = "rows"):
     """Get detailed stock information"""
     try:
+        if format not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid format: {format}")
+        
+        frames = RequestFrames(service=data_service)
+        not_modified = await conditional_get(request, response, symbol, period, frames=frames)
+        if not_modified:
+            return not_modified
+        
         print(f"Getting stock info for {symbol} with period {period}")
-        data = data_service.get_stock_data(symbol, period)
-        print(f"Stock data result: {data.get('symbol', 'No symbol')} - {len(data.get('history', []))} records")
+        bars = await run_upstream(frames.bars, symbol, period)
+        data = await run_upstream(data_service.get_stock_data, symbol, period, format, bars)
+        print(f"Stock data result: {data.get('symbol', 'No symbol')}")
         
         if "error" in data:
             print(f"Stock data error: {data['error']}")
@@ -33,6 +50,8 @@ async def get_stock_info(symbol: str, period: str = "1y"):
         return data
     except HTTPException:
         raise
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         print(f"Stock info error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get stock info: {str(e)}")
@@ -40,15 +59,36 @@ async def get_stock_info(symbol: str, period: str = "1y"):
 @router.get("/{symbol}/quote")
 async def get_stock_quote(symbol: str):
     """Get real-time stock quote"""
-    quote = data_service.get_real_time_quote(symbol)
+    quote = await run_upstream(data_service.get_real_time_quote, symbol)
     if "error" in quote:
         raise HTTPException(status_code=404, detail=f"Quote for {symbol} not available")
     return quote
 
 @router.get("/{symbol}/history")
-async def get_stock_history(symbol: str, period: str = "1y", interval: str = "1d"):
-    """Get historical stock data"""
-    data = data_service.get_stock_data(symbol, period)
+async def get_stock_history(request: Request, response: Response, symbol: str, period: str = "1y",
+                            interval: str = "1d", format: str = "rows", since: Optional[str] = None):
+    """Get historical stock data
+    
+    since=<last bar time> (Unix seconds or ISO date) returns only newer bars
+    plus the revised last bar, for incremental chart updates
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format: {format}")
+    try:
+        since_ts = parse_since(since) if since else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    frames = RequestFrames(service=data_service)
+    not_modified = await conditional_get(request, response, symbol, period, frames=frames)
+    if not_modified:
+        return not_modified
+    bars = await run_upstream(frames.bars, symbol, period)
+    if since_ts is not None:
+        data = await run_upstream(data_service.get_history_delta, symbol, since_ts, period, format, bars)
+        if "error" in data:
+            raise HTTPException(status_code=404, detail=f"History for {symbol} not available")
+        return data
+    data = await run_upstream(data_service.get_stock_data, symbol, period, format, bars)
     if "error" in data:
         raise HTTPException(status_code=404, detail=f"History for {symbol} not available")
     return {"symbol": symbol, "history": data.get("history", [])}
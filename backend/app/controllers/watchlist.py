@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from app.controllers.auth import get_current_user
 from app.config.mongodb import watchlist_collection
 from app.services.data_service import DataService
+from app.services.upstream import UpstreamTimeoutError, run_upstream
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -20,11 +21,15 @@ async def get_watchlist(current_user: dict = Depends(get_current_user)):
         watchlist_items = watchlist_collection.find({"user_id": user_id})
         print(f"Found {len(watchlist_items)} watchlist items")
         
+        # Get current quotes for all symbols concurrently
+        quotes = await run_upstream(
+            data_service.get_many_quotes, [item["symbol"] for item in watchlist_items]
+        )
+        
         result = []
         for item in watchlist_items:
             print(f"Processing watchlist item: {item}")
-            # Get current quote for each symbol
-            quote = data_service.get_real_time_quote(item["symbol"])
+            quote = quotes[item["symbol"].upper()]
             result.append({
                 "id": str(item["_id"]),
                 "symbol": item["symbol"],
@@ -37,6 +42,8 @@ async def get_watchlist(current_user: dict = Depends(get_current_user)):
         print(f"Returning {len(result)} watchlist items")
         return {"watchlist": result}
         
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         print(f"Watchlist get error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get watchlist: {str(e)}")
@@ -60,7 +67,7 @@ async def add_to_watchlist(item: WatchlistAdd, current_user: dict = Depends(get_
         
         # Verify stock exists (skip verification for now to test)
         print(f"Verifying stock {item.symbol} exists...")
-        stock_data = data_service.get_real_time_quote(item.symbol.upper())
+        stock_data = await run_upstream(data_service.get_real_time_quote, item.symbol.upper())
         if "error" in stock_data:
             print(f"Stock verification failed: {stock_data['error']}")
             # Don't fail - just add it anyway for testing
@@ -81,6 +88,8 @@ async def add_to_watchlist(item: WatchlistAdd, current_user: dict = Depends(get_
         
     except HTTPException:
         raise
+    except UpstreamTimeoutError:
+        raise
     except Exception as e:
         print(f"Watchlist add error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to add to watchlist: {str(e)}")
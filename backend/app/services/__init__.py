@@ -11,6 +11,22 @@ from . import advanced_indicators
 from . import screener_service
 from . import paper_trading_service
 from . import backtesting_service
+from . import bar_store
+from . import serialization
+from . import quote_cache
+from . import upstream
+from . import periods
+from . import data_providers
+from . import symbol_index
+from . import etags
+from . import indicator_engine
+from . import request_frames
+from . import streaming_indicators
+from . import indicator_cache
+from . import expressions
+from . import indicator_store
+from . import candlestick_patterns
+from . import pattern_scan
 
 __all__ = [
     'auth_service',
@@ -25,5 +41,21 @@ __all__ = [
     'advanced_indicators',
     'screener_service',
     'paper_trading_service',
-    'backtesting_service'
+    'backtesting_service',
+    'bar_store',
+    'serialization',
+    'quote_cache',
+    'upstream',
+    'periods',
+    'data_providers',
+    'symbol_index',
+    'etags',
+    'indicator_engine',
+    'request_frames',
+    'streaming_indicators',
+    'indicator_cache',
+    'expressions',
+    'indicator_store',
+    'candlestick_patterns',
+    'pattern_scan'
 ]
@@ -3,219 +3,240 @@ Advanced technical indicators service
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
-import yfinance as yf
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.services.expressions import to_json
+from app.services.indicator_cache import CachedEngine
+from app.services.indicator_engine import dropna
+from app.services.serialization import widen
+from app.services.request_frames import RequestFrames
+
+
+def ema_warmup(span: int) -> int:
+    """Bars after which an EMA's dependence on where the series starts is below ~0.25%"""
+    return 3 * (span + 1)
+
+
+# Bars each indicator needs before the first value it displays, by its parameters
+WARMUP: Dict[str, Callable[..., int]] = {
+    "atr": lambda period=14: period,
+    "adx": lambda period=14: 2 * period - 1,
+    "ichimoku": lambda: 52 - 1 + 26,
+    "obv": lambda: 0,
+    "vwap": lambda: 20 - 1,
+    "macd": lambda fast=12, slow=26, signal=9: ema_warmup(max(fast, slow)) + ema_warmup(signal),
+    "stochastic": lambda period=14, smooth_k=3, smooth_d=3: period + smooth_k + smooth_d - 3,
+    "bollinger_bands": lambda period=20, std_dev=2: period - 1,
+}
+
+
+def _display(values: np.ndarray, skip: int) -> List[float]:
+    """Values past the warm-up bars, without NaNs"""
+    return dropna(values[skip:])
 
 
 class AdvancedIndicatorsService:
     """Advanced technical indicators beyond basic moving averages"""
     
     @staticmethod
-    def get_ohlc(symbol: str, period: str = "1mo") -> pd.DataFrame:
-        """Get OHLC data"""
+    def get_ohlc(symbol: str, period: str = "1mo", frames: Optional[RequestFrames] = None) -> pd.DataFrame:
+        """Get OHLC data, through the request's frames when given"""
         try:
-            data = yf.download(symbol, period=period, interval="1d", progress=False)
+            data = (frames or RequestFrames()).bars(symbol, period, "1d")
             return data.reset_index() if not data.empty else pd.DataFrame()
         except:
             return pd.DataFrame()
     
     @staticmethod
-    def calculate_atr(symbol: str, period: int = 14) -> Dict[str, List]:
+    def get_engine(symbol: str, period: str = "1mo", frames: Optional[RequestFrames] = None,
+                   warmup: int = 0) -> Tuple[Optional[CachedEngine], List, int]:
+        """
+        Indicator engine over a symbol's display window plus `warmup` bars before it
+        
+        Returns the engine, the dates of the displayed bars, and how many
+        leading warm-up bars to skip in the engine's outputs.
+        """
+        frames = frames or RequestFrames()
+        try:
+            engine = frames.engine(symbol, period, "1d", warmup)
+        except Exception:
+            return None, [], 0
+        if engine is None:
+            return None, [], 0
+        bars = frames.bars(symbol, period, "1d", warmup)
+        skip = bars.attrs.get("warmup", 0)
+        return engine, bars.index[skip:].tolist(), skip
+    
+    @staticmethod
+    def warmup(name: str, **params) -> int:
+        """Warm-up bars a BATCH_INDICATORS name needs with these parameters"""
+        return WARMUP[name](**params)
+    
+    @staticmethod
+    def calculate_atr(symbol: str, period: int = 14, frames: Optional[RequestFrames] = None) -> Dict[str, List]:
         """Average True Range - measures volatility"""
-        df = AdvancedIndicatorsService.get_ohlc(symbol)
-        if df.empty:
+        engine, dates, skip = AdvancedIndicatorsService.get_engine(symbol, frames=frames,
+                                                                   warmup=WARMUP["atr"](period))
+        if engine is None:
             return {}
         
-        df["TR"] = np.maximum(
-            df["High"] - df["Low"],
-            np.maximum(
-                abs(df["High"] - df["Close"].shift()),
-                abs(df["Low"] - df["Close"].shift())
-            )
-        )
-        
-        df["ATR"] = df["TR"].rolling(window=period).mean()
-        
         return {
-            "values": df["ATR"].dropna().tolist(),
-            "dates": df["Date"].dropna().tolist()
+            "values": _display(engine.atr(period), skip),
+            "dates": dates
         }
     
     @staticmethod
-    def calculate_adx(symbol: str, period: int = 14) -> Dict[str, List]:
+    def calculate_adx(symbol: str, period: int = 14, frames: Optional[RequestFrames] = None) -> Dict[str, List]:
         """Average Directional Index - measures trend strength"""
-        df = AdvancedIndicatorsService.get_ohlc(symbol)
-        if df.empty:
+        engine, dates, skip = AdvancedIndicatorsService.get_engine(symbol, frames=frames,
+                                                                   warmup=WARMUP["adx"](period))
+        if engine is None:
             return {}
         
-        df["HighDiff"] = df["High"].diff()
-        df["LowDiff"] = -df["Low"].diff()
-        
-        df["PlusDM"] = np.where((df["HighDiff"] > df["LowDiff"]) & (df["HighDiff"] > 0), 
-                               df["HighDiff"], 0)
-        df["MinusDM"] = np.where((df["LowDiff"] > df["HighDiff"]) & (df["LowDiff"] > 0), 
-                                df["LowDiff"], 0)
-        
-        tr = np.maximum(
-            df["High"] - df["Low"],
-            np.maximum(
-                abs(df["High"] - df["Close"].shift()),
-                abs(df["Low"] - df["Close"].shift())
-            )
-        )
-        
-        df["TR"] = tr
-        df["ATR"] = df["TR"].rolling(window=period).mean()
-        
-        df["PlusDI"] = 100 * (df["PlusDM"].rolling(window=period).mean() / df["ATR"])
-        df["MinusDI"] = 100 * (df["MinusDM"].rolling(window=period).mean() / df["ATR"])
-        
-        df["DX"] = 100 * abs(df["PlusDI"] - df["MinusDI"]) / (df["PlusDI"] + df["MinusDI"])
-        df["ADX"] = df["DX"].rolling(window=period).mean()
-        
+        adx = engine.adx(period)
         return {
-            "adx": df["ADX"].dropna().tolist(),
-            "plusDI": df["PlusDI"].dropna().tolist(),
-            "minusDI": df["MinusDI"].dropna().tolist(),
-            "dates": df["Date"].dropna().tolist()
+            "adx": _display(adx["adx"], skip),
+            "plusDI": _display(adx["plus_di"], skip),
+            "minusDI": _display(adx["minus_di"], skip),
+            "dates": dates
         }
     
     @staticmethod
-    def calculate_ichimoku(symbol: str) -> Dict[str, List]:
+    def calculate_ichimoku(symbol: str, frames: Optional[RequestFrames] = None) -> Dict[str, List]:
         """Ichimoku Cloud indicator"""
-        df = AdvancedIndicatorsService.get_ohlc(symbol)
-        if df.empty:
+        engine, dates, skip = AdvancedIndicatorsService.get_engine(symbol, frames=frames,
+                                                                   warmup=WARMUP["ichimoku"]())
+        if engine is None:
             return {}
         
-        # Tenkan-sen (Conversion Line)
-        high_9 = df["High"].rolling(window=9).max()
-        low_9 = df["Low"].rolling(window=9).min()
-        df["tenkan"] = (high_9 + low_9) / 2
-        
-        # Kijun-sen (Base Line)
-        high_26 = df["High"].rolling(window=26).max()
-        low_26 = df["Low"].rolling(window=26).min()
-        df["kijun"] = (high_26 + low_26) / 2
-        
-        # Senkou Span A (Leading Span A)
-        df["senkou_a"] = ((df["tenkan"] + df["kijun"]) / 2).shift(26)
-        
-        # Senkou Span B (Leading Span B)
-        high_52 = df["High"].rolling(window=52).max()
-        low_52 = df["Low"].rolling(window=52).min()
-        df["senkou_b"] = ((high_52 + low_52) / 2).shift(26)
-        
-        # Chikou Span (Lagging Span)
-        df["chikou"] = df["Close"].shift(-26)
-        
-        return {
-            "tenkan": df["tenkan"].dropna().tolist(),
-            "kijun": df["kijun"].dropna().tolist(),
-            "senkou_a": df["senkou_a"].dropna().tolist(),
-            "senkou_b": df["senkou_b"].dropna().tolist(),
-            "chikou": df["chikou"].dropna().tolist(),
-            "dates": df["Date"].dropna().tolist()
-        }
+        # Tenkan-sen 9, Kijun-sen 26, Senkou spans 52 shifted 26 ahead, Chikou 26 behind
+        ichimoku = engine.ichimoku(9, 26, 52)
+        result = {key: _display(values, skip) for key, values in ichimoku.items() if key != "chikou"}
+        # Today's close plotted 26 bars back: aligned with dates, None for the last 26
+        result["chikou"] = to_json(ichimoku["chikou"][skip:])
+        result["dates"] = dates
+        return result
     
     @staticmethod
-    def calculate_obv(symbol: str) -> Dict[str, List]:
+    def calculate_obv(symbol: str, frames: Optional[RequestFrames] = None) -> Dict[str, List]:
         """On Balance Volume"""
-        df = AdvancedIndicatorsService.get_ohlc(symbol)
-        if df.empty:
+        engine, dates, skip = AdvancedIndicatorsService.get_engine(symbol, frames=frames,
+                                                                   warmup=WARMUP["obv"]())
+        if engine is None or "volume" not in engine.arrays:
             return {}
         
-        if "Volume" not in df.columns:
-            return {}
-        
-        df["OBV"] = 0.0
-        df.loc[0, "OBV"] = df.loc[0, "Volume"]
-        
-        for i in range(1, len(df)):
-            if df.loc[i, "Close"] > df.loc[i-1, "Close"]:
-                df.loc[i, "OBV"] = df.loc[i-1, "OBV"] + df.loc[i, "Volume"]
-            elif df.loc[i, "Close"] < df.loc[i-1, "Close"]:
-                df.loc[i, "OBV"] = df.loc[i-1, "OBV"] - df.loc[i, "Volume"]
-            else:
-                df.loc[i, "OBV"] = df.loc[i-1, "OBV"]
-        
         return {
-            "values": df["OBV"].tolist(),
-            "dates": df["Date"].tolist()
+            "values": widen(engine.obv()[skip:]).tolist(),
+            "dates": dates
         }
     
     @staticmethod
-    def calculate_vwap(symbol: str) -> Dict[str, List]:
+    def calculate_vwap(symbol: str, frames: Optional[RequestFrames] = None) -> Dict[str, List]:
         """Volume Weighted Average Price"""
-        df = AdvancedIndicatorsService.get_ohlc(symbol)
-        if df.empty:
-            return {}
-        
-        if "Volume" not in df.columns:
+        engine, dates, skip = AdvancedIndicatorsService.get_engine(symbol, frames=frames,
+                                                                   warmup=WARMUP["vwap"]())
+        if engine is None or "volume" not in engine.arrays:
             return {}
         
-        df["TP"] = (df["High"] + df["Low"] + df["Close"]) / 3
-        df["VWAP"] = (df["TP"] * df["Volume"]).rolling(window=20).sum() / df["Volume"].rolling(window=20).sum()
-        
         return {
-            "values": df["VWAP"].dropna().tolist(),
-            "dates": df["Date"].dropna().tolist()
+            "values": _display(engine.vwap(20), skip),
+            "dates": dates
         }
     
     @staticmethod
-    def calculate_macd(symbol: str, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, List]:
+    def calculate_macd(symbol: str, fast: int = 12, slow: int = 26, signal: int = 9,
+                       frames: Optional[RequestFrames] = None) -> Dict[str, List]:
         """MACD - Moving Average Convergence Divergence"""
-        df = AdvancedIndicatorsService.get_ohlc(symbol)
-        if df.empty:
+        engine, dates, skip = AdvancedIndicatorsService.get_engine(symbol, frames=frames,
+                                                                   warmup=WARMUP["macd"](fast, slow, signal))
+        if engine is None:
             return {}
         
-        df["EMA_fast"] = df["Close"].ewm(span=fast).mean()
-        df["EMA_slow"] = df["Close"].ewm(span=slow).mean()
-        df["MACD"] = df["EMA_fast"] - df["EMA_slow"]
-        df["Signal"] = df["MACD"].ewm(span=signal).mean()
-        df["Histogram"] = df["MACD"] - df["Signal"]
-        
+        macd = engine.macd(fast, slow, signal)
         return {
-            "macd": df["MACD"].dropna().tolist(),
-            "signal": df["Signal"].dropna().tolist(),
-            "histogram": df["Histogram"].dropna().tolist(),
-            "dates": df["Date"].dropna().tolist()
+            "macd": _display(macd["macd"], skip),
+            "signal": _display(macd["signal"], skip),
+            "histogram": _display(macd["histogram"], skip),
+            "dates": dates
         }
     
     @staticmethod
-    def calculate_stochastic(symbol: str, period: int = 14, smooth_k: int = 3, smooth_d: int = 3) -> Dict[str, List]:
+    def calculate_stochastic(symbol: str, period: int = 14, smooth_k: int = 3, smooth_d: int = 3,
+                             frames: Optional[RequestFrames] = None) -> Dict[str, List]:
         """Stochastic Oscillator"""
-        df = AdvancedIndicatorsService.get_ohlc(symbol)
-        if df.empty:
+        engine, dates, skip = AdvancedIndicatorsService.get_engine(
+            symbol, frames=frames, warmup=WARMUP["stochastic"](period, smooth_k, smooth_d))
+        if engine is None:
             return {}
         
-        lowest_low = df["Low"].rolling(window=period).min()
-        highest_high = df["High"].rolling(window=period).max()
-        
-        df["K"] = ((df["Close"] - lowest_low) / (highest_high - lowest_low)) * 100
-        df["K_smooth"] = df["K"].rolling(window=smooth_k).mean()
-        df["D"] = df["K_smooth"].rolling(window=smooth_d).mean()
-        
+        stochastic = engine.stochastic(period, smooth_k, smooth_d)
         return {
-            "k": df["K"].dropna().tolist(),
-            "d": df["D"].dropna().tolist(),
-            "dates": df["Date"].dropna().tolist()
+            "k": _display(stochastic["k"], skip),
+            "d": _display(stochastic["d"], skip),
+            "dates": dates
         }
     
     @staticmethod
-    def calculate_bollinger_bands(symbol: str, period: int = 20, std_dev: float = 2) -> Dict[str, List]:
+    def calculate_bollinger_bands(symbol: str, period: int = 20, std_dev: float = 2,
+                                  frames: Optional[RequestFrames] = None) -> Dict[str, List]:
         """Bollinger Bands"""
-        df = AdvancedIndicatorsService.get_ohlc(symbol)
-        if df.empty:
+        engine, dates, skip = AdvancedIndicatorsService.get_engine(
+            symbol, frames=frames, warmup=WARMUP["bollinger_bands"](period, std_dev))
+        if engine is None:
             return {}
         
-        df["SMA"] = df["Close"].rolling(window=period).mean()
-        df["StdDev"] = df["Close"].rolling(window=period).std()
-        df["Upper"] = df["SMA"] + (df["StdDev"] * std_dev)
-        df["Lower"] = df["SMA"] - (df["StdDev"] * std_dev)
-        
+        bands = engine.bollinger(period, std_dev)
         return {
-            "upper": df["Upper"].dropna().tolist(),
-            "middle": df["SMA"].dropna().tolist(),
-            "lower": df["Lower"].dropna().tolist(),
-            "dates": df["Date"].dropna().tolist()
+            "upper": _display(bands["upper"], skip),
+            "middle": _display(bands["middle"], skip),
+            "lower": _display(bands["lower"], skip),
+            "dates": dates
         }
+    
+    @staticmethod
+    def calculate_batch(symbol: str, indicators: List[Dict[str, Any]],
+                        frames: Optional[RequestFrames] = None) -> List[Dict[str, Any]]:
+        """
+        Several indicators from one read of the bars
+        
+        Args:
+            symbol: Stock ticker symbol
+            indicators: [{"name": "macd", "params": {"fast": 12, ...}}, ...]; names
+                are keys of BATCH_INDICATORS, params the method's keyword arguments
+        
+        Returns one {"name", "params", "data"} entry per requested indicator, in order
+        """
+        warmup = 0
+        for spec in indicators:
+            name = spec.get("name")
+            if name not in BATCH_INDICATORS:
+                raise ValueError(f"Unknown indicator: {name}")
+            try:
+                warmup = max(warmup, int(WARMUP[name](**(spec.get("params") or {}))))
+            except TypeError:
+                raise ValueError(f"Invalid parameters for {name}: {sorted(spec.get('params') or {})}")
+        # One window with the longest warm-up serves every indicator
+        frames = (frames or RequestFrames()).with_warmup(warmup)
+        
+        results = []
+        for spec in indicators:
+            name = spec.get("name")
+            params = spec.get("params") or {}
+            method = BATCH_INDICATORS[name]
+            try:
+                data = method(symbol, **params, frames=frames)
+            except TypeError:
+                raise ValueError(f"Invalid parameters for {name}: {sorted(params)}")
+            results.append({"name": name, "params": params, "data": data})
+        return results
+
+
+BATCH_INDICATORS = {
+    "atr": AdvancedIndicatorsService.calculate_atr,
+    "adx": AdvancedIndicatorsService.calculate_adx,
+    "ichimoku": AdvancedIndicatorsService.calculate_ichimoku,
+    "obv": AdvancedIndicatorsService.calculate_obv,
+    "vwap": AdvancedIndicatorsService.calculate_vwap,
+    "macd": AdvancedIndicatorsService.calculate_macd,
+    "stochastic": AdvancedIndicatorsService.calculate_stochastic,
+    "bollinger_bands": AdvancedIndicatorsService.calculate_bollinger_bands,
+}
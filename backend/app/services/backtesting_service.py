@@ -3,9 +3,13 @@ Backtesting engine for strategy testing
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Callable
-import yfinance as yf
+from typing import Dict, List, Any, Callable, Optional
 from datetime import datetime
+from app.services.data_service import DataService
+from app.services.expressions import compile_expressions
+from app.services.indicator_engine import IndicatorEngine
+
+data_service = DataService()
 
 
 class BacktestResult:
@@ -101,7 +105,7 @@ class BacktestingEngine:
         
         # Fetch data
         try:
-            data = yf.download(symbol, start=start_date, end=end_date, progress=False)
+            data = data_service.get_history(symbol, start=start_date, end=end_date)
         except:
             return result
         
@@ -173,7 +177,7 @@ class BacktestingEngine:
         result = BacktestResult()
         
         try:
-            data = yf.download(symbol, start=start_date, end=end_date, progress=False)
+            data = data_service.get_history(symbol, start=start_date, end=end_date)
         except:
             return result
         
@@ -229,19 +233,48 @@ class BacktestingEngine:
         
         return result
     
+    @staticmethod
+    def backtest_expression(symbol: str, start_date: str, end_date: str, signal: str,
+                            initial_capital: float = 100000) -> BacktestResult:
+        """
+        Backtest an indicator expression as the signal
+        
+        Holds while the expression is true, e.g. "ema(close, 12) > ema(close, 26)".
+        The expression is evaluated once over the whole history rather than
+        bar by bar. Raises ExpressionError for an invalid expression.
+        """
+        plan = compile_expressions({"signal": signal})
+        
+        try:
+            data = data_service.get_history(symbol, start=start_date, end=end_date)
+        except:
+            return BacktestResult()
+        
+        if data.empty:
+            return BacktestResult()
+        
+        values = plan.evaluate(IndicatorEngine.from_bars(data))["signal"]
+        holding = (values > 0) if values.dtype != bool else values
+        return BacktestingEngine.backtest_custom(symbol, start_date, end_date,
+                                                 lambda bars, i: bool(holding[i]), initial_capital,
+                                                 data=data)
+    
     @staticmethod
     def backtest_custom(symbol: str, start_date: str, end_date: str,
                        signal_func: Callable[[pd.DataFrame, int], bool],
-                       initial_capital: float = 100000) -> BacktestResult:
+                       initial_capital: float = 100000,
+                       data: Optional[pd.DataFrame] = None) -> BacktestResult:
         """
         Backtest with custom signal function
         
-        signal_func should return True for buy, False for sell/hold
+        signal_func should return True for buy, False for sell/hold; data
+        skips the history fetch when the caller already has the bars
         """
         result = BacktestResult()
         
         try:
-            data = yf.download(symbol, start=start_date, end=end_date, progress=False)
+            if data is None:
+                data = data_service.get_history(symbol, start=start_date, end=end_date)
         except:
             return result
         
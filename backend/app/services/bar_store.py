@@ -0,0 +1,154 @@
+"""
+On-disk columnar store for OHLCV bars
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+DEFAULT_ROOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data", "bars"
+)
+
+
+def compact_bars(bars: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bars with float32 prices and, when they are whole and non-negative,
+    uint32 (uint64 past 2**32) volumes
+
+    float32 keeps ~7 significant digits, so prices round-trip to within a
+    relative 6e-8; history responses print them in their shortest decimal
+    form (serialization.widen), e.g. 187.44 rather than 187.44000244140625.
+    """
+    bars = bars.copy()
+    for column in PRICE_COLUMNS:
+        if column in bars.columns:
+            bars[column] = bars[column].astype(np.float32)
+    if "Volume" in bars.columns:
+        volume = bars["Volume"].to_numpy(dtype=np.float64)
+        if len(volume) and np.isfinite(volume).all() and (volume >= 0).all() \
+                and (volume == np.round(volume)).all():
+            bars["Volume"] = volume.astype(np.uint32 if volume.max() < 2 ** 32 else np.uint64)
+        else:
+            bars["Volume"] = volume.astype(np.float32)
+    return bars
+
+
+class BarStore:
+    """
+    Keeps one Parquet file of bars per symbol and interval
+
+    With compact=True (or COMPACT_NUMERICS=1) bars are written through
+    compact_bars, about half the size on disk and in memory.
+    """
+
+    def __init__(self, root: Optional[str] = None, compact: Optional[bool] = None):
+        self.root = root or os.getenv("BAR_STORE_DIR", DEFAULT_ROOT)
+        self.compact = os.getenv("COMPACT_NUMERICS", "0") == "1" if compact is None else compact
+        self._locks: Dict[Tuple[str, str], threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+        self._checked_at: Dict[Tuple[str, str], float] = {}
+
+    def path(self, symbol: str, interval: str) -> str:
+        """File holding the bars of one symbol at one interval"""
+        safe_symbol = symbol.upper().replace("/", "_")
+        return os.path.join(self.root, interval, f"{safe_symbol}.parquet")
+
+    def symbols(self, interval: str, newest_first: bool = False) -> List[str]:
+        """Symbols with stored bars at an interval, alphabetically or most recently written first"""
+        directory = os.path.join(self.root, interval)
+        try:
+            # Precomputed indicator files (indicator_store) live beside the bar files
+            files = [entry for entry in os.scandir(directory)
+                     if entry.name.endswith(".parquet") and not entry.name.endswith(".indicators.parquet")]
+        except OSError:
+            return []
+        if newest_first:
+            files.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        else:
+            files.sort(key=lambda entry: entry.name)
+        return [entry.name[:-len(".parquet")] for entry in files]
+
+    def lock(self, symbol: str, interval: str) -> threading.RLock:
+        """Per-file lock so concurrent refreshes don't race on the same file"""
+        key = (symbol.upper(), interval)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.RLock()
+            return self._locks[key]
+
+    def read(self, symbol: str, interval: str) -> pd.DataFrame:
+        """Load stored bars, or an empty frame when nothing is stored yet"""
+        path = self.path(symbol, interval)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            print(f"Error reading bar store file {path}: {e}")
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+    def write(self, symbol: str, interval: str, bars: pd.DataFrame) -> None:
+        """Atomically replace the stored bars"""
+        path = self.path(symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if self.compact:
+            bars = compact_bars(bars)
+        bars.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def append(self, symbol: str, interval: str, new_bars: pd.DataFrame,
+               covered_from: Optional[str] = None) -> pd.DataFrame:
+        """
+        Merge new bars into the stored ones and persist the result
+
+        Bars with a timestamp already in the store replace the stored row, so a
+        revised (still forming) last bar is picked up on the next refresh.
+        covered_from records the earliest start that has been requested from
+        upstream, letting callers tell a short listing history from a gap.
+        """
+        with self.lock(symbol, interval):
+            stored = self.read(symbol, interval)
+            attrs = dict(stored.attrs)
+
+            if stored.empty:
+                merged = new_bars[BAR_COLUMNS].copy()
+            elif new_bars.empty:
+                merged = stored
+            else:
+                merged = pd.concat([stored, new_bars[BAR_COLUMNS]])
+                merged = merged[~merged.index.duplicated(keep="last")]
+            merged = merged.sort_index()
+
+            if covered_from is not None:
+                previous = attrs.get("covered_from")
+                if previous is None or covered_from == "max" or (
+                    previous != "max" and covered_from < previous
+                ):
+                    attrs["covered_from"] = covered_from
+            merged.attrs = attrs
+
+            self.write(symbol, interval, merged)
+            return merged
+
+    def mark_checked(self, symbol: str, interval: str) -> None:
+        """Remember that upstream was just asked for the latest bars"""
+        self._checked_at[(symbol.upper(), interval)] = time.monotonic()
+
+    def checked_within(self, symbol: str, interval: str, seconds: float) -> bool:
+        """Whether upstream was asked for the latest bars in the last `seconds`"""
+        checked_at = self._checked_at.get((symbol.upper(), interval))
+        return checked_at is not None and time.monotonic() - checked_at < seconds
+
+
+# Global bar store instance
+bar_store = BarStore()
@@ -0,0 +1,180 @@
+"""
+Vectorized candlestick pattern detection with a per-bar bitmask
+"""
+from typing import Callable, Dict, List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.indicator_engine import shift
+
+# A body at least this share of the bar's range is a "long" candle
+LONG_BODY = 0.6
+# Prior trend: the close before the pattern against the close TREND_BARS before that
+TREND_BARS = 5
+# Bars before a bar that any pattern completing on it looks at
+LOOKBEHIND = 1 + TREND_BARS
+
+
+class Candles:
+    """OHLC arrays and the candle measurements patterns are defined on"""
+
+    def __init__(self, open, high, low, close):
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.body = self.close - self.open
+        self.size = np.abs(self.body)
+        self.range = self.high - self.low
+        self.top = np.maximum(self.open, self.close)
+        self.bottom = np.minimum(self.open, self.close)
+        self.upper = self.high - self.top
+        self.lower = self.bottom - self.low
+        self.bullish = self.body > 0
+        self.bearish = self.body < 0
+        self.long = (self.range > 0) & (self.size >= LONG_BODY * self.range)
+        self.doji = self.size <= 0.1 * self.range
+        self.midpoint = (self.open + self.close) / 2
+        before = shift(self.close, 1)
+        self.uptrend = before > shift(self.close, 1 + TREND_BARS)
+        self.downtrend = before < shift(self.close, 1 + TREND_BARS)
+
+    def prev(self, name: str, bars: int = 1) -> np.ndarray:
+        """A measurement `bars` bars back; False/NaN before the series starts"""
+        values = getattr(self, name)
+        if values.dtype != bool:
+            return shift(values, bars)
+        out = np.zeros(len(values), dtype=bool)
+        if bars < len(values):
+            out[bars:] = values[:len(values) - bars]
+        return out
+
+    @classmethod
+    def from_bars(cls, bars: pd.DataFrame) -> "Candles":
+        return cls(bars["Open"].to_numpy(), bars["High"].to_numpy(), bars["Low"].to_numpy(),
+                   bars["Close"].to_numpy())
+
+
+class Pattern(NamedTuple):
+    name: str
+    signal: int  # 1 bullish, -1 bearish, 0 indecision
+    detect: Callable[[Candles], np.ndarray]
+
+
+def _hammer_shape(c: Candles) -> np.ndarray:
+    return (c.lower >= 2 * c.size) & (c.upper <= c.size)
+
+
+def _inverted_shape(c: Candles) -> np.ndarray:
+    return (c.upper >= 2 * c.size) & (c.lower <= c.size)
+
+
+def _engulfing(c: Candles, bullish: bool) -> np.ndarray:
+    now, before = ("bullish", "bearish") if bullish else ("bearish", "bullish")
+    return getattr(c, now) & c.prev(before) & (c.top >= c.prev("top")) & (c.bottom <= c.prev("bottom")) \
+        & (c.size > c.prev("size"))
+
+
+def _harami(c: Candles, bullish: bool) -> np.ndarray:
+    now, before = ("bullish", "bearish") if bullish else ("bearish", "bullish")
+    return getattr(c, now) & c.prev(before) & c.prev("long") & (c.top < c.prev("top")) \
+        & (c.bottom > c.prev("bottom"))
+
+
+def _star(c: Candles, bullish: bool) -> np.ndarray:
+    first, last = ("bearish", "bullish") if bullish else ("bullish", "bearish")
+    small = c.prev("size") <= 0.5 * c.prev("size", 2)
+    if bullish:
+        gap = c.prev("top") < c.prev("close", 2)
+        recovers = c.close > c.prev("midpoint", 2)
+    else:
+        gap = c.prev("bottom") > c.prev("close", 2)
+        recovers = c.close < c.prev("midpoint", 2)
+    return c.prev(first, 2) & c.prev("long", 2) & small & gap & getattr(c, last) & recovers
+
+
+def _three_in_a_row(c: Candles, bullish: bool) -> np.ndarray:
+    side = "bullish" if bullish else "bearish"
+    hit = np.ones(len(c.close), dtype=bool)
+    for back in (0, 1):
+        step = c.prev(side, back) & c.prev("long", back)
+        if bullish:
+            # Each opens inside the previous body and closes higher, near its high
+            step &= (c.prev("close", back) > c.prev("close", back + 1)) \
+                & (c.prev("open", back) > c.prev("open", back + 1)) \
+                & (c.prev("open", back) < c.prev("close", back + 1)) \
+                & (c.prev("upper", back) <= 0.3 * c.prev("size", back))
+        else:
+            step &= (c.prev("close", back) < c.prev("close", back + 1)) \
+                & (c.prev("open", back) < c.prev("open", back + 1)) \
+                & (c.prev("open", back) > c.prev("close", back + 1)) \
+                & (c.prev("lower", back) <= 0.3 * c.prev("size", back))
+        hit &= step
+    return hit & c.prev(side, 2) & c.prev("long", 2)
+
+
+# The catalogue; a pattern's bit in the mask is its position here, so only append
+PATTERNS: List[Pattern] = [
+    Pattern("doji", 0, lambda c: c.doji),
+    Pattern("hammer", 1, lambda c: _hammer_shape(c) & c.downtrend),
+    Pattern("hanging_man", -1, lambda c: _hammer_shape(c) & c.uptrend),
+    Pattern("inverted_hammer", 1, lambda c: _inverted_shape(c) & c.downtrend),
+    Pattern("shooting_star", -1, lambda c: _inverted_shape(c) & c.uptrend),
+    Pattern("dragonfly_doji", 1, lambda c: c.doji & (c.range > 0) & (c.upper <= 0.1 * c.range)),
+    Pattern("gravestone_doji", -1, lambda c: c.doji & (c.range > 0) & (c.lower <= 0.1 * c.range)),
+    Pattern("spinning_top", 0, lambda c: ~c.doji & (c.size <= 0.3 * c.range) & (c.upper > c.size)
+            & (c.lower > c.size)),
+    Pattern("bullish_marubozu", 1, lambda c: c.bullish & (c.range > 0) & (c.upper <= 0.05 * c.range)
+            & (c.lower <= 0.05 * c.range)),
+    Pattern("bearish_marubozu", -1, lambda c: c.bearish & (c.range > 0) & (c.upper <= 0.05 * c.range)
+            & (c.lower <= 0.05 * c.range)),
+    Pattern("bullish_engulfing", 1, lambda c: _engulfing(c, True)),
+    Pattern("bearish_engulfing", -1, lambda c: _engulfing(c, False)),
+    Pattern("bullish_harami", 1, lambda c: _harami(c, True)),
+    Pattern("bearish_harami", -1, lambda c: _harami(c, False)),
+    Pattern("piercing_line", 1, lambda c: c.bullish & c.prev("bearish") & c.prev("long")
+            & (c.open < c.prev("close")) & (c.close > c.prev("midpoint")) & (c.close < c.prev("open"))),
+    Pattern("dark_cloud_cover", -1, lambda c: c.bearish & c.prev("bullish") & c.prev("long")
+            & (c.open > c.prev("close")) & (c.close < c.prev("midpoint")) & (c.close > c.prev("open"))),
+    Pattern("morning_star", 1, lambda c: _star(c, True)),
+    Pattern("evening_star", -1, lambda c: _star(c, False)),
+    Pattern("three_white_soldiers", 1, lambda c: _three_in_a_row(c, True)),
+    Pattern("three_black_crows", -1, lambda c: _three_in_a_row(c, False)),
+]
+
+PATTERN_BITS: Dict[str, int] = {pattern.name: bit for bit, pattern in enumerate(PATTERNS)}
+PATTERN_SIGNALS: Dict[str, int] = {pattern.name: pattern.signal for pattern in PATTERNS}
+
+
+def pattern_mask(candles: Candles) -> np.ndarray:
+    """uint64 per bar, bit PATTERN_BITS[name] set where that pattern completes on the bar"""
+    mask = np.zeros(len(candles.close), dtype=np.uint64)
+    with np.errstate(invalid="ignore"):
+        for bit, pattern in enumerate(PATTERNS):
+            mask |= pattern.detect(candles).astype(np.uint64) << np.uint64(bit)
+    return mask
+
+
+def decode(mask: np.ndarray, start: int = 0) -> Dict[str, List[int]]:
+    """
+    Indices of the bars each pattern matched, from `start` on
+
+    Only bars with a non-zero mask are unpacked, and their set bits are
+    grouped by pattern with one stable sort, so patterns without hits
+    cost nothing.
+    """
+    hits = np.flatnonzero(mask[start:]) + start
+    if not len(hits):
+        return {}
+    # Little-endian bytes, unpacked least significant bit first: column b is bit b
+    bits = np.unpackbits(mask[hits].astype("<u8").view(np.uint8).reshape(-1, 8), axis=1,
+                         bitorder="little")[:, :len(PATTERNS)]
+    rows, columns = np.nonzero(bits)
+    order = np.argsort(columns, kind="stable")
+    columns, bars = columns[order], hits[rows[order]]
+    bounds = np.flatnonzero(np.diff(columns)) + 1
+    return {
+        PATTERNS[group[0]].name: indices.tolist()
+        for group, indices in zip(np.split(columns, bounds), np.split(bars, bounds))
+    }
@@ -5,7 +5,12 @@ import pandas as pd
 import numpy as np
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-import yfinance as yf
+from app.services.data_service import DataService
+from app.services.indicator_engine import IndicatorEngine
+from app.services.periods import bars_since
+from app.services.serialization import COLUMNAR, candle_columns, candle_records, columns_to_records, epoch_seconds
+
+data_service = DataService()
 
 
 class ChartingService:
@@ -22,17 +27,13 @@ class ChartingService:
             interval: Data interval (1m, 5m, 15m, 30m, 60m, 1d, 1wk, 1mo)
         """
         try:
-            data = yf.download(symbol, period=period, interval=interval, progress=False)
+            data = data_service.get_history(symbol, period=period, interval=interval)
             if data.empty:
                 return pd.DataFrame()
             
             # Reset index to convert datetime index to column
             data = data.reset_index()
             
-            # Handle column naming - yfinance may use 'Date' or 'Datetime'
-            if 'Datetime' in data.columns:
-                data.rename(columns={'Datetime': 'Date'}, inplace=True)
-            
             # Add volume if not present
             if "Volume" not in data.columns:
                 data["Volume"] = 0
@@ -43,89 +44,63 @@ class ChartingService:
             return pd.DataFrame()
     
     @staticmethod
-    def get_candlestick_data(symbol: str, period: str = "1mo") -> List[Dict]:
-        """Format data for candlestick chart"""
+    def get_candlestick_data(symbol: str, period: str = "1mo", format: str = "rows",
+                             since: Optional[pd.Timestamp] = None):
+        """Format data for candlestick chart
+        
+        format="columnar" returns parallel time/open/high/low/close/volume arrays
+        instead of one dict per candle; since limits it to candles from that time on
+        """
         df = ChartingService.get_ohlc_data(symbol, period, "1d")
         if df.empty:
-            return []
-        
-        candlesticks = []
-        for idx, row in df.iterrows():
-            try:
-                # Handle both Date and Datetime column names
-                date_col = 'Date' if 'Date' in row.index else 'Datetime'
-                date_val = row[date_col]
-                
-                # Convert to timestamp
-                if hasattr(date_val, 'timestamp'):
-                    timestamp = int(date_val.timestamp())
-                else:
-                    timestamp = int(pd.Timestamp(date_val).timestamp())
-                
-                candlesticks.append({
-                    "time": timestamp,
-                    "open": float(row["Open"]),
-                    "high": float(row["High"]),
-                    "low": float(row["Low"]),
-                    "close": float(row["Close"]),
-                    "volume": float(row.get("Volume", 0))
-                })
-            except Exception as e:
-                print(f"Error processing row {idx}: {e}")
-                continue
+            return candle_columns(df) if format == COLUMNAR else []
         
-        return candlesticks
+        bars = bars_since(df.set_index("Date"), since)
+        return candle_columns(bars) if format == COLUMNAR else candle_records(bars)
     
     @staticmethod
-    def get_heikin_ashi(symbol: str, period: str = "1mo") -> List[Dict]:
-        """Calculate Heikin Ashi candlesticks"""
+    def get_heikin_ashi(symbol: str, period: str = "1mo", format: str = "rows",
+                        since: Optional[pd.Timestamp] = None):
+        """Calculate Heikin Ashi candlesticks; since limits the result to candles from that time on"""
         df = ChartingService.get_ohlc_data(symbol, period, "1d")
         if df.empty:
-            return []
-        
-        df = df.copy()
-        df["HA_Close"] = (df["Open"] + df["High"] + df["Low"] + df["Close"]) / 4
-        
-        df["HA_Open"] = 0.0
-        df.loc[0, "HA_Open"] = (df.loc[0, "Open"] + df.loc[0, "Close"]) / 2
-        
-        for i in range(1, len(df)):
-            df.loc[i, "HA_Open"] = (df.loc[i-1, "HA_Open"] + df.loc[i-1, "HA_Close"]) / 2
-        
-        df["HA_High"] = df[["HA_Open", "HA_Close", "High"]].max(axis=1)
-        df["HA_Low"] = df[["HA_Open", "HA_Close", "Low"]].min(axis=1)
-        
-        ha_candles = []
-        for _, row in df.iterrows():
-            ha_candles.append({
-                "time": int(pd.Timestamp(row["Date"]).timestamp()),
-                "open": float(row["HA_Open"]),
-                "high": float(row["HA_High"]),
-                "low": float(row["HA_Low"]),
-                "close": float(row["HA_Close"]),
-                "volume": float(row.get("Volume", 0))
-            })
-        return ha_candles
+            return candle_columns(df) if format == COLUMNAR else []
+        
+        ha = IndicatorEngine.from_bars(df).heikin_ashi()
+        ha_bars = pd.DataFrame({
+            "Open": ha["open"],
+            "High": ha["high"],
+            "Low": ha["low"],
+            "Close": ha["close"],
+            "Volume": df["Volume"].to_numpy()
+        }, index=pd.DatetimeIndex(df["Date"]))
+        # Each HA open depends on the previous candle, so the whole window is computed before slicing
+        ha_bars = bars_since(ha_bars, since)
+        return candle_columns(ha_bars) if format == COLUMNAR else candle_records(ha_bars)
     
     @staticmethod
-    def compare_stocks(symbols: List[str], period: str = "1mo") -> Dict[str, List[Dict]]:
+    def compare_stocks(symbols: List[str], period: str = "1mo", format: str = "rows") -> Dict[str, Any]:
         """Get data for comparing multiple stocks"""
         comparison = {}
+        panel = data_service.get_many(symbols, period, "1d")
+        available = set(panel.columns.get_level_values(0))
         for symbol in symbols:
-            df = ChartingService.get_ohlc_data(symbol, period, "1d")
+            if symbol.upper() not in available:
+                continue
+            df = panel[symbol.upper()].dropna(subset=["Close"]).reset_index()
             if not df.empty:
                 # Normalize to percentage change from first close
-                first_close = df.iloc[0]["Close"]
-                df["PctChange"] = ((df["Close"] - first_close) / first_close * 100)
+                closes = df["Close"].to_numpy(dtype=np.float64)
+                columns = {
+                    "time": epoch_seconds(df["Date"]).tolist(),
+                    "close": closes.tolist(),
+                    "pctChange": ((closes - closes[0]) / closes[0] * 100).tolist()
+                }
                 
-                comparison[symbol] = [
-                    {
-                        "time": int(pd.Timestamp(row["Date"]).timestamp()),
-                        "close": float(row["Close"]),
-                        "pctChange": float(row["PctChange"])
-                    }
-                    for _, row in df.iterrows()
-                ]
+                if format == COLUMNAR:
+                    comparison[symbol] = columns
+                else:
+                    comparison[symbol] = columns_to_records(columns)
         return comparison
     
     @staticmethod
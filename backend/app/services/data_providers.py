@@ -0,0 +1,420 @@
+"""
+Pluggable market data providers used by DataService
+"""
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from app.services.bar_store import BAR_COLUMNS
+from app.services.periods import RESAMPLE_RULES, align_tz, period_start, resample_bars, slice_period
+
+INTRADAY_STEPS = {
+    "1m": "1min", "2m": "2min", "5m": "5min", "15m": "15min",
+    "30m": "30min", "60m": "60min", "90m": "90min", "1h": "60min",
+}
+
+
+def normalise_bars(hist: pd.DataFrame) -> pd.DataFrame:
+    """Keep the bar store columns of a provider frame and drop empty rows"""
+    if hist.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    hist = hist.copy()
+    if "Volume" not in hist.columns:
+        hist["Volume"] = 0
+    hist = hist[BAR_COLUMNS].dropna(subset=["Close"])
+    hist.index.name = "Date"
+    return hist
+
+
+class DataProvider(ABC):
+    """
+    Interface for upstream market data
+
+    history() and history_many() return frames in the bar store layout:
+    a DatetimeIndex named "Date" and Open/High/Low/Close/Volume columns.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def history(self, symbol: str, interval: str = "1d", period: Optional[str] = None,
+                start=None, end=None) -> pd.DataFrame:
+        """Bars for one symbol over a period or from start to end"""
+
+    def history_many(self, symbols: List[str], interval: str = "1d", period: Optional[str] = None,
+                     start=None) -> Dict[str, pd.DataFrame]:
+        """Bars for several symbols; providers with a grouped endpoint override this"""
+        fetched = {}
+        for symbol in symbols:
+            bars = self.history(symbol, interval, period=period, start=start)
+            if not bars.empty:
+                fetched[symbol] = bars
+        return fetched
+
+    @abstractmethod
+    def info(self, symbol: str) -> Dict:
+        """Company profile and fundamentals in yfinance's info layout"""
+
+    @abstractmethod
+    def quote(self, symbol: str) -> Dict:
+        """Latest price, change, change_percent and volume"""
+
+
+class YFinanceProvider(DataProvider):
+    """Live data from Yahoo Finance"""
+
+    name = "yfinance"
+
+    def __init__(self, batch_size: Optional[int] = None):
+        self.batch_size = batch_size or int(os.getenv("BATCH_DOWNLOAD_SIZE", "100"))
+
+    def history(self, symbol: str, interval: str = "1d", period: Optional[str] = None,
+                start=None, end=None) -> pd.DataFrame:
+        ticker = yf.Ticker(symbol)
+        if start is not None:
+            hist = ticker.history(start=start, end=end, interval=interval)
+        else:
+            hist = ticker.history(period=period or "1y", interval=interval)
+        return normalise_bars(hist)
+
+    def history_many(self, symbols: List[str], interval: str = "1d", period: Optional[str] = None,
+                     start=None) -> Dict[str, pd.DataFrame]:
+        """Grouped downloads of batch_size symbols per request"""
+        fetched = {}
+        for i in range(0, len(symbols), self.batch_size):
+            chunk = symbols[i:i + self.batch_size]
+            if start is not None:
+                raw = yf.download(chunk, start=start, interval=interval, group_by="ticker",
+                                  auto_adjust=True, progress=False, threads=True)
+            else:
+                raw = yf.download(chunk, period=period or "1y", interval=interval, group_by="ticker",
+                                  auto_adjust=True, progress=False, threads=True)
+            if raw.empty:
+                continue
+
+            if not isinstance(raw.columns, pd.MultiIndex):
+                # Older yfinance returns flat columns for a single ticker
+                raw = pd.concat({chunk[0]: raw}, axis=1)
+
+            tickers = set(raw.columns.get_level_values(0))
+            for symbol in chunk:
+                if symbol in tickers:
+                    fetched[symbol] = normalise_bars(raw[symbol])
+        return fetched
+
+    def info(self, symbol: str) -> Dict:
+        return yf.Ticker(symbol).info
+
+    def quote(self, symbol: str) -> Dict:
+        ticker = yf.Ticker(symbol)
+        hist = ticker.history(period="1d")
+
+        if hist.empty:
+            return {"error": f"No data found for {symbol}"}
+
+        current_price = float(hist['Close'].iloc[-1])
+
+        try:
+            info = ticker.info
+            change = info.get("regularMarketChange", 0)
+            change_percent = info.get("regularMarketChangePercent", 0)
+            volume = info.get("regularMarketVolume", int(hist['Volume'].iloc[-1]))
+        except:
+            # Fallback calculation
+            prev_price = float(hist['Close'].iloc[-2]) if len(hist) > 1 else current_price
+            change = current_price - prev_price
+            change_percent = (change / prev_price) * 100 if prev_price != 0 else 0
+            volume = int(hist['Volume'].iloc[-1])
+
+        return {
+            "price": current_price,
+            "change": change,
+            "change_percent": change_percent,
+            "volume": volume
+        }
+
+
+def _symbol_seed(symbol: str, salt: int = 0) -> int:
+    """Stable per-symbol seed (Python's hash() is randomised per process)"""
+    return zlib.crc32(symbol.upper().encode()) ^ salt
+
+
+SYNTHETIC_EPOCH = pd.Timestamp("2000-01-03", tz="America/New_York")
+SYNTHETIC_HORIZON = pd.Timestamp("2035-12-31", tz="America/New_York")
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)
+SESSION_CLOSE = pd.Timedelta(hours=16)
+
+
+@lru_cache(maxsize=512)
+def _daily_gbm(symbol: str, seed: int) -> pd.DataFrame:
+    """Whole synthetic daily history of a symbol, identical for every caller"""
+    rng = np.random.default_rng(_symbol_seed(symbol, seed))
+    dates = pd.bdate_range(SYNTHETIC_EPOCH, SYNTHETIC_HORIZON, name="Date")
+    n = len(dates)
+
+    start_price = rng.uniform(20, 500)
+    mu = rng.uniform(-0.02, 0.15)
+    sigma = rng.uniform(0.15, 0.45)
+    dt = 1 / 252
+
+    log_returns = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * rng.standard_normal(n)
+    close = start_price * np.exp(np.cumsum(log_returns))
+    prev_close = np.concatenate(([start_price], close[:-1]))
+    open_ = prev_close * np.exp(0.2 * sigma * np.sqrt(dt) * rng.standard_normal(n))
+    wick = np.abs(rng.standard_normal((2, n))) * 0.5 * sigma * np.sqrt(dt)
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    base_volume = rng.uniform(1e6, 5e7)
+    volume = np.round(base_volume * rng.lognormal(0, 0.4, n) * (1 + 20 * np.abs(log_returns)))
+
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume.astype(np.int64)},
+        index=dates
+    )
+
+
+def generate_gbm_bars(symbol: str, interval: str = "1d", start=None, end=None, seed: int = 0,
+                      now: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Deterministic geometric Brownian motion OHLCV bars
+
+    A given (symbol, seed) always produces the same bar for the same
+    timestamp, whatever window is requested, so stores built from replayed
+    data stay consistent across runs. Intraday bars are Brownian bridges
+    from each synthetic session's open to its close over 09:30-16:00.
+    Bars after `now` are never returned.
+    """
+    now = now or pd.Timestamp.now(tz="America/New_York")
+    daily = _daily_gbm(symbol.upper(), seed)
+    start = pd.Timestamp(start) if start is not None else SYNTHETIC_EPOCH
+    end = pd.Timestamp(end) if end is not None else now
+    start = start.tz_localize("America/New_York") if start.tzinfo is None else start.tz_convert("America/New_York")
+    end = end.tz_localize("America/New_York") if end.tzinfo is None else end.tz_convert("America/New_York")
+    end = min(end, now)
+
+    if interval in INTRADAY_STEPS:
+        return _intraday_gbm(symbol.upper(), daily, INTRADAY_STEPS[interval], start, end, seed)
+
+    bars = daily[(daily.index >= start.normalize()) & (daily.index + SESSION_OPEN <= end)]
+    if not bars.empty and bars.index[-1] + SESSION_CLOSE > end:
+        # The session is still open: build its bar from the minutes so far
+        minutes = _intraday_gbm(symbol.upper(), daily, "1min", bars.index[-1], end, seed)
+        bars = bars.iloc[:-1]
+        if not minutes.empty:
+            live = pd.DataFrame({
+                "Open": [minutes["Open"].iloc[0]],
+                "High": [minutes["High"].max()],
+                "Low": [minutes["Low"].min()],
+                "Close": [minutes["Close"].iloc[-1]],
+                "Volume": [int(minutes["Volume"].sum())]
+            }, index=pd.DatetimeIndex([minutes.index[0].normalize()], name="Date"))
+            bars = pd.concat([bars, live])
+    if interval in RESAMPLE_RULES:
+        bars = resample_bars(bars, interval)
+    return bars
+
+
+def _intraday_gbm(symbol: str, daily: pd.DataFrame, step: str, start: pd.Timestamp,
+                  end: pd.Timestamp, seed: int) -> pd.DataFrame:
+    sessions = daily[(daily.index >= start.normalize()) & (daily.index <= end)]
+    frames = []
+    for day, row in sessions.iterrows():
+        times = pd.date_range(day + SESSION_OPEN, day + SESSION_CLOSE,
+                              freq=step, inclusive="left", name="Date")
+        n = len(times)
+        rng = np.random.default_rng(_symbol_seed(symbol, seed ^ int(day.strftime("%Y%m%d"))))
+
+        # Brownian bridge from the open to the day's close
+        target = np.log(row["Close"] / row["Open"])
+        steps = rng.standard_normal(n) * abs(np.log(row["High"] / row["Low"])) / np.sqrt(n)
+        walk = np.cumsum(steps)
+        walk -= np.linspace(1 / n, 1, n) * (walk[-1] - target)
+        close = row["Open"] * np.exp(walk)
+        open_ = np.concatenate(([row["Open"]], close[:-1]))
+        wick = np.abs(rng.standard_normal((2, n))) * np.abs(steps).mean() * 0.5
+        volume = rng.dirichlet(np.ones(n)) * row["Volume"]
+
+        frames.append(pd.DataFrame({
+            "Open": open_,
+            "High": np.maximum(open_, close) * (1 + wick[0]),
+            "Low": np.minimum(open_, close) * (1 - wick[1]),
+            "Close": close,
+            "Volume": np.round(volume).astype(np.int64)
+        }, index=times))
+
+    if not frames:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    bars = pd.concat(frames)
+    return bars[(bars.index >= start) & (bars.index <= end)]
+
+
+class ReplayProvider(DataProvider):
+    """
+    Offline provider for load tests and CI
+
+    Serves recorded bars and info from REPLAY_DATA_DIR when present
+    (<dir>/<interval>/<SYMBOL>.parquet in the bar store layout and
+    <dir>/info/<SYMBOL>.json), and deterministic GBM data otherwise. Every
+    call sleeps for a simulated network latency so throughput measured
+    against it resembles production.
+    """
+
+    name = "replay"
+
+    def __init__(self, root: Optional[str] = None, latency_ms: Optional[float] = None,
+                 jitter_ms: Optional[float] = None, seed: Optional[int] = None):
+        self.root = root or os.getenv("REPLAY_DATA_DIR", "")
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("REPLAY_LATENCY_MS", "150"))
+        self.jitter_ms = jitter_ms if jitter_ms is not None else float(os.getenv("REPLAY_LATENCY_JITTER_MS", "50"))
+        self.seed = seed if seed is not None else int(os.getenv("REPLAY_SEED", "0"))
+        self._random = random.Random(self.seed)
+        self._random_lock = threading.Lock()
+
+    def _sleep(self, requests: int = 1) -> None:
+        """Simulated round trip(s); the jitter follows a log-normal like real networks do"""
+        if self.latency_ms <= 0:
+            return
+        with self._random_lock:
+            sigma = self.jitter_ms / self.latency_ms if self.latency_ms else 0
+            delay = sum(self.latency_ms * self._random.lognormvariate(0, sigma) for _ in range(requests))
+        time.sleep(delay / 1000)
+
+    def _recorded_bars(self, symbol: str, interval: str) -> Optional[pd.DataFrame]:
+        if not self.root:
+            return None
+        path = os.path.join(self.root, interval, f"{symbol.upper()}.parquet")
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def _bars(self, symbol: str, interval: str, period: Optional[str] = None, start=None,
+              end=None) -> pd.DataFrame:
+        recorded = self._recorded_bars(symbol, interval)
+        if recorded is not None:
+            bars = recorded
+            if start is not None:
+                bars = bars[bars.index >= align_tz(pd.Timestamp(start), bars.index)]
+            elif period:
+                bars = slice_period(bars, period)
+            if end is not None:
+                bars = bars[bars.index < align_tz(pd.Timestamp(end), bars.index)]
+            return normalise_bars(bars)
+
+        if start is None and period and period != "max":
+            start = period_start(period)
+        bars = generate_gbm_bars(symbol, interval, start=start, end=end, seed=self.seed)
+        if period and start is not None and period.endswith("d"):
+            bars = slice_period(bars, period)
+        return normalise_bars(bars)
+
+    def history(self, symbol: str, interval: str = "1d", period: Optional[str] = None,
+                start=None, end=None) -> pd.DataFrame:
+        self._sleep()
+        return self._bars(symbol, interval, period=period, start=start, end=end)
+
+    def history_many(self, symbols: List[str], interval: str = "1d", period: Optional[str] = None,
+                     start=None) -> Dict[str, pd.DataFrame]:
+        batch_size = int(os.getenv("BATCH_DOWNLOAD_SIZE", "100"))
+        self._sleep(requests=max(1, -(-len(symbols) // batch_size)))
+        fetched = {}
+        for symbol in symbols:
+            bars = self._bars(symbol, interval, period=period, start=start)
+            if not bars.empty:
+                fetched[symbol] = bars
+        return fetched
+
+    def info(self, symbol: str) -> Dict:
+        self._sleep()
+        symbol = symbol.upper()
+        if self.root:
+            path = os.path.join(self.root, "info", f"{symbol}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    return json.load(f)
+
+        rng = np.random.default_rng(_symbol_seed(symbol, self.seed ^ 0x1F0))
+        last = self._bars(symbol, "1d", period="1y")
+        price = float(last["Close"].iloc[-1]) if not last.empty else 0.0
+        shares = float(rng.uniform(1e8, 1e10))
+        return {
+            "symbol": symbol,
+            "longName": f"{symbol} Synthetic Holdings",
+            "exchange": "SYN",
+            "currentPrice": price,
+            "marketCap": int(price * shares),
+            "trailingPE": float(rng.uniform(5, 60)),
+            "dividendYield": float(rng.uniform(0, 0.04)),
+            "volume": int(last["Volume"].iloc[-1]) if not last.empty else 0,
+            "averageVolume": int(last["Volume"].mean()) if not last.empty else 0,
+            "fiftyTwoWeekHigh": float(last["High"].max()) if not last.empty else 0.0,
+            "fiftyTwoWeekLow": float(last["Low"].min()) if not last.empty else 0.0,
+            "beta": float(rng.uniform(0.5, 2.0)),
+            "sector": "Synthetic",
+            "industry": "Synthetic"
+        }
+
+    def quote(self, symbol: str) -> Dict:
+        self._sleep()
+        daily = self._bars(symbol, "1d", period="5d")
+        if daily.empty:
+            return {"error": f"No data found for {symbol}"}
+
+        # A still-open session's bar moves minute by minute, like a live quote
+        current_price = float(daily["Close"].iloc[-1])
+        prev_price = float(daily["Close"].iloc[-2]) if len(daily) > 1 else current_price
+        change = current_price - prev_price
+        return {
+            "price": current_price,
+            "change": change,
+            "change_percent": (change / prev_price) * 100 if prev_price != 0 else 0,
+            "volume": int(daily["Volume"].iloc[-1])
+        }
+
+    def save_bars(self, symbol: str, interval: str, bars: pd.DataFrame) -> None:
+        """Record bars (e.g. a copy of the bar store) for later replay"""
+        path = os.path.join(self.root, interval, f"{symbol.upper()}.parquet")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        normalise_bars(bars).to_parquet(path)
+
+    def save_info(self, symbol: str, info: Dict) -> None:
+        """Record a symbol's info for later replay"""
+        path = os.path.join(self.root, "info", f"{symbol.upper()}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(info, f, default=str)
+
+
+PROVIDERS = {
+    YFinanceProvider.name: YFinanceProvider,
+    ReplayProvider.name: ReplayProvider,
+}
+
+_provider: Optional[DataProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> DataProvider:
+    """Process-wide provider selected by the DATA_PROVIDER env var (default yfinance)"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            name = os.getenv("DATA_PROVIDER", YFinanceProvider.name)
+            if name not in PROVIDERS:
+                raise ValueError(f"Unknown data provider: {name}")
+            _provider = PROVIDERS[name]()
+        return _provider
+
+
+def set_provider(provider: DataProvider) -> None:
+    """Swap the process-wide provider, e.g. for a benchmark run"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
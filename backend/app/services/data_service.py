@@ -1,45 +1,306 @@
-import yfinance as yf
 import pandas as pd
 from typing import Dict, List, Optional
 import os
+import re
 from datetime import datetime, timedelta
+from app.services.bar_store import bar_store, BAR_COLUMNS
+from app.services.data_providers import DataProvider, get_provider
+from app.services.periods import (
+    INTRADAY_INTERVALS, RESAMPLE_RULES, align_tz, bars_since, bin_start, finer_intervals,
+    lookback_start, period_start, resample_bars, slice_period
+)
+from app.services.quote_cache import quote_cache
+from app.services.serialization import COLUMNAR, candle_columns, history_records
+from app.services.symbol_index import symbol_index
+
+# How long stored bars are trusted before upstream is asked for newer ones
+REFRESH_SECONDS = {
+    "intraday": int(os.getenv("BAR_REFRESH_INTRADAY_SECONDS", "60")),
+    "daily": int(os.getenv("BAR_REFRESH_DAILY_SECONDS", "900")),
+}
+
+
+def _covered_key(start: Optional[pd.Timestamp]) -> str:
+    return "max" if start is None else start.tz_convert("UTC").isoformat()
+
+
+def _slice_window(bars: pd.DataFrame, period: str, start: Optional[pd.Timestamp],
+                  end: Optional[pd.Timestamp]) -> pd.DataFrame:
+    """Cut stored bars to an explicit start/end window, or to a period"""
+    if bars.empty:
+        return bars
+    if start is not None:
+        bars = bars[bars.index >= align_tz(start, bars.index)]
+    else:
+        bars = slice_period(bars, period)
+    if end is not None:
+        bars = bars[bars.index < align_tz(end, bars.index)]
+    return bars
+
 
 class DataService:
-    def __init__(self):
+    def __init__(self, provider: Optional[DataProvider] = None):
         self.alpha_vantage_key = os.getenv("ALPHA_VANTAGE_KEY")
         self.polygon_key = os.getenv("POLYGON_KEY")
+        self._provider = provider
+    
+    @property
+    def provider(self) -> DataProvider:
+        """Upstream data source; the process-wide DATA_PROVIDER unless one was injected"""
+        return self._provider or get_provider()
+    
+    def _missing_bars(self, symbol: str, interval: str, bars: pd.DataFrame,
+                      want_from: Optional[pd.Timestamp], want_to: Optional[pd.Timestamp]) -> Optional[str]:
+        """
+        What the store lacks for a request: "full" when it doesn't reach back to
+        want_from, "latest" when newer bars may exist upstream, None otherwise
+        """
+        covered_from = bars.attrs.get("covered_from")
+        covered = not bars.empty and covered_from is not None and (
+            covered_from == "max" or (want_from is not None and covered_from <= _covered_key(want_from))
+        )
+        if not covered:
+            return "full"
+        
+        if want_to is not None and align_tz(want_to, bars.index) <= bars.index[-1]:
+            return None
+        ttl = REFRESH_SECONDS["intraday" if interval in INTRADAY_INTERVALS else "daily"]
+        if bar_store.checked_within(symbol, interval, ttl):
+            return None
+        return "latest"
     
-    def get_stock_data(self, symbol: str, period: str = "1y") -> Dict:
-        """Fetch stock data using yfinance"""
+    def _source_interval(self, symbol: str, interval: str, want_from: Optional[pd.Timestamp],
+                         want_to: Optional[pd.Timestamp]) -> str:
+        """
+        Interval to serve an intraday request from: the requested one if the
+        store covers the window, else a finer stored interval that does
+        """
+        for candidate in [interval] + finer_intervals(interval):
+            bars = bar_store.read(symbol, candidate)
+            if self._missing_bars(symbol, candidate, bars, want_from, want_to) != "full":
+                return candidate
+        return interval
+    
+    def _load_bars(self, symbol: str, interval: str, want_from: Optional[pd.Timestamp],
+                   want_to: Optional[pd.Timestamp], period: Optional[str] = None) -> pd.DataFrame:
+        """
+        Stored bars for a window, fetching from upstream only what the store lacks
+        
+        A store that starts too late only has the older gap downloaded; one
+        that may be stale only has the bars since its last one downloaded.
+        A full download uses `period` when given, else starts at want_from.
+        """
+        with bar_store.lock(symbol, interval):
+            bars = bar_store.read(symbol, interval)
+            missing = self._missing_bars(symbol, interval, bars, want_from, want_to)
+            
+            try:
+                if missing == "full" and not bars.empty and want_from is not None:
+                    # Only the bars older than the stored range are missing
+                    fetched = self.provider.history(symbol, interval, start=want_from, end=bars.index[0])
+                    bars = bar_store.append(symbol, interval, fetched, covered_from=_covered_key(want_from))
+                    missing = self._missing_bars(symbol, interval, bars, want_from, want_to)
+                elif missing == "full":
+                    if period:
+                        fetched = self.provider.history(symbol, interval, period=period)
+                    elif want_from is not None:
+                        fetched = self.provider.history(symbol, interval, start=want_from)
+                    else:
+                        fetched = self.provider.history(symbol, interval, period="max")
+                    if not fetched.empty:
+                        bars = bar_store.append(symbol, interval, fetched, covered_from=_covered_key(want_from))
+                        bar_store.mark_checked(symbol, interval)
+                    missing = None
+                if missing == "latest":
+                    fetched = self.provider.history(symbol, interval, start=bars.index[-1])
+                    if not fetched.empty:
+                        bars = bar_store.append(symbol, interval, fetched)
+                    bar_store.mark_checked(symbol, interval)
+            except Exception as e:
+                print(f"Error fetching history for {symbol}: {e}")
+        
+        return bars
+    
+    def get_history(self, symbol: str, period: str = "1y", interval: str = "1d",
+                    start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Get OHLCV bars through the local bar store
+        
+        Requests are planned against what is already stored so upstream is
+        only asked for bars the store lacks:
+        - a shorter window is sliced out of a wider stored range
+        - 1wk/1mo/3mo bars are resampled from stored daily bars
+        - intraday bars are resampled from a finer stored interval when the
+          requested one isn't stored for the window (15m from 5m or 1m, ...)
+        
+        Args:
+            symbol: Stock ticker symbol
+            period: Time period (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max)
+            interval: Data interval (1m, 5m, 15m, 30m, 60m, 1d, 1wk, 1mo)
+            start: Optional start date (YYYY-MM-DD), overrides period
+            end: Optional end date (YYYY-MM-DD), exclusive
+        """
+        symbol = symbol.upper()
+        want_from = pd.Timestamp(start, tz="UTC") if start else period_start(period)
+        want_to = pd.Timestamp(end, tz="UTC") if end else None
+        
+        if interval in RESAMPLE_RULES:
+            # Widen to whole bins so the first weekly/monthly bar isn't partial
+            daily_from = bin_start(want_from, interval) if want_from is not None else None
+            daily = self._load_bars(symbol, "1d", daily_from, want_to)
+            return resample_bars(_slice_window(daily, "max", daily_from, want_to), interval)
+        
+        source = self._source_interval(symbol, interval, want_from, want_to)
+        bars = self._load_bars(symbol, source, want_from, want_to, period=None if start else period)
+        bars = _slice_window(bars, period, want_from if start else None, want_to)
+        return resample_bars(bars, interval) if source != interval else bars
+    
+    def get_window(self, symbol: str, period: str = "1mo", warmup: int = 0, interval: str = "1d",
+                   last: Optional[int] = None) -> pd.DataFrame:
+        """
+        Bars for a display window plus the warm-up bars an indicator needs before it
+        
+        Args:
+            symbol: Stock ticker symbol
+            period: Display window (see get_history)
+            warmup: Bars required before the first displayed bar
+            interval: Bar interval; 1wk/1mo/3mo aren't supported
+            last: Display only the last `last` bars instead of the period
+        
+        Exactly `warmup` bars precede the display window when the store has
+        them. attrs["warmup"] tells how many leading bars are warm-up, so
+        results for them can be dropped.
+        """
+        if interval in RESAMPLE_RULES:
+            raise ValueError(f"Warm-up windows need a stored interval, not {interval}")
+        symbol = symbol.upper()
+        now = pd.Timestamp.now(tz="UTC")
+        display_from = None if last is not None else period_start(period, now)
+        if last is not None:
+            want_from = lookback_start(now, last + warmup, interval)
+        elif display_from is not None:
+            want_from = lookback_start(display_from, warmup, interval)
+        else:
+            want_from = None
+        
+        bars = self._load_bars(symbol, interval, want_from, None)
+        if bars.empty:
+            return bars
+        if last is not None:
+            first_display = max(len(bars) - last, 0)
+        else:
+            first_display = len(bars) - len(slice_period(bars, period))
+        start = max(first_display - warmup, 0)
+        window = bars.iloc[start:].copy()
+        window.attrs["warmup"] = first_display - start
+        return window
+    
+    def get_many(self, symbols: List[str], period: str = "1y", interval: str = "1d",
+                 start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Get OHLCV bars for several symbols as one date-aligned panel
+        
+        Symbols the store can't serve are requested together through the
+        provider's history_many (for yfinance, one grouped download per
+        BATCH_DOWNLOAD_SIZE symbols), once for full histories and once for
+        latest bars, instead of a request per symbol.
+        
+        Returns a DataFrame indexed by Date with (symbol, field) MultiIndex
+        columns; use panel[symbol] to get one symbol's bars. Dates a symbol
+        has no bar for are NaN.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        want_from = pd.Timestamp(start, tz="UTC") if start else period_start(period)
+        want_to = pd.Timestamp(end, tz="UTC") if end else None
+        
+        if interval in RESAMPLE_RULES:
+            daily_from = bin_start(want_from, interval) if want_from is not None else None
+            daily = self.get_many(symbols, "max", "1d", end=end,
+                                  start=daily_from.strftime("%Y-%m-%d") if daily_from is not None else None)
+            resampled = {
+                symbol: resample_bars(daily[symbol].dropna(subset=["Close"]), interval)
+                for symbol in daily.columns.get_level_values(0).unique()
+            }
+            if not resampled:
+                return daily
+            panel = pd.concat(resampled, axis=1).sort_index()
+            panel.index.name = "Date"
+            return panel
+        
+        frames = {}
+        need_full, need_latest = [], []
+        for symbol in symbols:
+            bars = bar_store.read(symbol, interval)
+            frames[symbol] = bars
+            missing = self._missing_bars(symbol, interval, bars, want_from, want_to)
+            if missing == "full":
+                need_full.append(symbol)
+            elif missing == "latest":
+                need_latest.append(symbol)
+        
+        try:
+            if need_full:
+                if start:
+                    fetched = self.provider.history_many(need_full, interval, start=start)
+                else:
+                    fetched = self.provider.history_many(need_full, interval, period=period)
+                for symbol, new_bars in fetched.items():
+                    if not new_bars.empty:
+                        frames[symbol] = bar_store.append(symbol, interval, new_bars,
+                                                          covered_from=_covered_key(want_from))
+                        bar_store.mark_checked(symbol, interval)
+            
+            if need_latest:
+                # One request from the oldest last bar; overlap is de-duplicated on append
+                since = min(frames[symbol].index[-1] for symbol in need_latest)
+                fetched = self.provider.history_many(need_latest, interval, start=since)
+                for symbol in need_latest:
+                    new_bars = fetched.get(symbol)
+                    if new_bars is not None and not new_bars.empty:
+                        frames[symbol] = bar_store.append(symbol, interval, new_bars)
+                    bar_store.mark_checked(symbol, interval)
+        except Exception as e:
+            print(f"Error fetching history for {len(symbols)} symbols: {e}")
+        
+        sliced = {}
+        for symbol in symbols:
+            bars = _slice_window(frames[symbol], period, want_from if start else None, want_to)
+            if not bars.empty:
+                sliced[symbol] = bars[BAR_COLUMNS]
+        
+        if not sliced:
+            return pd.DataFrame(columns=pd.MultiIndex.from_product([[], BAR_COLUMNS]))
+        panel = pd.concat(sliced, axis=1).sort_index()
+        panel.index.name = "Date"
+        return panel
+    
+    def get_stock_data(self, symbol: str, period: str = "1y", format: str = "rows",
+                       bars: Optional[pd.DataFrame] = None) -> Dict:
+        """Fetch stock data from the configured provider
+        
+        format="columnar" returns history as parallel time/open/high/low/close/volume arrays;
+        `bars`, when the caller already read the period's history, is used instead of reading it again
+        """
         try:
             print(f"Fetching data for {symbol} with period {period}")
-            ticker = yf.Ticker(symbol)
             
             # Get historical data
-            hist = ticker.history(period=period)
+            hist = bars if bars is not None else self.get_history(symbol, period)
             if hist.empty:
                 print(f"No historical data found for {symbol}")
                 return {"error": f"No data found for {symbol}"}
             
             # Get stock info
             try:
-                info = ticker.info
+                info = self.provider.info(symbol)
             except:
                 info = {}
             
             # Convert history to records
-            hist_reset = hist.reset_index()
-            history_records = []
-            
-            for _, row in hist_reset.iterrows():
-                history_records.append({
-                    "Date": row['Date'].strftime('%Y-%m-%d') if hasattr(row['Date'], 'strftime') else str(row['Date']),
-                    "Open": float(row['Open']),
-                    "High": float(row['High']),
-                    "Low": float(row['Low']),
-                    "Close": float(row['Close']),
-                    "Volume": int(row['Volume'])
-                })
+            if format == COLUMNAR:
+                history = candle_columns(hist)
+            else:
+                history = history_records(hist)
             
             current_price = float(hist['Close'].iloc[-1])
             prev_price = float(hist['Close'].iloc[-2]) if len(hist) > 1 else current_price
@@ -55,10 +316,10 @@ class DataService:
                 "market_cap": info.get("marketCap"),
                 "pe_ratio": info.get("trailingPE"),
                 "dividend_yield": info.get("dividendYield"),
-                "history": history_records
+                "history": history
             }
             
-            print(f"Successfully fetched {len(history_records)} records for {symbol}")
+            print(f"Successfully fetched {len(hist)} records for {symbol}")
             return result
             
         except Exception as e:
@@ -66,96 +327,125 @@ class DataService:
             return {"error": str(e)}
     
     def search_stocks(self, query: str) -> List[Dict]:
-        """Search for stocks by symbol"""
+        """Search for stocks by symbol or company name"""
         try:
-            # Common stock symbols for testing
-            common_stocks = {
-                "AAPL": "Apple Inc.",
-                "GOOGL": "Alphabet Inc.",
-                "MSFT": "Microsoft Corporation",
-                "TSLA": "Tesla Inc.",
-                "AMZN": "Amazon.com Inc.",
-                "META": "Meta Platforms Inc.",
-                "NVDA": "NVIDIA Corporation",
-                "NFLX": "Netflix Inc."
-            }
-            
-            results = []
-            query_upper = query.upper()
-            
-            # Check if query matches any common stocks
-            for symbol, name in common_stocks.items():
-                if query_upper in symbol or query_upper in name.upper():
-                    try:
-                        ticker = yf.Ticker(symbol)
-                        info = ticker.info
-                        results.append({
-                            "symbol": symbol,
-                            "name": name,
-                            "exchange": info.get("exchange", "NASDAQ"),
-                            "price": info.get("currentPrice", 0)
-                        })
-                    except:
-                        results.append({
-                            "symbol": symbol,
-                            "name": name,
-                            "exchange": "NASDAQ",
-                            "price": 0
-                        })
-            
-            # Also try the query as a direct symbol
-            if query_upper not in [r["symbol"] for r in results]:
+            query_upper = query.strip().upper()
+            listings = symbol_index.search(query, limit=5)
+
+            # Unknown listing: ask upstream once and remember the answer, found or not
+            if (not listings and re.fullmatch(r"[A-Z0-9.\-^=]{1,10}", query_upper)
+                    and not symbol_index.recently_missed(query_upper)):
                 try:
-                    ticker = yf.Ticker(query_upper)
-                    info = ticker.info
+                    info = self.provider.info(query_upper)
                     if info.get("longName"):
-                        results.append({
-                            "symbol": query_upper,
-                            "name": info.get("longName"),
-                            "exchange": info.get("exchange", "NASDAQ"),
-                            "price": info.get("currentPrice", 0)
-                        })
-                except:
-                    pass
-            
-            return results[:5]  # Limit to 5 results
-            
+                        symbol_index.add(query_upper, info["longName"], info.get("exchange", ""))
+                        listings = [symbol_index.get(query_upper)]
+                    else:
+                        symbol_index.add_miss(query_upper)
+                except Exception as e:
+                    print(f"Search lookup error for {query_upper}: {str(e)}")
+
+            results = []
+            for listing in listings:
+                # Prices only come from quotes already cached; search never fetches them
+                quote = quote_cache.peek(listing["symbol"])
+                results.append({
+                    "symbol": listing["symbol"],
+                    "name": listing["name"],
+                    "exchange": listing["exchange"] or "NASDAQ",
+                    "price": quote.get("price") if quote else None
+                })
+            return results
+
         except Exception as e:
             print(f"Search error: {str(e)}")
             return []
     
+    def get_history_delta(self, symbol: str, since: pd.Timestamp, period: str = "1y",
+                          format: str = "rows", bars: Optional[pd.DataFrame] = None) -> Dict:
+        """
+        Bars newer than a client's last bar, plus that bar as revised since
+        
+        Served from the bar store, so a live chart polling every few seconds
+        only costs a store read and a handful of serialized rows. `bars` is
+        the period's history when the caller already has it.
+        """
+        try:
+            bars = bars_since(bars if bars is not None else self.get_history(symbol, period), since)
+            history = candle_columns(bars) if format == COLUMNAR else history_records(bars)
+            return {"symbol": symbol, "since": since.isoformat(), "history": history}
+        except Exception as e:
+            print(f"Error fetching history delta for {symbol}: {str(e)}")
+            return {"error": str(e)}
+    
     def get_real_time_quote(self, symbol: str) -> Dict:
-        """Get real-time quote"""
+        """Get real-time quote, shared through the process-wide quote cache"""
+        return quote_cache.get(symbol, self._fetch_quote)
+    
+    def _fetch_quote(self, symbol: str) -> Dict:
+        """Fetch a quote from the configured provider"""
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period="1d")
-            
-            if hist.empty:
-                return {"error": f"No data found for {symbol}"}
-            
-            current_price = float(hist['Close'].iloc[-1])
-            
-            try:
-                info = ticker.info
-                change = info.get("regularMarketChange", 0)
-                change_percent = info.get("regularMarketChangePercent", 0)
-                volume = info.get("regularMarketVolume", int(hist['Volume'].iloc[-1]))
-            except:
-                # Fallback calculation
-                prev_price = float(hist['Close'].iloc[-2]) if len(hist) > 1 else current_price
-                change = current_price - prev_price
-                change_percent = (change / prev_price) * 100 if prev_price != 0 else 0
-                volume = int(hist['Volume'].iloc[-1])
+            quote = self.provider.quote(symbol)
+            if "error" in quote:
+                return quote
             
             return {
                 "symbol": symbol,
-                "price": current_price,
-                "change": change,
-                "change_percent": change_percent,
-                "volume": volume,
+                "price": quote["price"],
+                "change": quote["change"],
+                "change_percent": quote["change_percent"],
+                "volume": quote["volume"],
                 "timestamp": datetime.now().isoformat()
             }
             
         except Exception as e:
             print(f"Quote error for {symbol}: {str(e)}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+    
+    def get_many_quotes(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Get quotes for several symbols, fetching the uncached ones in one grouped download
+        
+        Batched quotes derive change from the previous close, like the
+        single-symbol fallback, and are stored in the shared quote cache.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        quotes = {}
+        missing = []
+        for symbol in symbols:
+            cached = quote_cache.peek(symbol)
+            if cached is not None:
+                quotes[symbol] = cached
+            else:
+                missing.append(symbol)
+        
+        if len(missing) == 1:
+            quotes[missing[0]] = self.get_real_time_quote(missing[0])
+        elif missing:
+            try:
+                fetched = self.provider.history_many(missing, "1d", period="5d")
+            except Exception as e:
+                print(f"Quote error for {len(missing)} symbols: {str(e)}")
+                fetched = {}
+            
+            for symbol in missing:
+                hist = fetched.get(symbol)
+                if hist is None or hist.empty:
+                    quotes[symbol] = {"error": f"No data found for {symbol}"}
+                    continue
+                
+                current_price = float(hist['Close'].iloc[-1])
+                prev_price = float(hist['Close'].iloc[-2]) if len(hist) > 1 else current_price
+                change = current_price - prev_price
+                quote = {
+                    "symbol": symbol,
+                    "price": current_price,
+                    "change": change,
+                    "change_percent": (change / prev_price) * 100 if prev_price != 0 else 0,
+                    "volume": int(hist['Volume'].iloc[-1]),
+                    "timestamp": datetime.now().isoformat()
+                }
+                quote_cache.put(symbol, quote)
+                quotes[symbol] = quote
+        
+        return {symbol: quotes[symbol] for symbol in symbols}
@@ -0,0 +1,82 @@
+"""
+ETags for responses computed from stored bars
+"""
+import hashlib
+from typing import Callable, Optional
+
+import pandas as pd
+from fastapi import Request, Response
+
+from app.services.request_frames import RequestFrames
+from app.services.upstream import run_upstream
+
+
+def bars_etag(bars: pd.DataFrame, *parts) -> str:
+    """
+    Strong ETag for a response built from `bars`
+
+    The last bar's values are hashed along with its timestamp because a bar
+    that is still forming changes without a new timestamp appearing.
+    """
+    last = bars.iloc[-1]
+    key = "|".join(
+        [str(part) for part in parts]
+        + [str(len(bars)), bars.index[-1].isoformat()]
+        + [repr(float(last[column])) for column in ("Open", "High", "Low", "Close", "Volume")]
+    )
+    return '"' + hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '"'
+
+
+def history_etag(request: Request, symbol: str, period: str = "1y", interval: str = "1d",
+                 frames: Optional[RequestFrames] = None, warmup: int = 0,
+                 version: Optional[Callable[[pd.DataFrame], str]] = None) -> Optional[str]:
+    """
+    ETag for a request answered from a symbol's bars, None when there are no bars
+
+    `version(bars)`, when given, names anything besides the bars that the
+    response depends on (e.g. which indicator source answers it).
+    """
+    bars = (frames or RequestFrames()).bars(symbol, period, interval, warmup)
+    if bars.empty:
+        return None
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    parts = [request.url.path, query, symbol.upper(), period, interval]
+    if version is not None:
+        parts.append(version(bars))
+    return bars_etag(bars, *parts)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names this ETag (weak comparison, as RFC 9110 asks)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def conditional_get(request: Request, response: Response, symbol: str, period: str = "1y",
+                          interval: str = "1d", frames: Optional[RequestFrames] = None,
+                          warmup: int = 0,
+                          version: Optional[Callable[[pd.DataFrame], str]] = None) -> Optional[Response]:
+    """
+    Tag a bars-backed GET response and short-circuit it when the client is current
+
+    Sets ETag on `response` and returns a 304 response when If-None-Match
+    already names it, so the route can skip computing its payload. Returns
+    None when the route should build the response as usual. Passing the
+    route's RequestFrames, and the warm-up its indicator reads with, lets
+    it reuse the bars read here; `version` is passed to history_etag.
+    """
+    etag = await run_upstream(history_etag, request, symbol, period, interval, frames, warmup, version)
+    if etag is None:
+        return None
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return None
@@ -0,0 +1,303 @@
+"""
+Indicator expressions such as "ema(close, 12) - ema(close, 26)"
+"""
+import ast
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple, Union
+
+import numpy as np
+
+from app.services.indicator_engine import (
+    IndicatorEngine, diff, ewm_mean, relative_strength, rolling_reduce, rolling_sum, shift
+)
+from app.services.serialization import widen
+
+MAX_EXPRESSION_LENGTH = 500
+MAX_WINDOW = 1000
+
+SOURCE_NAMES = ("open", "high", "low", "close", "volume")
+
+
+class ExpressionError(ValueError):
+    """An expression that can't be parsed or doesn't type-check"""
+
+
+class Node(NamedTuple):
+    """One DAG operation; args are node ids, except the literals of "const" and window sizes"""
+    op: str
+    args: Tuple
+
+
+def _window(args: Tuple) -> int:
+    return args[-1]
+
+
+# Functions: name -> (number of series arguments, takes a window, compute(engine, nodes, values, args))
+
+def _series(values: List, args: Tuple, position: int = 0):
+    return values[args[position]]
+
+
+def _source_of(nodes: List[Node], node_id: int):
+    """Source name when a node is a bare price/volume series, else None"""
+    node = nodes[node_id]
+    return node.args[0] if node.op == "source" else None
+
+
+def _sma(engine, nodes, values, args):
+    source = _source_of(nodes, args[0])
+    if source:
+        return engine.sma(_window(args), source)
+    return rolling_sum(_series(values, args), _window(args)) / _window(args)
+
+
+def _ema(engine, nodes, values, args):
+    source = _source_of(nodes, args[0])
+    if source:
+        return engine.ema(_window(args), source)
+    return ewm_mean(_series(values, args), _window(args))
+
+
+def _rsi(engine, nodes, values, args):
+    if _source_of(nodes, args[0]) == "close":
+        return engine.rsi(_window(args))
+    return relative_strength(_series(values, args), _window(args))
+
+
+def _rolling(method: str, reducer: Callable, **kwargs):
+    def compute(engine, nodes, values, args):
+        source = _source_of(nodes, args[0])
+        if source:
+            return getattr(engine, method)(_window(args), source)
+        return rolling_reduce(_series(values, args), _window(args), reducer, **kwargs)
+    return compute
+
+
+def _crossover(engine, nodes, values, args):
+    a, b = _series(values, args, 0), _series(values, args, 1)
+    return (a > b) & (shift(a, 1) <= shift(b, 1))
+
+
+def _crossunder(engine, nodes, values, args):
+    a, b = _series(values, args, 0), _series(values, args, 1)
+    return (a < b) & (shift(a, 1) >= shift(b, 1))
+
+
+FUNCTIONS: Dict[str, Tuple[int, bool, Callable]] = {
+    "sma": (1, True, _sma),
+    "ema": (1, True, _ema),
+    "rsi": (1, True, _rsi),
+    "std": (1, True, _rolling("rolling_std", np.std, ddof=1, dtype=np.float64)),
+    "highest": (1, True, _rolling("rolling_max", np.max)),
+    "lowest": (1, True, _rolling("rolling_min", np.min)),
+    "shift": (1, True, lambda engine, nodes, values, args: shift(_series(values, args), _window(args))),
+    "diff": (1, False, lambda engine, nodes, values, args: diff(_series(values, args))),
+    "abs": (1, False, lambda engine, nodes, values, args: np.abs(_series(values, args))),
+    "atr": (0, True, lambda engine, nodes, values, args: engine.atr(_window(args))),
+    "crossover": (2, False, _crossover),
+    "crossunder": (2, False, _crossunder),
+}
+
+BINARY_OPS = {
+    ast.Add: ("add", np.add),
+    ast.Sub: ("sub", np.subtract),
+    ast.Mult: ("mul", np.multiply),
+    ast.Div: ("div", np.divide),
+}
+
+COMPARE_OPS = {
+    ast.Lt: ("lt", np.less),
+    ast.LtE: ("le", np.less_equal),
+    ast.Gt: ("gt", np.greater),
+    ast.GtE: ("ge", np.greater_equal),
+    ast.Eq: ("eq", np.equal),
+    ast.NotEq: ("ne", np.not_equal),
+}
+
+# Operators whose operands can be reordered, so a+b and b+a share a node
+COMMUTATIVE = {"add", "mul", "eq", "ne", "and", "or"}
+
+ARITHMETIC = dict(BINARY_OPS.values())
+ELEMENTWISE = dict(COMPARE_OPS.values())
+ELEMENTWISE.update({"and": np.logical_and, "or": np.logical_or})
+
+# Conditions that also look at the previous bar of their operands
+LOOKS_BACK = {"crossover", "crossunder"}
+
+
+def _numeric(values: np.ndarray) -> np.ndarray:
+    """Booleans (and compact mode's unsigned volumes) as float64, so arithmetic on them can go negative"""
+    return values.astype(np.float64) if values.dtype.kind in "bu" else values
+
+
+def _missing(values: np.ndarray) -> np.ndarray:
+    """Bars a numeric series has no value for"""
+    if values.dtype.kind == "f":
+        return np.isnan(values)
+    return np.zeros(values.shape, dtype=bool)
+
+
+class ExpressionPlan:
+    """
+    Several expressions compiled into one DAG
+
+    Nodes are interned by operation and operands, so a subexpression that
+    appears more than once, in one expression or across several, becomes a
+    single node and is evaluated once. Indicator calls on a bare price
+    series go through the engine and share its memoised arrays (and the
+    indicator cache, for a CachedEngine).
+    """
+
+    def __init__(self):
+        self.nodes: List[Node] = []
+        self._ids: Dict[Node, int] = {}
+        self.outputs: Dict[str, int] = {}
+
+    def add(self, name: str, text: str) -> None:
+        if len(text) > MAX_EXPRESSION_LENGTH:
+            raise ExpressionError(f"Expression longer than {MAX_EXPRESSION_LENGTH} characters")
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ExpressionError(f"Invalid expression {text!r}: {e.msg}")
+        self.outputs[name] = self._compile(tree.body)
+
+    def _intern(self, op: str, args: Tuple) -> int:
+        if op in COMMUTATIVE:
+            args = tuple(sorted(args))
+        node = Node(op, args)
+        if node not in self._ids:
+            self._ids[node] = len(self.nodes)
+            self.nodes.append(node)
+        return self._ids[node]
+
+    def _compile(self, node: ast.AST) -> int:
+        if isinstance(node, ast.Name):
+            if node.id not in SOURCE_NAMES:
+                raise ExpressionError(f"Unknown series: {node.id}")
+            return self._intern("source", (node.id,))
+
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool):
+            return self._intern("const", (float(node.value),))
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return self._intern("neg", (self._compile(node.operand),))
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return self._intern("not", (self._compile(node.operand),))
+
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+            return self._intern(BINARY_OPS[type(node.op)][0], (self._compile(node.left), self._compile(node.right)))
+
+        if isinstance(node, ast.BoolOp):
+            op = "and" if isinstance(node.op, ast.And) else "or"
+            result = self._compile(node.values[0])
+            for value in node.values[1:]:
+                result = self._intern(op, (result, self._compile(value)))
+            return result
+
+        if isinstance(node, ast.Compare):
+            # a < b < c means (a < b) and (b < c)
+            left = self._compile(node.left)
+            result = None
+            for op, comparator in zip(node.ops, node.comparators):
+                if type(op) not in COMPARE_OPS:
+                    raise ExpressionError("Unsupported comparison")
+                right = self._compile(comparator)
+                term = self._intern(COMPARE_OPS[type(op)][0], (left, right))
+                result = term if result is None else self._intern("and", (result, term))
+                left = right
+            return result
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            return self._compile_call(node)
+
+        raise ExpressionError(f"Unsupported syntax: {ast.unparse(node)}")
+
+    def _compile_call(self, node: ast.Call) -> int:
+        name = node.func.id
+        if name not in FUNCTIONS or node.keywords:
+            raise ExpressionError(f"Unknown function: {name}")
+        series_count, takes_window, _ = FUNCTIONS[name]
+        expected = series_count + (1 if takes_window else 0)
+        if len(node.args) != expected:
+            raise ExpressionError(f"{name}() takes {expected} arguments")
+
+        args = tuple(self._compile(arg) for arg in node.args[:series_count])
+        if takes_window:
+            window = node.args[-1]
+            if not (isinstance(window, ast.Constant) and isinstance(window.value, int)
+                    and not isinstance(window.value, bool) and 0 < window.value <= MAX_WINDOW):
+                raise ExpressionError(f"{name}() needs a whole-number window between 1 and {MAX_WINDOW}")
+            args += (window.value,)
+        return self._intern(name, args)
+
+    def evaluate(self, engine: IndicatorEngine) -> Dict[str, np.ndarray]:
+        """
+        Every output over the engine's arrays (a series or a bars x symbols panel)
+
+        A condition is False on bars where any operand has no value (an
+        indicator's warm-up, a gap), and stays False under `not`, `and` and
+        `or`; arithmetic on such a condition gives NaN there.
+        """
+        values: List = []
+        # Per node, the bars a boolean result has no value for; None for numeric nodes, whose NaNs say it
+        missing: List = []
+
+        def numeric(node_id: int) -> np.ndarray:
+            value = _numeric(values[node_id])
+            return value if missing[node_id] is None else np.where(missing[node_id], np.nan, value)
+
+        def absent(node_id: int) -> np.ndarray:
+            return _missing(values[node_id]) if missing[node_id] is None else missing[node_id]
+
+        shape = engine.source("close").shape
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for node in self.nodes:
+                mask = None
+                if node.op == "source":
+                    value = engine.source(node.args[0])
+                elif node.op == "const":
+                    value = np.full(shape, node.args[0])
+                elif node.op == "neg":
+                    value = -numeric(node.args[0])
+                elif node.op == "not":
+                    mask = absent(node.args[0])
+                    value = np.logical_not(values[node.args[0]]) & ~mask
+                elif node.op in ARITHMETIC:
+                    value = ARITHMETIC[node.op](numeric(node.args[0]), numeric(node.args[1]))
+                elif node.op in ELEMENTWISE:
+                    mask = absent(node.args[0]) | absent(node.args[1])
+                    value = ELEMENTWISE[node.op](values[node.args[0]], values[node.args[1]]) & ~mask
+                else:
+                    value = FUNCTIONS[node.op][2](engine, self.nodes, values, node.args)
+                    if node.op in LOOKS_BACK:
+                        a, b = node.args
+                        mask = absent(a) | absent(b) | np.isnan(shift(numeric(a) + numeric(b), 1))
+                        value = value & ~mask
+                values.append(value)
+                missing.append(mask)
+        return {name: values[node_id] for name, node_id in self.outputs.items()}
+
+
+def compile_expressions(expressions: Union[Dict[str, str], Iterable[str]]) -> ExpressionPlan:
+    """
+    Compile expressions into one plan
+
+    Args:
+        expressions: {output name: expression}, or expressions named by their own text
+    """
+    if not isinstance(expressions, dict):
+        expressions = {text: text for text in expressions}
+    plan = ExpressionPlan()
+    for name, text in expressions.items():
+        plan.add(name, text)
+    return plan
+
+
+def to_json(values: np.ndarray) -> List:
+    """Series as a JSON list; booleans stay booleans, NaN and infinities become None"""
+    if values.dtype == bool:
+        return values.tolist()
+    values = widen(values)
+    return np.where(np.isfinite(values), values, None).tolist()
@@ -0,0 +1,290 @@
+"""
+Process-wide cache of indicator results, extended bar by bar
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.bar_store import BAR_COLUMNS, BarStore, bar_store
+from app.services.indicator_engine import IndicatorEngine, ewm_mean
+from app.services.streaming_indicators import (
+    Bar, StreamingATR, StreamingBollinger, StreamingEMA, StreamingIndicator, StreamingMACD,
+    StreamingOBV, StreamingRSI, StreamingSMA, StreamingStochastic, StreamingVWAP
+)
+
+# Engine methods whose results are cached, with the streaming indicator that
+# extends them; both take the same positional parameters
+CACHEABLE: Dict[str, Callable[..., StreamingIndicator]] = {
+    "sma": StreamingSMA,
+    "ema": StreamingEMA,
+    "rsi": StreamingRSI,
+    "macd": StreamingMACD,
+    "bollinger": StreamingBollinger,
+    "stochastic": StreamingStochastic,
+    "atr": StreamingATR,
+    "obv": StreamingOBV,
+    "vwap": StreamingVWAP,
+}
+
+# Bars a fresh stream has to replay to reach the state it would have after
+# the whole history; the others (EMAs, OBV) are seeded from cached values
+LOOKBACK: Dict[str, Callable[..., int]] = {
+    "sma": lambda window: window,
+    "rsi": lambda period: period + 1,
+    "bollinger": lambda period, std_dev: period,
+    "stochastic": lambda period, smooth_k, smooth_d: period + smooth_k + smooth_d,
+    "atr": lambda period: period + 1,
+    "vwap": lambda window: window,
+}
+
+class _Entry:
+    """Cached output over a series of bars, plus the stream that continues it"""
+
+    def __init__(self, index: pd.DatetimeIndex, last_bar: Tuple, values, stream: StreamingIndicator):
+        self.index = index
+        self.last_bar = last_bar
+        self.values = values
+        # Committed through the second-to-last bar, which the next extension may revise
+        self.stream = stream
+
+    @property
+    def length(self) -> int:
+        return len(self.index)
+
+    def position(self, bars: pd.DataFrame) -> Optional[int]:
+        """Where `bars` start in the entry's series, None unless they run through its last bar"""
+        position = int(self.index.searchsorted(bars.index[0]))
+        if position == self.length or self.index[position] != bars.index[0]:
+            return None
+        last = self.length - 1 - position
+        if last >= len(bars) or bars.index[last] != self.index[-1]:
+            return None
+        return position
+
+
+def _window(values, position: int):
+    """Cached values from `position` on; views, not copies"""
+    if isinstance(values, dict):
+        return {key: array[position:] for key, array in values.items()}
+    return values[position:]
+
+
+def _last_bar(bars: pd.DataFrame) -> Tuple:
+    return tuple(bars[BAR_COLUMNS].iloc[-1].to_numpy(dtype=np.float64))
+
+
+def _bar_rows(bars: pd.DataFrame, start: int, stop: int):
+    return [Bar(*row) for row in bars[BAR_COLUMNS].iloc[start:stop].to_numpy(dtype=np.float64)]
+
+
+def _warm_stream(name: str, params: tuple, bars: pd.DataFrame, values, committed: int) -> StreamingIndicator:
+    """
+    A stream in the state it reaches after committing bars[0..committed)
+
+    Windowed indicators replay only their last LOOKBACK bars; EMA, MACD and
+    OBV are seeded from the cached values at bar committed - 1, so warming
+    up never walks the whole history in Python.
+    """
+    stream = CACHEABLE[name](*params)
+    if name in LOOKBACK:
+        for bar in _bar_rows(bars, max(0, committed - LOOKBACK[name](*params)), committed):
+            stream.update(bar, commit=True)
+        return stream
+    if committed == 0:
+        return stream
+    last = committed - 1
+    close = bars["Close"].to_numpy(dtype=np.float64)
+    if name == "ema":
+        stream.ema.seed(float(values[last]), committed)
+    elif name == "macd":
+        fast, slow, _ = params
+        # The cached line is fast - slow; the two EMAs themselves aren't cached
+        stream.fast.seed(float(ewm_mean(close[:committed], fast)[-1]), committed)
+        stream.slow.seed(float(ewm_mean(close[:committed], slow)[-1]), committed)
+        stream.signal.seed(float(values["signal"][last]), committed)
+    elif name == "obv":
+        stream.obv, stream.prev_close = float(values[last]), float(close[last])
+    return stream
+
+
+class IndicatorCache:
+    """
+    LRU cache of indicator arrays keyed by symbol, interval, indicator and params
+
+    Entries are computed over a series whose first bar stays put: the
+    symbol's stored bars when the requested window is their latest stretch
+    (see `store`), otherwise the first window requested under that period.
+    A later window that starts inside the series and runs through its last
+    bar reads a slice of it, so the daily window of a "1y" request, whose
+    start moves forward every session, still reuses yesterday's entry.
+
+    An entry is a hit while its series is unchanged. When bars are appended,
+    or the still-forming last bar is revised, the entry is extended through
+    its streaming indicator in time proportional to the new bars instead of
+    being recomputed; a window starting before the series is a miss.
+
+    Values therefore carry the warm-up of the whole series rather than only
+    the window's bars.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, store: Optional[BarStore] = None):
+        self.max_entries = max_entries or int(os.getenv("INDICATOR_CACHE_MAX_ENTRIES", "2000"))
+        self.store = store
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+
+    def stored(self, symbol: str, interval: str,
+               bars: pd.DataFrame) -> Optional[Tuple[pd.DataFrame, IndicatorEngine]]:
+        """(stored bars, engine over them) when `bars` are their latest stretch, else None"""
+        if self.store is None or bars.empty:
+            return None
+        stored = self.store.read(symbol, interval)
+        start = len(stored) - len(bars)
+        if start < 0 or stored.index[start] != bars.index[0] or stored.index[-1] != bars.index[-1] \
+                or _last_bar(stored) != _last_bar(bars):
+            return None
+        return stored, IndicatorEngine.from_bars(stored)
+
+    def get(self, symbol: str, period: str, interval: str, name: str, params: tuple,
+            bars: pd.DataFrame, engine: IndicatorEngine,
+            series: Optional[Callable[[], Optional[Tuple[pd.DataFrame, IndicatorEngine]]]] = None):
+        """
+        `engine.<name>(*params)` over `bars`, from the cache when possible
+
+        `series()` is asked on a miss for the stored bars and an engine over
+        them (see stored); when it gives None the entry is computed over
+        `bars`. Returned arrays are shared between callers and must not be
+        modified.
+        """
+        last_bar = _last_bar(bars)
+        keys = [(symbol.upper(), "stored", interval, name, params), (symbol.upper(), period, interval, name, params)]
+
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                position = entry.position(bars) if entry is not None else None
+                if position is not None:
+                    break
+            if position is not None:
+                if entry.length - position == len(bars) and entry.last_bar == last_bar:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return _window(entry.values, position)
+                # Owned by this caller while it is extended
+                del self._entries[key]
+                self.extensions += 1
+            else:
+                entry = None
+                self.misses += 1
+
+        if entry is None:
+            source = series() if series is not None else None
+            if source is not None:
+                key, (source_bars, source_engine) = keys[0], source
+            else:
+                key, source_bars, source_engine = keys[1], bars, engine
+            values = getattr(source_engine, name)(*params)
+            entry = _Entry(source_bars.index, last_bar, values,
+                           _warm_stream(name, params, source_bars, values, len(source_bars) - 1))
+            position = len(source_bars) - len(bars)
+        else:
+            self._extend(entry, bars, entry.length - 1 - position, last_bar)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return _window(entry.values, position)
+
+    @staticmethod
+    def _extend(entry: _Entry, bars: pd.DataFrame, start: int, last_bar: Tuple) -> None:
+        """Recompute the entry's last bar, bars[start], and append the ones after it"""
+        new_bars = _bar_rows(bars, start, len(bars))
+        outputs = [entry.stream.update(bar, commit=True) for bar in new_bars[:-1]]
+        outputs.append(entry.stream.update(new_bars[-1]))
+
+        keep = entry.length - 1
+        if isinstance(entry.values, dict):
+            entry.values = {
+                key: np.concatenate((values[:keep], [output[key] for output in outputs])).astype(values.dtype)
+                for key, values in entry.values.items()
+            }
+        else:
+            entry.values = np.concatenate((entry.values[:keep], outputs)).astype(entry.values.dtype)
+        entry.index = entry.index[:keep].append(bars.index[start:])
+        entry.last_bar = last_bar
+
+    def view(self, symbol: str, period: str, interval: str, bars: pd.DataFrame) -> "CachedEngine":
+        """Engine over `bars` whose cacheable methods go through this cache"""
+        return CachedEngine(self, symbol, period, interval, bars)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.extensions
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "extensions": self.extensions,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "extension_rate": self.extensions / lookups if lookups else None
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.extensions = 0
+
+
+class CachedEngine:
+    """
+    IndicatorEngine stand-in for one symbol's bars
+
+    CACHEABLE methods are answered by the IndicatorCache; everything else
+    (adx, ichimoku, arrays, ...) goes to a regular engine over the bars.
+    """
+
+    def __init__(self, cache: IndicatorCache, symbol: str, period: str, interval: str, bars: pd.DataFrame):
+        self._cache = cache
+        self._symbol = symbol
+        self._period = period
+        self._interval = interval
+        self._bars = bars
+        self._stored = None
+        self.engine = IndicatorEngine.from_bars(bars)
+
+    def _series(self) -> Optional[Tuple[pd.DataFrame, IndicatorEngine]]:
+        """The cache's stored series for these bars, read at most once per engine"""
+        if self._stored is None:
+            self._stored = self._cache.stored(self._symbol, self._interval, self._bars) or ()
+        return self._stored or None
+
+    def __len__(self) -> int:
+        return len(self.engine)
+
+    def __getattr__(self, name: str):
+        if name not in CACHEABLE:
+            return getattr(self.engine, name)
+
+        def cached(*params, **kwargs):
+            # Only the close-price forms are cached; other sources go straight to the engine
+            if kwargs or (name in ("sma", "ema") and params[1:] not in ((), ("close",))):
+                return getattr(self.engine, name)(*params, **kwargs)
+            if name in ("sma", "ema"):
+                params = params[:1]
+            return self._cache.get(self._symbol, self._period, self._interval, name, params,
+                                   self._bars, self.engine, self._series)
+        return cached
+
+
+# Global indicator cache instance, computing over the shared bar store
+indicator_cache = IndicatorCache(store=bar_store)
@@ -0,0 +1,421 @@
+"""
+Shared NumPy engine behind the indicator services
+
+Compact mode (COMPACT_NUMERICS=1, or IndicatorEngine(compact=True)) keeps
+prices and memoised results as float32 and whole-number volumes as
+uint32/uint64, about half the memory of float64. Sums and EMAs still
+accumulate in float64, and float32 differences of nearby prices are exact,
+so what is lost is the prices' own rounding (relative error <= 6e-8).
+Price-level indicators barely notice it; indicators built on bar-to-bar
+moves see it relative to the move, so their error grows as bars get
+shorter. Bounds on the difference from the default mode, rounded up from
+the largest measured on replayed GBM bars of eight symbols (prices 15 to
+2000; ten years daily, 33k bars at 5 and 1 minutes):
+
+                                  daily     5-minute   1-minute
+  SMA/EMA, Bollinger, VWAP,       2e-7      2e-7       2e-7       relative
+  Ichimoku
+  MACD                            1e-6      5e-7       5e-7       of the price
+  ATR                             5e-6      2e-4       5e-4       relative
+  OBV                             1e-8      2e-4       2e-4       of total volume
+  RSI                             2e-4      1e-2       2e-2       points (0-100)
+  stochastic                      5e-4      2e-2       5e-2       points
+  ADX                             5e-4      2e-2       2          points
+
+OBV counts a close that moved by less than float32 resolution as
+unchanged. ADX can jump by whole points where a bar's up and down moves
+tie within that resolution, which moves its directional movement to the
+other side; use the default mode for intraday ADX.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.services.serialization import widen
+
+SOURCES = ("open", "high", "low", "close", "volume")
+
+COMPACT_NUMERICS = os.getenv("COMPACT_NUMERICS", "0") == "1"
+
+
+def _as_array(values, compact: bool = False) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float32 if compact else np.float64)
+
+
+def _volume_array(values, compact: bool = False) -> np.ndarray:
+    """Volumes as float64, or in compact mode the smallest unsigned integer type that holds them"""
+    values = np.asarray(values, dtype=np.float64)
+    if not compact:
+        return np.ascontiguousarray(values)
+    if values.size and np.isfinite(values).all() and (values >= 0).all() and (values == np.round(values)).all():
+        return np.ascontiguousarray(values, dtype=np.uint32 if values.max() < 2 ** 32 else np.uint64)
+    return np.ascontiguousarray(values, dtype=np.float32)
+
+
+def rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """Sum over a trailing window; NaN until the window is full or while it holds a NaN"""
+    out = np.full(x.shape, np.nan)
+    if window > len(x) or window < 1:
+        return out
+    nan = np.isnan(x)
+    zeros = np.zeros((1,) + x.shape[1:])
+    sums = np.concatenate((zeros, np.cumsum(np.where(nan, 0.0, x), axis=0, dtype=np.float64)))
+    nans = np.concatenate((zeros, np.cumsum(nan, axis=0)))
+    window_sums = sums[window:] - sums[:-window]
+    window_sums[(nans[window:] - nans[:-window]) > 0] = np.nan
+    out[window - 1:] = window_sums
+    return out
+
+
+def rolling_reduce(x: np.ndarray, window: int, reducer: Callable, **kwargs) -> np.ndarray:
+    """Apply a NumPy reduction (max, min, std, ...) to each trailing window"""
+    out = np.full(x.shape, np.nan)
+    if window > len(x) or window < 1:
+        return out
+    out[window - 1:] = reducer(sliding_window_view(x, window, axis=0), axis=-1, **kwargs)
+    return out
+
+
+def ewm_mean(x: np.ndarray, span: int) -> np.ndarray:
+    """
+    Exponentially weighted mean matching pandas' ewm(span=span).mean()
+
+    pandas' default adjust=True divides the decayed sum of observations by
+    the decayed sum of weights; both are first-order IIR filters, so each is
+    one lfilter pass. NaN observations carry no weight but still decay the
+    older ones (ignore_na=False).
+    """
+    decay = 1 - 2 / (span + 1)
+    valid = ~np.isnan(x)
+    numerator = lfilter([1.0], [1.0, -decay], np.where(valid, x, 0.0).astype(np.float64, copy=False), axis=0)
+    weights = lfilter([1.0], [1.0, -decay], valid.astype(np.float64), axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(weights > 0, numerator / weights, np.nan)
+
+
+def shift(x: np.ndarray, periods: int) -> np.ndarray:
+    """pandas-style shift: positive moves values later, the gap is NaN"""
+    out = np.full(x.shape, np.nan)
+    if periods == 0:
+        return x.copy()
+    if abs(periods) >= len(x):
+        return out
+    if periods > 0:
+        out[periods:] = x[:-periods]
+    else:
+        out[:periods] = x[-periods:]
+    return out
+
+
+def diff(x: np.ndarray) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    # In float64, so compact mode's unsigned volumes can fall
+    np.subtract(x[1:], x[:-1], out=out[1:], dtype=np.float64)
+    return out
+
+
+def backfill(x: np.ndarray) -> np.ndarray:
+    """Fill NaNs from the next valid value (pandas' bfill); trailing NaNs stay"""
+    x = widen(x)
+    valid = ~np.isnan(x)
+    if valid.all() or not valid.any():
+        return x
+    idx = np.where(valid, np.arange(len(x)), len(x))
+    idx = np.minimum.accumulate(idx[::-1])[::-1]
+    out = x.copy()
+    has_next = idx < len(x)
+    out[has_next] = x[idx[has_next]]
+    return out
+
+
+def fill(x: np.ndarray, value: float) -> np.ndarray:
+    return np.where(np.isnan(x), value, widen(x))
+
+
+def dropna(x: np.ndarray) -> List[float]:
+    """Non-NaN values as a list (the advanced endpoints' response layout)"""
+    return widen(x[~np.isnan(x)]).tolist()
+
+
+def relative_strength(x: np.ndarray, period: int) -> np.ndarray:
+    """RSI with simple moving averages of gains and losses"""
+    delta = diff(x)
+    # Only a missing value, not the first bar's missing delta, leaves a gap
+    missing = np.isnan(x)
+    gain = rolling_sum(np.where(missing, np.nan, np.where(delta > 0, delta, 0.0)), period) / period
+    loss = rolling_sum(np.where(missing, np.nan, np.where(delta < 0, -delta, 0.0)), period) / period
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100 - 100 / (1 + gain / loss)
+
+
+class IndicatorEngine:
+    """
+    Computes indicators over one set of contiguous float64 (or, compact, float32) OHLCV arrays
+
+    Arrays are either one series or a (bars x symbols) matrix; every
+    indicator runs along axis 0, so a matrix computes it for all symbols
+    in the same handful of NumPy operations.
+
+    Every intermediate (moving averages, EMAs, rolling extremes, true range,
+    directional movement, ...) is memoised on the engine by name and
+    parameters, so asking for EMA-12/26 and then MACD, or ATR and then ADX,
+    computes the shared arrays once. Build one engine per set of bars and
+    request everything from it.
+    """
+
+    def __init__(self, close, high=None, low=None, open=None, volume=None, compact: Optional[bool] = None):
+        self.compact = COMPACT_NUMERICS if compact is None else compact
+        self.arrays: Dict[str, np.ndarray] = {"close": _as_array(close, self.compact)}
+        for name, values in (("high", high), ("low", low), ("open", open)):
+            if values is not None:
+                self.arrays[name] = _as_array(values, self.compact)
+        if volume is not None:
+            self.arrays["volume"] = _volume_array(volume, self.compact)
+        self._memo: Dict[tuple, object] = {}
+        # Column labels when the arrays are a panel (see from_panel)
+        self.symbols: List[str] = []
+
+    @classmethod
+    def from_bars(cls, bars: pd.DataFrame, compact: Optional[bool] = None) -> "IndicatorEngine":
+        """Engine over a DataFrame with Open/High/Low/Close[/Volume] columns"""
+        columns = {name: bars[name.capitalize()].to_numpy()
+                   for name in SOURCES if name.capitalize() in bars.columns}
+        return cls(**columns, compact=compact)
+
+    @classmethod
+    def from_records(cls, records: List[Dict], compact: Optional[bool] = None) -> "IndicatorEngine":
+        """Engine over /api/stocks history rows ({"Date", "Open", ..., "Volume"} dicts)"""
+        columns = {name: np.fromiter((row[name.capitalize()] for row in records), dtype=np.float64,
+                                     count=len(records))
+                   for name in SOURCES if records and name.capitalize() in records[0]}
+        return cls(**columns, compact=compact)
+
+    @classmethod
+    def from_panel(cls, panel: pd.DataFrame, symbols: Optional[List[str]] = None,
+                   compact: Optional[bool] = None) -> "IndicatorEngine":
+        """
+        Engine over a get_many() panel, one matrix column per symbol
+
+        Each column's missing bars are dropped and its remaining bars aligned
+        to the last row, so row -1 holds every symbol's latest bar and a
+        shorter history just starts later, as if computed symbol by symbol.
+        The engine's `symbols` lists the columns in order.
+        """
+        available = set(panel.columns.get_level_values(0)) if not panel.empty else set()
+        symbols = [symbol.upper() for symbol in (symbols or list(dict.fromkeys(panel.columns.get_level_values(0))))]
+        symbols = list(dict.fromkeys(symbol for symbol in symbols if symbol in available))
+        fields = set(panel.columns.get_level_values(1)) if symbols else set()
+
+        def matrix(field: str) -> np.ndarray:
+            return panel.xs(field, axis=1, level=1).reindex(columns=symbols).to_numpy(dtype=np.float64)
+
+        closes = matrix("Close") if "Close" in fields else np.empty((0, 0))
+        missing = np.isnan(closes)
+        # Stable sort on "has a close": missing rows move to the top, the rest keep their order
+        order = np.argsort(~missing, axis=0, kind="stable")
+        columns = {}
+        for name in SOURCES:
+            if name.capitalize() in fields:
+                values = np.where(missing, np.nan, matrix(name.capitalize()))
+                columns[name] = np.take_along_axis(values, order, axis=0)
+        engine = cls(**columns, compact=compact) if columns else cls(closes, compact=compact)
+        engine.symbols = symbols
+        return engine
+
+    def __len__(self) -> int:
+        return len(self.arrays["close"])
+
+    def latest(self, values: np.ndarray) -> Dict[str, Optional[float]]:
+        """Last row of a panel result by symbol, None where it is NaN"""
+        last = values[-1] if len(values) else np.full(len(self.symbols), np.nan)
+        return {symbol: (None if np.isnan(value) else float(value)) for symbol, value in zip(self.symbols, widen(last))}
+
+    def _cached(self, key: tuple, compute: Callable):
+        if key not in self._memo:
+            self._memo[key] = self._store(compute())
+        return self._memo[key]
+
+    def _store(self, result):
+        """Memoised results are float32 in compact mode"""
+        if not self.compact:
+            return result
+        if isinstance(result, dict):
+            return {key: self._store(values) for key, values in result.items()}
+        if result.dtype == np.float64:
+            return result.astype(np.float32)
+        return result
+
+    def source(self, name: str) -> np.ndarray:
+        if name not in self.arrays:
+            raise ValueError(f"Indicator needs {name} prices")
+        return self.arrays[name]
+
+    # Shared building blocks
+
+    def sma(self, window: int, source: str = "close") -> np.ndarray:
+        return self._cached(("sma", source, window),
+                            lambda: rolling_sum(self.source(source), window) / window)
+
+    def ema(self, span: int, source: str = "close") -> np.ndarray:
+        return self._cached(("ema", source, span), lambda: ewm_mean(self.source(source), span))
+
+    def rolling_std(self, window: int, source: str = "close") -> np.ndarray:
+        return self._cached(("std", source, window),
+                            lambda: rolling_reduce(self.source(source), window, np.std, ddof=1, dtype=np.float64))
+
+    def rolling_max(self, window: int, source: str = "high") -> np.ndarray:
+        return self._cached(("max", source, window),
+                            lambda: rolling_reduce(self.source(source), window, np.max))
+
+    def rolling_min(self, window: int, source: str = "low") -> np.ndarray:
+        return self._cached(("min", source, window),
+                            lambda: rolling_reduce(self.source(source), window, np.min))
+
+    def true_range(self) -> np.ndarray:
+        def compute():
+            high, low, close = self.source("high"), self.source("low"), self.source("close")
+            prev_close = shift(close, 1)
+            # np.maximum propagates NaN, so the first bar has no true range
+            return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+        return self._cached(("tr",), compute)
+
+    def atr(self, period: int = 14) -> np.ndarray:
+        return self._cached(("atr", period), lambda: rolling_sum(self.true_range(), period) / period)
+
+    # Indicators
+
+    def rsi(self, period: int = 14) -> np.ndarray:
+        return self._cached(("rsi", period), lambda: relative_strength(self.source("close"), period))
+
+    def macd(self, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+        def compute():
+            line = self.ema(fast) - self.ema(slow)
+            signal_line = ewm_mean(line, signal)
+            return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+        return self._cached(("macd", fast, slow, signal), compute)
+
+    def bollinger(self, period: int = 20, std_dev: float = 2) -> Dict[str, np.ndarray]:
+        def compute():
+            middle, std = self.sma(period), self.rolling_std(period)
+            return {"upper": middle + std * std_dev, "middle": middle, "lower": middle - std * std_dev}
+        return self._cached(("bollinger", period, std_dev), compute)
+
+    def stochastic(self, period: int = 14, smooth_k: int = 3, smooth_d: int = 3) -> Dict[str, np.ndarray]:
+        """%K, %K smoothed over smooth_k bars, and %D over smooth_d bars of the smoothed %K"""
+        def compute():
+            lowest, highest = self.rolling_min(period), self.rolling_max(period)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                k = 100 * (self.source("close") - lowest) / (highest - lowest)
+            k_smooth = rolling_sum(k, smooth_k) / smooth_k
+            return {"k": k, "k_smooth": k_smooth, "d": rolling_sum(k_smooth, smooth_d) / smooth_d}
+        return self._cached(("stochastic", period, smooth_k, smooth_d), compute)
+
+    def adx(self, period: int = 14) -> Dict[str, np.ndarray]:
+        def compute():
+            up = diff(self.source("high"))
+            down = -diff(self.source("low"))
+            plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+            minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+            atr = self.atr(period)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                plus_di = 100 * (rolling_sum(plus_dm, period) / period) / atr
+                minus_di = 100 * (rolling_sum(minus_dm, period) / period) / atr
+                dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+            return {"adx": rolling_sum(dx, period) / period, "plus_di": plus_di, "minus_di": minus_di}
+        return self._cached(("adx", period), compute)
+
+    def ichimoku(self, tenkan: int = 9, kijun: int = 26, senkou: int = 52) -> Dict[str, np.ndarray]:
+        def compute():
+            tenkan_line = (self.rolling_max(tenkan) + self.rolling_min(tenkan)) / 2
+            kijun_line = (self.rolling_max(kijun) + self.rolling_min(kijun)) / 2
+            span_b = (self.rolling_max(senkou) + self.rolling_min(senkou)) / 2
+            return {
+                "tenkan": tenkan_line,
+                "kijun": kijun_line,
+                "senkou_a": shift((tenkan_line + kijun_line) / 2, kijun),
+                "senkou_b": shift(span_b, kijun),
+                "chikou": shift(self.source("close"), -kijun)
+            }
+        return self._cached(("ichimoku", tenkan, kijun, senkou), compute)
+
+    def vwap(self, window: int = 20) -> np.ndarray:
+        """Rolling volume-weighted typical price"""
+        def compute():
+            typical = (self.source("high") + self.source("low") + self.source("close")) / 3
+            volume = self.source("volume")
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return rolling_sum(typical * volume, window) / rolling_sum(volume, window)
+        return self._cached(("vwap", window), compute)
+
+    def obv(self) -> np.ndarray:
+        """On Balance Volume: cumulative volume signed by the close-to-close direction"""
+        def compute():
+            close = self.source("close")
+            delta = diff(close)
+            direction = np.where(delta > 0, 1.0, np.where(delta < 0, -1.0, 0.0))
+            # A series starts at its first bar's volume
+            direction[np.isnan(shift(close, 1)) & ~np.isnan(close)] = 1.0
+            obv = np.nancumsum(direction * self.source("volume"), axis=0)
+            # Panel columns padded above a later first bar stay empty, as for any indicator
+            obv[np.cumsum(~np.isnan(close), axis=0) == 0] = np.nan
+            return obv
+        return self._cached(("obv",), compute)
+
+    def heikin_ashi(self) -> Dict[str, np.ndarray]:
+        """
+        Heikin Ashi candles
+
+        Each HA open is the midpoint of the previous HA open and close, a
+        first-order recursion that one lfilter pass solves from the seed
+        (open + close) / 2 of the first bar.
+        """
+        def compute():
+            open_, high, low, close = (self.source(name) for name in ("open", "high", "low", "close"))
+            ha_close = (open_ + high + low + close) / 4
+            ha_open = np.empty_like(ha_close)
+            if len(ha_close):
+                ha_open[0] = (open_[0] + close[0]) / 2
+                ha_open[1:], _ = lfilter([0.5], [1.0, -0.5], ha_close[:-1], axis=0, zi=0.5 * ha_open[:1])
+            return {
+                "open": ha_open,
+                "high": np.fmax(np.fmax(ha_open, ha_close), high),
+                "low": np.fmin(np.fmin(ha_open, ha_close), low),
+                "close": ha_close
+            }
+        return self._cached(("heikin_ashi",), compute)
+
+    def compute(self, names: Iterable[str]) -> Dict[str, object]:
+        """
+        Several named outputs in one pass over shared intermediates
+
+        Names are keys of INDICATORS ("sma_20", "ema_12", "rsi", "macd",
+        "bollinger", "stochastic", "atr", "adx", "ichimoku", "vwap", "obv").
+        """
+        results = {}
+        for name in names:
+            if name not in INDICATORS:
+                raise ValueError(f"Unknown indicator: {name}")
+            results[name] = INDICATORS[name](self)
+        return results
+
+
+INDICATORS: Dict[str, Callable[[IndicatorEngine], object]] = {
+    "sma_20": lambda engine: engine.sma(20),
+    "sma_50": lambda engine: engine.sma(50),
+    "sma_200": lambda engine: engine.sma(200),
+    "ema_12": lambda engine: engine.ema(12),
+    "ema_26": lambda engine: engine.ema(26),
+    "rsi": lambda engine: engine.rsi(14),
+    "macd": lambda engine: engine.macd(12, 26, 9),
+    "bollinger": lambda engine: engine.bollinger(20, 2),
+    "stochastic": lambda engine: engine.stochastic(14, 1, 3),
+    "atr": lambda engine: engine.atr(14),
+    "adx": lambda engine: engine.adx(14),
+    "ichimoku": lambda engine: engine.ichimoku(),
+    "vwap": lambda engine: engine.vwap(20),
+    "obv": lambda engine: engine.obv(),
+}
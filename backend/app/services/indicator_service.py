@@ -1,55 +1,42 @@
-import pandas as pd
 import numpy as np
-from typing import Dict, List
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+from app.services.indicator_cache import indicator_cache
+from app.services.expressions import compile_expressions, to_json
+from app.services.indicator_engine import IndicatorEngine, backfill, fill
+from app.services.indicator_store import indicator_store
+from app.services.periods import asof_positions, can_resample, resample_bars
+
+# Indicator groups accepted by /api/indicators/{symbol}?indicators=...
+INDICATOR_GROUPS = ("sma", "ema", "rsi", "macd", "bollinger", "stochastic")
 
 class IndicatorService:
     
     def calculate_sma(self, prices: List[float], period: int = 20) -> List[float]:
         """Simple Moving Average"""
         try:
-            df = pd.Series(prices)
-            sma = df.rolling(window=period).mean()
-            return sma.fillna(method='bfill').tolist()
+            return backfill(IndicatorEngine(prices).sma(period)).tolist()
         except:
             return [0] * len(prices)
     
     def calculate_ema(self, prices: List[float], period: int = 20) -> List[float]:
         """Exponential Moving Average"""
         try:
-            df = pd.Series(prices)
-            ema = df.ewm(span=period).mean()
-            return ema.fillna(method='bfill').tolist()
+            return backfill(IndicatorEngine(prices).ema(period)).tolist()
         except:
             return [0] * len(prices)
     
     def calculate_rsi(self, prices: List[float], period: int = 14) -> List[float]:
         """Relative Strength Index"""
         try:
-            df = pd.Series(prices)
-            delta = df.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            return rsi.fillna(50).tolist()
+            return fill(IndicatorEngine(prices).rsi(period), 50).tolist()
         except:
             return [50] * len(prices)
     
     def calculate_macd(self, prices: List[float]) -> Dict:
         """MACD Indicator"""
         try:
-            df = pd.Series(prices)
-            ema12 = df.ewm(span=12).mean()
-            ema26 = df.ewm(span=26).mean()
-            macd = ema12 - ema26
-            signal = macd.ewm(span=9).mean()
-            histogram = macd - signal
-            
-            return {
-                "macd": macd.fillna(0).tolist(),
-                "signal": signal.fillna(0).tolist(),
-                "histogram": histogram.fillna(0).tolist()
-            }
+            return self._macd(IndicatorEngine(prices))
         except:
             return {
                 "macd": [0] * len(prices),
@@ -60,15 +47,7 @@ class IndicatorService:
     def calculate_bollinger_bands(self, prices: List[float], period: int = 20) -> Dict:
         """Bollinger Bands"""
         try:
-            df = pd.Series(prices)
-            sma = df.rolling(window=period).mean()
-            std = df.rolling(window=period).std()
-            
-            return {
-                "upper": (sma + (std * 2)).fillna(method='bfill').tolist(),
-                "middle": sma.fillna(method='bfill').tolist(),
-                "lower": (sma - (std * 2)).fillna(method='bfill').tolist()
-            }
+            return self._bollinger(IndicatorEngine(prices), period)
         except:
             return {
                 "upper": prices,
@@ -79,45 +58,150 @@ class IndicatorService:
     def calculate_stochastic(self, high: List[float], low: List[float], close: List[float]) -> Dict:
         """Stochastic Oscillator"""
         try:
-            high_df = pd.Series(high)
-            low_df = pd.Series(low)
-            close_df = pd.Series(close)
-            
-            lowest_low = low_df.rolling(window=14).min()
-            highest_high = high_df.rolling(window=14).max()
-            
-            k_percent = 100 * ((close_df - lowest_low) / (highest_high - lowest_low))
-            d_percent = k_percent.rolling(window=3).mean()
-            
-            return {
-                "k": k_percent.fillna(50).tolist(),
-                "d": d_percent.fillna(50).tolist()
-            }
+            return self._stochastic(IndicatorEngine(close, high=high, low=low))
         except:
             return {
                 "k": [50] * len(close),
                 "d": [50] * len(close)
             }
     
+    def _macd(self, engine: IndicatorEngine) -> Dict:
+        macd = engine.macd(12, 26, 9)
+        return {key: fill(macd[key], 0).tolist() for key in ("macd", "signal", "histogram")}
+    
+    def _bollinger(self, engine: IndicatorEngine, period: int = 20) -> Dict:
+        bands = engine.bollinger(period, 2)
+        return {key: backfill(bands[key]).tolist() for key in ("upper", "middle", "lower")}
+    
+    def _stochastic(self, engine: IndicatorEngine) -> Dict:
+        stochastic = engine.stochastic(14, 1, 3)
+        return {"k": fill(stochastic["k"], 50).tolist(), "d": fill(stochastic["d"], 50).tolist()}
+    
+    def calculate_indicators(self, bars: pd.DataFrame, groups: Iterable[str] = INDICATOR_GROUPS,
+                             symbol: Optional[str] = None, period: str = "1y", interval: str = "1d",
+                             precomputed: bool = True) -> Dict:
+        """
+        Requested indicator groups for a DataFrame of bars
+        
+        Args:
+            bars: OHLCV bars
+            groups: Names from INDICATOR_GROUPS
+            symbol, period, interval: Where the bars came from; when symbol is
+                given, results go through the shared indicator cache
+            precomputed: Answer from the symbol's precomputed columns
+                (indicator_store) when they cover the bars; the values then
+                come from the whole stored history rather than this window
+        """
+        if symbol and precomputed:
+            engine = indicator_store.engine(bars, symbol, interval)
+            if engine is not None:
+                try:
+                    return self._calculate(engine, groups)
+                except KeyError:
+                    pass
+        if symbol:
+            engine = indicator_cache.view(symbol, period, interval, bars)
+        else:
+            engine = IndicatorEngine.from_bars(bars)
+        return self._calculate(engine, groups)
+    
+    def evaluate_expressions(self, bars: pd.DataFrame, expressions: Iterable[str],
+                             symbol: Optional[str] = None, period: str = "1y", interval: str = "1d") -> Dict:
+        """
+        Values of indicator expressions such as "rsi(close, 14) < 30 and close > sma(close, 200)"
+        
+        All expressions compile into one plan, so subexpressions they share
+        are computed once. Raises ExpressionError for an invalid expression.
+        """
+        plan = compile_expressions(list(expressions))
+        if symbol:
+            engine = indicator_cache.view(symbol, period, interval, bars)
+        else:
+            engine = IndicatorEngine.from_bars(bars)
+        return {name: to_json(values) for name, values in plan.evaluate(engine).items()}
+    
+    def calculate_timeframes(self, bars: pd.DataFrame, timeframes: Iterable[str],
+                             groups: Iterable[str] = INDICATOR_GROUPS, interval: str = "1d",
+                             symbol: Optional[str] = None, period: str = "1y") -> Dict:
+        """
+        Indicator groups at several timeframes, all aligned to the base bars
+        
+        Each coarser timeframe is resampled locally from `bars`, so daily bars
+        give weekly and monthly RSI without another download. Values line up
+        with the base bars as of each bar's close: a weekly value appears on
+        the last day of its week and holds until the next week closes, and
+        None marks bars before the first coarse bar closed.
+        
+        Args:
+            bars: OHLCV bars at `interval`
+            timeframes: Target intervals; `interval` itself or coarser ones it resamples into
+            groups: Names from INDICATOR_GROUPS
+            symbol, period: Where the bars came from; when symbol is given,
+                results go through the shared indicator cache
+        
+        Raises ValueError for a timeframe that can't be built from `interval`
+        bars, or a group not in INDICATOR_GROUPS.
+        """
+        unknown = set(groups) - set(INDICATOR_GROUPS)
+        if unknown:
+            raise ValueError(f"Unknown indicators: {', '.join(sorted(unknown))}")
+        result = {}
+        for timeframe in dict.fromkeys(timeframes):
+            if timeframe == interval:
+                result[timeframe] = self.calculate_indicators(bars, groups, symbol, period, interval)
+                continue
+            if not can_resample(interval, timeframe):
+                raise ValueError(f"Can't build {timeframe} bars from {interval} bars")
+            coarse = resample_bars(bars, timeframe)
+            # Cached apart from bars fetched at `timeframe`, whose window starts differently
+            values = self.calculate_indicators(coarse, groups, symbol, f"{period}/{interval}", timeframe,
+                                               precomputed=False)
+            result[timeframe] = self._align(values, asof_positions(bars.index, coarse.index))
+        return result
+    
+    def _align(self, values, positions: np.ndarray):
+        """Per-coarse-bar lists (possibly nested in dicts) picked out per base bar"""
+        if isinstance(values, dict):
+            return {key: self._align(value, positions) for key, value in values.items()}
+        picked = np.append(np.asarray(values, dtype=np.float64), np.nan)[positions]
+        return to_json(picked)
+    
+    def _calculate(self, engine: IndicatorEngine, groups: Iterable[str]) -> Dict:
+        """
+        Indicator groups from one engine
+        
+        EMAs, moving averages and rolling extremes are shared between
+        groups, e.g. MACD reuses the EMA-12/26 arrays of the "ema" group.
+        """
+        groups = set(groups)
+        result = {}
+        
+        if "sma" in groups:
+            result["sma_20"] = backfill(engine.sma(20)).tolist()
+            result["sma_50"] = backfill(engine.sma(50)).tolist()
+        
+        if "ema" in groups:
+            result["ema_12"] = backfill(engine.ema(12)).tolist()
+            result["ema_26"] = backfill(engine.ema(26)).tolist()
+        
+        if "rsi" in groups:
+            result["rsi"] = fill(engine.rsi(14), 50).tolist()
+        
+        if "macd" in groups:
+            result["macd"] = self._macd(engine)
+        
+        if "bollinger" in groups:
+            result["bollinger"] = self._bollinger(engine)
+        
+        if "stochastic" in groups:
+            result["stochastic"] = self._stochastic(engine)
+        
+        return result
+    
     def calculate_all_indicators(self, ohlcv_data: List[Dict]) -> Dict:
         """Calculate all indicators for OHLCV data"""
         try:
-            df = pd.DataFrame(ohlcv_data)
-            
-            close_prices = df['Close'].tolist()
-            high_prices = df['High'].tolist()
-            low_prices = df['Low'].tolist()
-            
-            return {
-                "sma_20": self.calculate_sma(close_prices, 20),
-                "sma_50": self.calculate_sma(close_prices, 50),
-                "ema_12": self.calculate_ema(close_prices, 12),
-                "ema_26": self.calculate_ema(close_prices, 26),
-                "rsi": self.calculate_rsi(close_prices),
-                "macd": self.calculate_macd(close_prices),
-                "bollinger": self.calculate_bollinger_bands(close_prices),
-                "stochastic": self.calculate_stochastic(high_prices, low_prices, close_prices)
-            }
+            return self._calculate(IndicatorEngine.from_records(ohlcv_data), INDICATOR_GROUPS)
         except Exception as e:
             print(f"Indicator calculation error: {str(e)}")
-            return {}
\ No newline at end of file
+            return {}
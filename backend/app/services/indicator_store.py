@@ -0,0 +1,221 @@
+"""
+Standard indicator columns precomputed next to the stored bars
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.bar_store import BAR_COLUMNS, BarStore, bar_store
+from app.services.indicator_cache import IndicatorCache
+
+# (engine method, params) pairs materialized for every precomputed symbol:
+# the groups /api/indicators/{symbol} serves, plus the 200-day SMA
+STANDARD: List[Tuple[str, tuple]] = [
+    ("sma", (20,)),
+    ("sma", (50,)),
+    ("sma", (200,)),
+    ("ema", (12,)),
+    ("ema", (26,)),
+    ("rsi", (14,)),
+    ("macd", (12, 26, 9)),
+    ("bollinger", (20, 2)),
+    ("stochastic", (14, 1, 3)),
+]
+
+
+def column_name(name: str, params: tuple, key: Optional[str] = None) -> str:
+    """Column of one indicator output, e.g. sma_20 or macd_12_26_9.signal"""
+    column = "_".join([name] + [f"{param:g}" for param in params])
+    return f"{column}.{key}" if key else column
+
+
+class PrecomputedEngine:
+    """
+    IndicatorEngine stand-in answering STANDARD calls from precomputed columns
+
+    Other methods or parameters raise KeyError, so callers can fall back to
+    computing on demand.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self._columns = columns
+
+    def _get(self, name: str, params: tuple):
+        if (name, params) not in STANDARD:
+            raise KeyError(column_name(name, params))
+        column = column_name(name, params)
+        if column in self._columns:
+            return self._columns[column]
+        prefix = f"{column}."
+        return {key[len(prefix):]: values for key, values in self._columns.items() if key.startswith(prefix)}
+
+    def sma(self, window: int, source: str = "close") -> np.ndarray:
+        if source != "close":
+            raise KeyError(f"sma of {source}")
+        return self._get("sma", (window,))
+
+    def ema(self, span: int, source: str = "close") -> np.ndarray:
+        if source != "close":
+            raise KeyError(f"ema of {source}")
+        return self._get("ema", (span,))
+
+    def rsi(self, period: int = 14) -> np.ndarray:
+        return self._get("rsi", (period,))
+
+    def macd(self, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+        return self._get("macd", (fast, slow, signal))
+
+    def bollinger(self, period: int = 20, std_dev: float = 2) -> Dict[str, np.ndarray]:
+        return self._get("bollinger", (period, std_dev))
+
+    def stochastic(self, period: int = 14, smooth_k: int = 1, smooth_d: int = 3) -> Dict[str, np.ndarray]:
+        return self._get("stochastic", (period, smooth_k, smooth_d))
+
+
+class IndicatorStore:
+    """
+    Parquet file of STANDARD indicator columns beside each symbol's bar file
+
+    Columns cover the symbol's whole stored history, so a window read from
+    them carries fully warmed-up values. materialize() brings a file up to
+    date with the stored bars; results come from a private IndicatorCache,
+    so appended bars are computed by continuing each indicator's stream
+    rather than from scratch. Reads keep the loaded columns in memory until
+    the file changes.
+    """
+
+    def __init__(self, store: Optional[BarStore] = None):
+        self.bars = store or bar_store
+        self._cache = IndicatorCache(max_entries=len(STANDARD) * 1000)
+        self._loaded: Dict[Tuple[str, str], Tuple[float, pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+        # The background job's own thread: it neither takes upstream pool slots
+        # from requests nor is cut off by their timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="indicator-precompute")
+
+    def path(self, symbol: str, interval: str) -> str:
+        return self.bars.path(symbol, interval).replace(".parquet", ".indicators.parquet")
+
+    def read(self, symbol: str, interval: str = "1d") -> Optional[pd.DataFrame]:
+        """Precomputed columns, None when the symbol has none"""
+        loaded = self._read(symbol, interval)
+        return loaded[1] if loaded else None
+
+    def _read(self, symbol: str, interval: str) -> Optional[Tuple[float, pd.DataFrame]]:
+        """(file modification time, columns), None when the symbol has none"""
+        path = self.path(symbol, interval)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return None
+        key = (symbol.upper(), interval)
+        with self._lock:
+            loaded = self._loaded.get(key)
+            if loaded is not None and loaded[0] == modified:
+                return loaded
+        try:
+            columns = pd.read_parquet(path)
+        except Exception as e:
+            print(f"Error reading indicator store file {path}: {e}")
+            return None
+        with self._lock:
+            self._loaded[key] = (modified, columns)
+        return modified, columns
+
+    def _covering(self, bars: pd.DataFrame, symbol: str, interval: str):
+        """(modification time, columns, positions of `bars` in them), None unless they cover every bar
+        and were computed from the same last bar"""
+        loaded = self._read(symbol, interval)
+        if loaded is None:
+            return None
+        modified, columns = loaded
+        if bars.empty or columns.empty or columns.index[-1] != bars.index[-1]:
+            return None
+        if columns.attrs.get("last_bar") != _last_bar(bars):
+            return None
+        positions = columns.index.get_indexer(bars.index)
+        if (positions < 0).any():
+            return None
+        return modified, columns, positions
+
+    def engine(self, bars: pd.DataFrame, symbol: str, interval: str = "1d") -> Optional[PrecomputedEngine]:
+        """Precomputed columns lined up with `bars`, None unless they cover them (see version)"""
+        covering = self._covering(bars, symbol, interval)
+        if covering is None:
+            return None
+        _, columns, positions = covering
+        return PrecomputedEngine({name: columns[name].to_numpy()[positions] for name in columns.columns})
+
+    def version(self, bars: pd.DataFrame, symbol: str, interval: str = "1d") -> str:
+        """
+        Which values engine() gives for `bars`, for ETags
+
+        Precomputed columns are warmed up over the whole stored history,
+        while an on-demand computation may only see the window (or the
+        series its cache entry started from), so the two can differ over
+        the same bars; responses that may come from either carry this in
+        their ETag.
+        """
+        covering = self._covering(bars, symbol, interval)
+        return f"stored@{covering[0]!r}" if covering else "window"
+
+    def materialize(self, symbol: str, interval: str = "1d") -> bool:
+        """Bring a symbol's columns up to date with its stored bars; False when already current"""
+        with self.bars.lock(symbol, interval):
+            bars = self.bars.read(symbol, interval)
+        if bars.empty:
+            return False
+        current = self.read(symbol, interval)
+        if current is not None and not current.empty and current.index[-1] == bars.index[-1] \
+                and current.attrs.get("last_bar") == _last_bar(bars):
+            return False
+
+        engine = self._cache.view(symbol, "stored", interval, bars)
+        columns = {}
+        for name, params in STANDARD:
+            values = getattr(engine, name)(*params)
+            if isinstance(values, dict):
+                columns.update({column_name(name, params, key): values[key] for key in values})
+            else:
+                columns[column_name(name, params)] = values
+        frame = pd.DataFrame(columns, index=bars.index)
+        frame.attrs["last_bar"] = _last_bar(bars)
+
+        path = self.path(symbol, interval)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        frame.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        return True
+
+    def symbols(self, interval: str = "1d") -> List[str]:
+        """Symbols to precompute: PRECOMPUTE_SYMBOLS, else the most recently stored ones"""
+        configured = os.getenv("PRECOMPUTE_SYMBOLS", "")
+        if configured.strip():
+            return [symbol.strip().upper() for symbol in configured.split(",") if symbol.strip()]
+        limit = int(os.getenv("PRECOMPUTE_MAX_SYMBOLS", "300"))
+        return self.bars.symbols(interval, newest_first=True)[:limit]
+
+    async def run_forever(self, interval: str = "1d"):
+        """Background job: re-materialize symbols whose bars changed, every PRECOMPUTE_SECONDS"""
+        seconds = float(os.getenv("PRECOMPUTE_SECONDS", "60"))
+        loop = asyncio.get_running_loop()
+        while True:
+            for symbol in self.symbols(interval):
+                try:
+                    await loop.run_in_executor(self._executor, self.materialize, symbol, interval)
+                except Exception as e:
+                    print(f"Indicator precompute failed for {symbol}: {e}")
+            await asyncio.sleep(seconds)
+
+
+def _last_bar(bars: pd.DataFrame) -> List[float]:
+    return [float(value) for value in bars[BAR_COLUMNS].iloc[-1]]
+
+
+# Global indicator store instance
+indicator_store = IndicatorStore()
@@ -4,8 +4,10 @@ Paper trading and portfolio simulation service
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Any, Optional
-import yfinance as yf
 from enum import Enum
+from app.services.data_service import DataService
+
+data_service = DataService()
 
 
 class OrderType(str, Enum):
@@ -223,8 +225,8 @@ class PaperTradingService:
         
         if symbol:
             try:
-                ticker = yf.Ticker(symbol)
-                current_price = ticker.info.get("currentPrice", 0)
+                quote = data_service.get_real_time_quote(symbol)
+                current_price = quote.get("price", 0)
                 
                 if current_price > 0:
                     position_size = int(risk_amount / current_price)
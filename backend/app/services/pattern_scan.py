@@ -0,0 +1,145 @@
+"""
+Pattern detectors run across many symbols' stored bars on a process pool
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional
+
+import pandas as pd
+
+from app.services.bar_store import BarStore, bar_store
+from app.services.candlestick_patterns import LOOKBEHIND
+from app.services.pattern_service import PatternService
+from app.services.periods import slice_period
+
+DETECTORS = ("candlestick", "support_resistance", "trends")
+
+PATTERN_SCAN_WORKERS = int(os.getenv("PATTERN_SCAN_WORKERS", str(min(8, os.cpu_count() or 1))))
+PATTERN_SCAN_CHUNK = int(os.getenv("PATTERN_SCAN_CHUNK", "25"))
+
+
+def _scan_symbol(store: BarStore, symbol: str, interval: str, period: str, detectors: List[str],
+                 patterns: Optional[List[str]], lookback: int) -> Dict:
+    bars = slice_period(store.read(symbol, interval), period)
+    if bars.empty:
+        return {"symbol": symbol, "error": "No stored bars"}
+
+    service = PatternService()
+
+    def day(i: int) -> str:
+        return bars.index[i].strftime("%Y-%m-%d")
+
+    result = {"symbol": symbol, "date": day(-1)}
+    if "candlestick" in detectors:
+        # Matches on the last `lookback` bars only depend on the LOOKBEHIND bars before them
+        tail = bars.iloc[-(lookback + LOOKBEHIND):]
+        offset = len(bars) - len(tail)
+        matches = service.detect_candlestick_patterns(tail, start=len(tail) - lookback)
+        result["candlestick"] = {
+            name: [day(offset + i) for i in indices]
+            for name, indices in matches.items() if patterns is None or name in patterns
+        }
+    if "support_resistance" in detectors:
+        result["support_resistance"] = service.detect_support_resistance(bars["Close"].tolist())
+    if "trends" in detectors:
+        dates = pd.DatetimeIndex(bars.index).strftime("%Y-%m-%d").tolist()
+        result["trends"] = service.detect_trend_lines(bars["Close"].tolist(), dates)
+    return result
+
+
+def _ready() -> bool:
+    """No-op pool task: once it has run, its worker has imported the scan code"""
+    return True
+
+
+def scan_chunk(root: str, symbols: List[str], interval: str, period: str, detectors: List[str],
+               patterns: Optional[List[str]], lookback: int) -> List[Dict]:
+    """Scan one chunk of symbols (runs in a pool worker, reading the bar store directly)"""
+    store = BarStore(root)
+    results = []
+    for symbol in symbols:
+        try:
+            results.append(_scan_symbol(store, symbol, interval, period, detectors, patterns, lookback))
+        except Exception as e:
+            results.append({"symbol": symbol, "error": str(e)})
+    return results
+
+
+class PatternScanner:
+    """
+    Runs PatternService detectors over a symbol list on a process pool
+
+    Symbols are split into chunks, each chunk is one pool task, and results
+    are yielded chunk by chunk as they finish, so the first symbols arrive
+    while the rest are still being scanned. Workers read bars straight from
+    the bar store and never call upstream; symbols without stored bars come
+    back with an error.
+
+    A spawned worker imports the whole app.services package (scikit-learn
+    included) before its first task, which takes seconds, so start() brings
+    the pool up ahead of the first scan; main.py calls it at startup.
+    Otherwise the pool starts on the first scan. Either way it is reused.
+    """
+
+    def __init__(self, store: Optional[BarStore] = None, workers: Optional[int] = None):
+        self.store = store or bar_store
+        self.workers = workers or PATTERN_SCAN_WORKERS
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned rather than forked: the server's threads and locks aren't copied into workers
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def start(self) -> None:
+        """Spawn every worker now and have it import the scan code, without waiting for it"""
+        pool = self.pool()
+        for _ in range(self.workers):
+            pool.submit(_ready)
+
+    async def scan(self, symbols: List[str], interval: str = "1d", period: str = "3mo",
+                   detectors: List[str] = ("candlestick",), patterns: Optional[List[str]] = None,
+                   lookback: int = 1, chunk_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Yield one result per symbol, in completion order
+
+        Args:
+            symbols: Symbols to scan
+            period: Window of stored bars each detector sees
+            detectors: Names from DETECTORS
+            patterns: Candlestick patterns to report, None for all
+            lookback: Report candlestick matches on the last `lookback` bars
+            chunk_size: Symbols per pool task
+        """
+        chunk_size = chunk_size or PATTERN_SCAN_CHUNK
+        loop = asyncio.get_running_loop()
+        pool = self.pool()
+        futures = [
+            loop.run_in_executor(pool, scan_chunk, self.store.root, symbols[i:i + chunk_size], interval,
+                                 period, list(detectors), patterns, lookback)
+            for i in range(0, len(symbols), chunk_size)
+        ]
+        try:
+            for future in asyncio.as_completed(futures):
+                for result in await future:
+                    yield result
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# Global pattern scanner instance
+pattern_scanner = PatternScanner()
@@ -1,68 +1,83 @@
 import pandas as pd
 import numpy as np
+from bisect import bisect_left, bisect_right
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
 from typing import Dict, List
+from app.services.candlestick_patterns import Candles, decode, pattern_mask
 
 class PatternService:
     
-    def detect_candlestick_patterns(self, ohlc_data: List[Dict]) -> Dict:
-        """Detect basic candlestick patterns"""
-        df = pd.DataFrame(ohlc_data)
-        
-        patterns = {}
-        
-        # Simple Doji detection
-        body_size = abs(df['Close'] - df['Open'])
-        candle_range = df['High'] - df['Low']
-        doji_threshold = candle_range * 0.1
-        
-        patterns['doji'] = (body_size <= doji_threshold).astype(int).tolist()
-        
-        # Simple Hammer detection
-        lower_shadow = df[['Open', 'Close']].min(axis=1) - df['Low']
-        upper_shadow = df['High'] - df[['Open', 'Close']].max(axis=1)
-        
-        hammer_condition = (lower_shadow >= 2 * body_size) & (upper_shadow <= body_size)
-        patterns['hammer'] = hammer_condition.astype(int).tolist()
-        
-        return patterns
+    def detect_candlestick_patterns(self, bars: pd.DataFrame, start: int = 0) -> Dict[str, List[int]]:
+        """
+        Detect candlestick patterns
+        
+        Every pattern in candlestick_patterns.PATTERNS is evaluated in one
+        vectorized pass into a per-bar bitmask; only the matches are decoded.
+        
+        Args:
+            bars: OHLC bars
+            start: First bar to report matches for
+        
+        Returns:
+            {pattern name: indices of the bars it completed on}, for patterns with matches
+        """
+        if bars.empty:
+            return {}
+        return decode(pattern_mask(Candles.from_bars(bars)), max(start, 0))
     
     def detect_support_resistance(self, prices: List[float], window: int = 20) -> Dict:
-        """Detect support and resistance levels"""
-        prices_array = np.array(prices)
-        
-        # Find local minima (support) and maxima (resistance)
-        support_levels = []
-        resistance_levels = []
-        
-        for i in range(window, len(prices_array) - window):
-            # Support: local minimum
-            if prices_array[i] == min(prices_array[i-window:i+window+1]):
-                support_levels.append({
-                    'level': prices_array[i],
-                    'index': i,
-                    'strength': self._calculate_level_strength(prices_array, i, prices_array[i])
-                })
-            
-            # Resistance: local maximum
-            if prices_array[i] == max(prices_array[i-window:i+window+1]):
-                resistance_levels.append({
-                    'level': prices_array[i],
-                    'index': i,
-                    'strength': self._calculate_level_strength(prices_array, i, prices_array[i])
-                })
+        """
+        Detect support and resistance levels
+        
+        A support (resistance) level is a price equal to the minimum
+        (maximum) of the 2 * window + 1 prices centred on it. The centred
+        extremes come from a rolling min/max filter, O(n) whatever the
+        window, and touches are counted by bisecting the sorted prices, so
+        multi-year intraday series stay cheap.
+        """
+        prices_array = np.asarray(prices, dtype=np.float64)
+        n = len(prices_array)
+        if n <= 2 * window:
+            return {'support': [], 'resistance': []}
+        
+        size = 2 * window + 1
+        interior = slice(window, n - window)
+        centre = prices_array[interior]
+        support_at = np.flatnonzero(centre == minimum_filter1d(prices_array, size)[interior]) + window
+        resistance_at = np.flatnonzero(centre == maximum_filter1d(prices_array, size)[interior]) + window
+        
+        # Only the last 5 of each are returned, so only they need a strength
+        sorted_prices = np.sort(prices_array).tolist()
+        
+        def levels(indices: np.ndarray) -> List[Dict]:
+            return [{
+                'level': prices_array[i],
+                'index': int(i),
+                'strength': self._calculate_level_strength(sorted_prices, prices_array[i])
+            } for i in indices[-5:]]
         
         return {
-            'support': support_levels[-5:],  # Last 5 support levels
-            'resistance': resistance_levels[-5:]  # Last 5 resistance levels
+            'support': levels(support_at),  # Last 5 support levels
+            'resistance': levels(resistance_at)  # Last 5 resistance levels
         }
     
-    def _calculate_level_strength(self, prices: np.array, index: int, level: float, tolerance: float = 0.02) -> int:
-        """Calculate strength of support/resistance level"""
-        touches = 0
-        for price in prices:
-            if abs(price - level) / level <= tolerance:
-                touches += 1
-        return touches
+    def _calculate_level_strength(self, sorted_prices: List[float], level: float, tolerance: float = 0.02) -> int:
+        """
+        Calculate strength of support/resistance level: how many prices lie
+        within `tolerance` (relative) of it
+        """
+        def within(price: float) -> bool:
+            return abs(price - level) / level <= tolerance
+        
+        # Bisect slightly wide bounds, then settle the prices right at the edges exactly
+        margin = abs(level) * tolerance
+        low = bisect_left(sorted_prices, level - margin * (1 + 1e-9))
+        high = bisect_right(sorted_prices, level + margin * (1 + 1e-9))
+        while low < high and not within(sorted_prices[low]):
+            low += 1
+        while high > low and not within(sorted_prices[high - 1]):
+            high -= 1
+        return high - low
     
     def detect_trend_lines(self, prices: List[float], dates: List[str]) -> Dict:
         """Detect trend lines"""
@@ -0,0 +1,171 @@
+"""
+Helpers for yfinance-style periods and intervals over stored bars
+"""
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+INTRADAY_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
+
+
+def align_tz(ts: pd.Timestamp, index: pd.Index) -> pd.Timestamp:
+    """Express a timestamp in the timezone of a bar index so they compare"""
+    tz = getattr(index, "tz", None)
+    if tz is None:
+        return ts.tz_convert(None) if ts.tzinfo is not None else ts
+    return ts.tz_convert(tz) if ts.tzinfo is not None else ts.tz_localize(tz)
+
+
+def period_start(period: str, now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """Earliest timestamp a yfinance-style period needs, None for max"""
+    now = now or pd.Timestamp.now(tz="UTC")
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1, tz="UTC")
+    if period.endswith("d") and period[:-1].isdigit():
+        # "Nd" counts trading sessions; pad the calendar window for weekends
+        days = int(period[:-1])
+        return (now - pd.Timedelta(days=days + (days // 5) * 2 + 4)).normalize()
+    if period in PERIOD_OFFSETS:
+        return (now - PERIOD_OFFSETS[period]).normalize()
+    raise ValueError(f"Invalid period: {period}")
+
+
+def lookback_start(start: pd.Timestamp, bars: int, interval: str = "1d") -> pd.Timestamp:
+    """
+    A timestamp at least `bars` bars of `interval` before `start`
+
+    Bars are converted to trading sessions (6.5 hours each for intraday
+    intervals), then padded for weekends and holidays like "Nd" periods.
+    """
+    if interval in INTERVAL_MINUTES:
+        sessions = -(-bars * INTERVAL_MINUTES[interval] // 390)
+    else:
+        sessions = bars
+    return (start - pd.Timedelta(days=sessions + (sessions // 5) * 2 + sessions // 30 + 4)).normalize()
+
+
+def slice_period(bars: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Cut stored bars down to the window a period asks for"""
+    if bars.empty or period == "max":
+        return bars
+    if period.endswith("d") and period[:-1].isdigit():
+        sessions = bars.index.normalize().unique()
+        first_session = sessions[-int(period[:-1]):][0]
+        return bars[bars.index >= first_session]
+    start = align_tz(period_start(period), bars.index)
+    return bars[bars.index >= start]
+
+
+# Intervals built locally from daily bars, and the pandas rule for each
+RESAMPLE_RULES = {"1wk": "W-MON", "1mo": "MS", "3mo": "QS"}
+
+INTERVAL_MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+
+OHLCV_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def bin_start(ts: pd.Timestamp, interval: str) -> pd.Timestamp:
+    """Start of the weekly/monthly/quarterly bar containing ts"""
+    day = ts.normalize()
+    if interval == "1wk":
+        return day - pd.Timedelta(days=day.weekday())
+    if interval == "1mo":
+        return day.replace(day=1)
+    if interval == "3mo":
+        return day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+    return day
+
+
+def finer_intervals(interval: str):
+    """Stored intraday intervals that can be resampled into `interval`, coarsest first"""
+    minutes = INTERVAL_MINUTES.get(interval)
+    if minutes is None:
+        return []
+    finer = {m: name for name, m in INTERVAL_MINUTES.items()
+             if m <= minutes and minutes % m == 0 and name != interval and name != "1h"}
+    return [finer[m] for m in sorted(finer, reverse=True)]
+
+
+def resample_bars(bars: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Aggregate bars into a coarser interval
+
+    Weekly/monthly/quarterly bars are labelled by the first day of the bin
+    like yfinance's. Intraday bins are anchored on the earliest time of day
+    in the data (the session open), so 60m bars start at 09:30 rather than
+    on the hour.
+    """
+    if bars.empty:
+        return bars
+    if interval in RESAMPLE_RULES:
+        resampled = bars.resample(RESAMPLE_RULES[interval], label="left", closed="left").agg(OHLCV_AGG)
+    elif interval == "1d":
+        resampled = bars.resample("D", label="left", closed="left").agg(OHLCV_AGG)
+    else:
+        session_open = (bars.index - bars.index.normalize()).min()
+        resampled = bars.resample(f"{INTERVAL_MINUTES[interval]}min", label="left", closed="left",
+                                  origin="start_day", offset=session_open).agg(OHLCV_AGG)
+    resampled = resampled.dropna(subset=["Close"])
+    resampled.index.name = bars.index.name
+    return resampled
+
+
+def can_resample(base: str, target: str) -> bool:
+    """Whether bars of `target` interval are whole bins of `base` bars"""
+    if target in RESAMPLE_RULES:
+        return base == "1d" or base in INTERVAL_MINUTES or (base, target) == ("1mo", "3mo")
+    if target == "1d":
+        return base in INTERVAL_MINUTES
+    if target in INTERVAL_MINUTES and base in INTERVAL_MINUTES:
+        return INTERVAL_MINUTES[target] > INTERVAL_MINUTES[base] \
+            and INTERVAL_MINUTES[target] % INTERVAL_MINUTES[base] == 0
+    return False
+
+
+def asof_positions(base: pd.DatetimeIndex, coarse: pd.DatetimeIndex) -> np.ndarray:
+    """
+    For each base bar, the position of the latest coarse bar known at its close, -1 for none
+
+    Coarse bars are labelled by their bin start (resample_bars). A coarse
+    bar counts from the last base bar of its bin on, when everything in it
+    has happened, so a weekly value never leaks into the days before the
+    week's close. The forming last bin counts at the latest base bar.
+    """
+    containing = np.searchsorted(coarse, base, side="right") - 1
+    closes_bin = np.append(containing[1:] != containing[:-1], True)
+    positions = np.where(closes_bin, containing, -1)
+    # Carry each closed bin forward over the next bin's earlier bars
+    return np.maximum.accumulate(positions) if len(positions) else positions
+
+
+def parse_since(value: str) -> pd.Timestamp:
+    """
+    Parse a client's last-bar timestamp: Unix seconds (as the columnar
+    "time" field carries) or an ISO date/datetime (as the "Date" field does)
+    """
+    value = value.strip()
+    if value.lstrip("-").isdigit():
+        return pd.Timestamp(int(value), unit="s", tz="UTC")
+    try:
+        return pd.Timestamp(value)
+    except ValueError:
+        raise ValueError(f"Invalid since timestamp: {value}")
+
+
+def bars_since(bars: pd.DataFrame, since: Optional[pd.Timestamp]) -> pd.DataFrame:
+    """Bars from `since` on, so the client's last (possibly revised) bar is resent"""
+    if since is None or bars.empty:
+        return bars
+    return bars[bars.index >= align_tz(since, bars.index)]
@@ -0,0 +1,104 @@
+"""
+Process-wide quote cache with single-flight upstream fetches
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+
+class _Flight:
+    """An upstream fetch that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
+
+
+class QuoteCache:
+    """
+    TTL cache for real-time quotes
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted beyond `max_entries`. Concurrent misses for the same symbol wait
+    for a single upstream fetch instead of each starting their own.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 wait_timeout: float = 30.0):
+        self.ttl = ttl if ttl is not None else float(os.getenv("QUOTE_CACHE_TTL_SECONDS", "15"))
+        self.max_entries = max_entries or int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", "5000"))
+        self.wait_timeout = wait_timeout
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, fetch: Callable[[str], Dict]) -> Dict:
+        """Return a fresh cached quote, or fetch it once for all concurrent callers"""
+        key = symbol.upper()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                return dict(entry[1])
+
+            flight = self._inflight.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+
+        if not is_leader:
+            if not flight.done.wait(self.wait_timeout) or flight.result is None:
+                return {"error": f"Timed out waiting for quote for {key}"}
+            return dict(flight.result)
+
+        result = {"error": f"No quote fetched for {key}"}
+        try:
+            result = fetch(key)
+        except Exception as e:
+            result = {"error": str(e)}
+        finally:
+            with self._lock:
+                # Errors aren't cached so the next caller retries upstream
+                if "error" not in result:
+                    self._store(key, result)
+                del self._inflight[key]
+            flight.result = result
+            flight.done.set()
+
+        return dict(result)
+
+    def peek(self, symbol: str) -> Optional[Dict]:
+        """Cached quote if one is still fresh, without fetching"""
+        with self._lock:
+            entry = self._entries.get(symbol.upper())
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                return None
+            return dict(entry[1])
+
+    def put(self, symbol: str, quote: Dict) -> None:
+        """Store a quote fetched outside of get(), e.g. by a batch download"""
+        with self._lock:
+            self._store(symbol.upper(), quote)
+
+    def _store(self, key: str, quote: Dict) -> None:
+        """Insert an entry and evict the least recently used ones; caller holds the lock"""
+        self._entries[key] = (time.monotonic(), quote)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, symbol: str) -> None:
+        with self._lock:
+            self._entries.pop(symbol.upper(), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Global quote cache instance
+quote_cache = QuoteCache()
@@ -0,0 +1,75 @@
+"""
+Per-request cache of bars and indicator engines
+"""
+import copy
+import threading
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+from fastapi import Query
+
+from app.services.data_service import DataService
+from app.services.indicator_cache import CachedEngine, indicator_cache
+
+data_service = DataService()
+
+
+class RequestFrames:
+    """
+    Bars and indicator engines shared within one request
+
+    The ETag check and every indicator a request computes read a symbol's
+    bars once and share one IndicatorEngine, and with it the engine's
+    memoised intermediates (ATR for ADX, EMAs for MACD, ...).
+
+    Reads that ask for warm-up get the display window plus that many bars
+    before it (DataService.get_window). `warmup` is a floor for every read,
+    so indicators computed together share one window; `last` shrinks the
+    display window to the latest bars.
+    """
+
+    def __init__(self, service: Optional[DataService] = None, last: Optional[int] = None, warmup: int = 0):
+        self._service = service or data_service
+        self.last = last
+        self.warmup = warmup
+        self._bars: Dict[Tuple, pd.DataFrame] = {}
+        self._engines: Dict[Tuple, CachedEngine] = {}
+        self._lock = threading.RLock()
+
+    def with_warmup(self, warmup: int) -> "RequestFrames":
+        """Frames with a warm-up floor of at least `warmup` that share this request's reads; self is unchanged"""
+        frames = copy.copy(self)
+        frames.warmup = max(self.warmup, warmup)
+        return frames
+
+    def _key(self, symbol: str, period: str, interval: str, warmup: int) -> Tuple:
+        return (symbol.upper(), period, interval, max(warmup, self.warmup), self.last)
+
+    def bars(self, symbol: str, period: str = "1y", interval: str = "1d", warmup: int = 0) -> pd.DataFrame:
+        key = self._key(symbol, period, interval, warmup)
+        with self._lock:
+            if key not in self._bars:
+                if key[3] == 0 and self.last is None:
+                    self._bars[key] = self._service.get_history(symbol, period=period, interval=interval)
+                else:
+                    self._bars[key] = self._service.get_window(symbol, period, key[3], interval, last=self.last)
+            return self._bars[key]
+
+    def engine(self, symbol: str, period: str = "1y", interval: str = "1d",
+               warmup: int = 0) -> Optional[CachedEngine]:
+        """Engine over the symbol's bars backed by the shared indicator cache, None when there are none"""
+        key = self._key(symbol, period, interval, warmup)
+        with self._lock:
+            if key not in self._engines:
+                bars = self.bars(symbol, period, interval, warmup)
+                if bars.empty:
+                    return None
+                # Each distinct window keeps its own cache entries
+                window = period if key[3] == 0 and self.last is None else f"{period}+{key[3]}/{self.last}"
+                self._engines[key] = indicator_cache.view(symbol, window, interval, bars)
+            return self._engines[key]
+
+
+def request_frames(latest: bool = Query(False, description="Only each indicator's latest value")) -> RequestFrames:
+    """FastAPI dependency: a fresh RequestFrames for each request, ?latest=true narrows it to the last bar"""
+    return RequestFrames(last=1 if latest else None)
@@ -3,8 +3,15 @@ Stock screener service for filtering stocks by various criteria
 """
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
-import yfinance as yf
+from typing import List, Dict, Any, Optional
+from app.services.data_service import DataService
+from app.services.expressions import compile_expressions
+from app.services.indicator_engine import IndicatorEngine
+
+data_service = DataService()
+
+# Criteria that need get_stock_info rather than bars
+FUNDAMENTAL_CRITERIA = ("market_cap_min", "market_cap_max", "pe_ratio_max")
 
 
 class ScreenerService:
@@ -14,8 +21,7 @@ class ScreenerService:
     def get_stock_info(symbol: str) -> Dict[str, Any]:
         """Get comprehensive stock information"""
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            info = data_service.provider.info(symbol)
             
             return {
                 "symbol": symbol,
@@ -40,11 +46,18 @@ class ScreenerService:
     def calculate_rsi(symbol: str, period: int = 14) -> float:
         """Calculate RSI for a stock"""
         try:
-            data = yf.download(symbol, period="3mo", interval="1d", progress=False)
+            data = data_service.get_history(symbol, period="3mo", interval="1d")
             if data.empty:
                 return None
             
-            closes = data["Close"]
+            return ScreenerService.rsi_from_closes(data["Close"], period)
+        except:
+            return None
+    
+    @staticmethod
+    def rsi_from_closes(closes: pd.Series, period: int = 14) -> float:
+        """Latest RSI of a close series"""
+        try:
             delta = closes.diff()
             gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
             loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
@@ -60,12 +73,23 @@ class ScreenerService:
     def calculate_sma_50_200(symbol: str) -> Dict[str, float]:
         """Calculate 50 and 200 day SMAs"""
         try:
-            data = yf.download(symbol, period="1y", interval="1d", progress=False)
+            data = data_service.get_history(symbol, period="1y", interval="1d")
             if data.empty:
                 return {}
             
-            sma_50 = data["Close"].rolling(window=50).mean().iloc[-1]
-            sma_200 = data["Close"].rolling(window=200).mean().iloc[-1]
+            return ScreenerService.sma_50_200_from_closes(data["Close"])
+        except:
+            return {}
+    
+    @staticmethod
+    def sma_50_200_from_closes(closes: pd.Series) -> Dict[str, float]:
+        """Latest 50 and 200 bar SMAs of a close series"""
+        try:
+            if closes.empty:
+                return {}
+            
+            sma_50 = closes.rolling(window=50).mean().iloc[-1]
+            sma_200 = closes.rolling(window=200).mean().iloc[-1]
             
             return {
                 "sma_50": float(sma_50),
@@ -75,6 +99,63 @@ class ScreenerService:
         except:
             return {}
     
+    @staticmethod
+    def calculate_technicals(symbols: List[str], period: str = "1y",
+                             panel: Optional[pd.DataFrame] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Latest close, volume, RSI, 50/200 bar SMAs and ATR for many symbols at once
+        
+        Args:
+            symbols: Stock ticker symbols
+            period: History window to load when no panel is given
+            panel: A get_many() panel already holding the symbols' daily bars
+        
+        Every indicator is computed over a (bars x symbols) matrix in one
+        pass instead of a pandas pipeline per symbol. Symbols without bars
+        are left out.
+        """
+        if panel is None:
+            panel = data_service.get_many(symbols, period=period, interval="1d")
+        engine = IndicatorEngine.from_panel(panel, symbols)
+        if not engine.symbols:
+            return {}
+        
+        rsi = engine.latest(engine.rsi(14))
+        sma_50 = engine.latest(engine.sma(50))
+        sma_200 = engine.latest(engine.sma(200))
+        atr = engine.latest(engine.atr(14))
+        price = engine.latest(engine.source("close"))
+        volume = engine.latest(engine.source("volume")) if "volume" in engine.arrays else {}
+        
+        technicals = {}
+        for symbol in engine.symbols:
+            crossover = None
+            if sma_50[symbol] is not None and sma_200[symbol] is not None:
+                crossover = "bullish" if sma_50[symbol] > sma_200[symbol] else "bearish"
+            technicals[symbol] = {
+                "price": price[symbol],
+                "volume": volume.get(symbol),
+                "rsi": rsi[symbol],
+                "sma_50": sma_50[symbol],
+                "sma_200": sma_200[symbol],
+                "crossover": crossover,
+                "atr": atr[symbol]
+            }
+        return technicals
+    
+    @staticmethod
+    def evaluate_expression(expression: str, symbols: List[str], period: str = "1y",
+                            panel: Optional[pd.DataFrame] = None) -> Dict[str, bool]:
+        """Whether an expression holds on each symbol's latest bar, evaluated over all symbols at once"""
+        plan = compile_expressions({"match": expression})
+        if panel is None:
+            panel = data_service.get_many(symbols, period=period, interval="1d")
+        engine = IndicatorEngine.from_panel(panel, symbols)
+        if not engine.symbols or not len(engine):
+            return {}
+        latest = plan.evaluate(engine)["match"][-1]
+        return {symbol: bool(value) and not np.isnan(value) for symbol, value in zip(engine.symbols, latest)}
+    
     @staticmethod
     def screen_by_criteria(symbols: List[str], criteria: Dict[str, Any]) -> List[Dict]:
         """
@@ -90,60 +171,99 @@ class ScreenerService:
             "rsi_oversold": True,  # RSI < 30
             "rsi_overbought": True,  # RSI > 70
             "sma_crossover": "bullish",  # or "bearish"
-            "min_volume": 1000000
+            "min_volume": 1000000,
+            "expression": "rsi(close, 14) < 30 and close > sma(close, 200)"  # true on the latest bar
         }
+        
+        Raises ExpressionError for an invalid expression.
+        
+        The technical filters run first, on the batched panel; price and
+        volume come from its latest bar (or a batched quote for symbols it
+        lacks). get_stock_info is only called for the survivors, and only
+        when a market cap or P/E criterion needs fundamentals.
         """
         results = []
         
+        # One batched history download and one matrix pass cover RSI and SMA for every symbol
+        panel = data_service.get_many(symbols, period="1y", interval="1d")
+        technicals = ScreenerService.calculate_technicals(symbols, panel=panel)
+        expression_matches = None
+        if criteria.get("expression"):
+            expression_matches = ScreenerService.evaluate_expression(criteria["expression"], symbols, panel=panel)
+        
+        quotes = {}
+        unpriced = [symbol for symbol in symbols if technicals.get(symbol.upper(), {}).get("price") is None]
+        if unpriced:
+            quotes = data_service.get_many_quotes(unpriced)
+        
+        needs_info = any(criteria.get(key) for key in FUNDAMENTAL_CRITERIA)
+        
         for symbol in symbols:
             try:
-                stock_info = ScreenerService.get_stock_info(symbol)
-                if not stock_info:
+                symbol_technicals = technicals.get(symbol.upper(), {})
+                
+                if expression_matches is not None and not expression_matches.get(symbol.upper()):
                     continue
                 
-                # Check price range
-                if criteria.get("price_min"):
-                    if stock_info.get("price", 0) < criteria["price_min"]:
+                # Check RSI
+                rsi = symbol_technicals.get("rsi")
+                if rsi:
+                    if criteria.get("rsi_oversold") and rsi >= 30:
                         continue
-                if criteria.get("price_max"):
-                    if stock_info.get("price", 0) > criteria["price_max"]:
+                    if criteria.get("rsi_overbought") and rsi <= 70:
                         continue
                 
-                # Check market cap
-                if criteria.get("market_cap_min"):
-                    if stock_info.get("marketCap", 0) < criteria["market_cap_min"]:
+                # Check SMA crossover
+                sma_data = {key: symbol_technicals[key] for key in ("sma_50", "sma_200", "crossover")
+                            if symbol_technicals}
+                if criteria.get("sma_crossover"):
+                    if sma_data and sma_data.get("crossover") != criteria["sma_crossover"]:
                         continue
-                if criteria.get("market_cap_max"):
-                    if stock_info.get("marketCap", 0) > criteria["market_cap_max"]:
+                
+                price, volume = symbol_technicals.get("price"), symbol_technicals.get("volume")
+                if price is None:
+                    quote = quotes.get(symbol.upper(), {})
+                    if "error" in quote or "price" not in quote:
                         continue
+                    price, volume = quote["price"], quote.get("volume")
                 
-                # Check P/E ratio
-                if criteria.get("pe_ratio_max"):
-                    pe = stock_info.get("pe_ratio")
-                    if pe and pe > criteria["pe_ratio_max"]:
+                # Check price range
+                if criteria.get("price_min"):
+                    if price < criteria["price_min"]:
+                        continue
+                if criteria.get("price_max"):
+                    if price > criteria["price_max"]:
                         continue
                 
                 # Check volume
                 if criteria.get("min_volume"):
-                    if stock_info.get("volume", 0) < criteria["min_volume"]:
-                        continue
-                
-                # Check RSI
-                rsi = ScreenerService.calculate_rsi(symbol)
-                if rsi:
-                    if criteria.get("rsi_oversold") and rsi >= 30:
-                        continue
-                    if criteria.get("rsi_overbought") and rsi <= 70:
+                    if (volume or 0) < criteria["min_volume"]:
                         continue
                 
-                # Check SMA crossover
-                if criteria.get("sma_crossover"):
-                    sma_data = ScreenerService.calculate_sma_50_200(symbol)
-                    if sma_data and sma_data.get("crossover") != criteria["sma_crossover"]:
+                stock_info = {"symbol": symbol, "price": price, "volume": volume}
+                if needs_info:
+                    info = ScreenerService.get_stock_info(symbol)
+                    if not info:
                         continue
+                    
+                    # Check market cap
+                    if criteria.get("market_cap_min"):
+                        if info.get("marketCap", 0) < criteria["market_cap_min"]:
+                            continue
+                    if criteria.get("market_cap_max"):
+                        if info.get("marketCap", 0) > criteria["market_cap_max"]:
+                            continue
+                    
+                    # Check P/E ratio
+                    if criteria.get("pe_ratio_max"):
+                        pe = info.get("pe_ratio")
+                        if pe and pe > criteria["pe_ratio_max"]:
+                            continue
+                    
+                    stock_info = {**info, **stock_info}
                 
                 stock_info["rsi"] = rsi
-                stock_info.update(ScreenerService.calculate_sma_50_200(symbol))
+                stock_info.update(sma_data)
                 results.append(stock_info)
             
             except Exception as e:
@@ -0,0 +1,88 @@
+"""
+Vectorized serialization of OHLCV bars for API responses
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+ROWS = "rows"
+COLUMNAR = "columnar"
+FORMATS = (ROWS, COLUMNAR)
+
+
+def widen(values: np.ndarray) -> np.ndarray:
+    """
+    float64 copy of an array for output
+
+    float32 values (compact mode) are rounded to 8 significant digits, or 9
+    where 8 don't round-trip, so 187.13 stored as float32 serializes as
+    187.13 rather than 187.1300048828125 and converting back to float32
+    gives the stored value. Other arrays are returned as they are.
+    """
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        return values
+    wide = values.astype(np.float64)
+    with np.errstate(divide="ignore"):
+        magnitude = np.floor(np.log10(np.abs(wide)))
+    # Zeros, NaNs and infinities pass through unrounded
+    rounded = np.isfinite(magnitude)
+    out = wide.copy()
+    for digits in (8, 9):
+        scale = 10.0 ** (digits - 1 - magnitude[rounded])
+        out[rounded] = np.round(wide[rounded] * scale) / scale
+        rounded &= out.astype(np.float32) != values
+    return out
+
+
+def epoch_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    """Unix timestamps (seconds) of a datetime index, without touching each element"""
+    return pd.DatetimeIndex(index).as_unit("s").asi8
+
+
+def history_records(bars: pd.DataFrame) -> List[Dict]:
+    """Row format used by /api/stocks: one {"Date", "Open", ..., "Volume"} dict per bar"""
+    if bars.empty:
+        return []
+    frame = pd.DataFrame({
+        "Date": pd.DatetimeIndex(bars.index).strftime("%Y-%m-%d"),
+        "Open": widen(bars["Open"].to_numpy()).astype(np.float64, copy=False),
+        "High": widen(bars["High"].to_numpy()).astype(np.float64, copy=False),
+        "Low": widen(bars["Low"].to_numpy()).astype(np.float64, copy=False),
+        "Close": widen(bars["Close"].to_numpy()).astype(np.float64, copy=False),
+        "Volume": bars["Volume"].fillna(0).to_numpy(dtype=np.int64),
+    })
+    return frame.to_dict("records")
+
+
+def candle_columns(bars: pd.DataFrame) -> Dict[str, List]:
+    """Columnar format: parallel time/open/high/low/close/volume arrays"""
+    if bars.empty:
+        return {key: [] for key in ("time", "open", "high", "low", "close", "volume")}
+    return {
+        "time": epoch_seconds(bars.index).tolist(),
+        "open": widen(bars["Open"].to_numpy()).astype(np.float64, copy=False).tolist(),
+        "high": widen(bars["High"].to_numpy()).astype(np.float64, copy=False).tolist(),
+        "low": widen(bars["Low"].to_numpy()).astype(np.float64, copy=False).tolist(),
+        "close": widen(bars["Close"].to_numpy()).astype(np.float64, copy=False).tolist(),
+        "volume": bars["Volume"].fillna(0).to_numpy(dtype=np.float64).tolist(),
+    }
+
+
+def candle_records(bars: pd.DataFrame) -> List[Dict]:
+    """Row format used by the charting routes: one {"time", "open", ..., "volume"} dict per bar"""
+    if bars.empty:
+        return []
+    return columns_to_records(candle_columns(bars))
+
+
+def columns_to_records(columns: Dict[str, List]) -> List[Dict]:
+    """Turn a dict of parallel arrays into a list of row dicts"""
+    return pd.DataFrame(columns).to_dict("records")
+
+
+def count(data) -> int:
+    """Number of bars in either format"""
+    if isinstance(data, dict):
+        return len(data.get("time", []))
+    return len(data)
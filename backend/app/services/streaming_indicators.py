@@ -0,0 +1,383 @@
+"""
+Incremental indicators for live ticks
+"""
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, NamedTuple, Optional
+
+import pandas as pd
+
+from app.services.periods import INTERVAL_MINUTES
+
+NAN = float("nan")
+
+
+class Bar(NamedTuple):
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+def _finite(value: float) -> Optional[float]:
+    """JSON-safe value: NaN and infinities become None"""
+    return value if value is not None and math.isfinite(value) else None
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    """Division that returns NaN/inf like NumPy instead of raising"""
+    if denominator == 0:
+        if numerator == 0 or math.isnan(numerator):
+            return NAN
+        return math.copysign(math.inf, numerator)
+    return numerator / denominator
+
+
+# Constant-time building blocks. update(x, commit=False) evaluates the window
+# as if x were its newest value without changing state, which is how a
+# still-forming bar is previewed on every tick; commit=True appends x for good.
+
+class RollingMean:
+    """Mean of the last `window` values; NaN until full or while a NaN is inside"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.nans = 0
+
+    def update(self, x: float, commit: bool = False) -> float:
+        full = len(self.values) == self.window - 1
+        value = (self.total + x) / self.window if full and not self.nans and not math.isnan(x) else NAN
+        if commit:
+            self.values.append(x)
+            if math.isnan(x):
+                self.nans += 1
+            else:
+                self.total += x
+            if len(self.values) > self.window - 1:
+                old = self.values.popleft()
+                if math.isnan(old):
+                    self.nans -= 1
+                else:
+                    self.total -= old
+        return value
+
+
+class RollingVariance:
+    """Sample variance (ddof=1) of the last `window` values, by Welford's add/remove updates"""
+
+    RESYNC_EVERY = 1000
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.commits = 0
+
+    @staticmethod
+    def _add(count: int, mean: float, m2: float, x: float):
+        count += 1
+        delta = x - mean
+        mean += delta / count
+        return count, mean, m2 + delta * (x - mean)
+
+    @staticmethod
+    def _remove(count: int, mean: float, m2: float, x: float):
+        count -= 1
+        if count == 0:
+            return 0, 0.0, 0.0
+        delta = x - mean
+        mean -= delta / count
+        return count, mean, m2 - delta * (x - mean)
+
+    def update(self, x: float, commit: bool = False) -> float:
+        count, mean, m2 = self._add(len(self.values), self.mean, self.m2, x)
+        value = max(m2, 0.0) / (count - 1) if count == self.window and count > 1 else NAN
+        if commit:
+            self.values.append(x)
+            if len(self.values) > self.window - 1:
+                count, mean, m2 = self._remove(count, mean, m2, self.values.popleft())
+            self.mean, self.m2 = mean, m2
+            self.commits += 1
+            if self.commits % self.RESYNC_EVERY == 0:
+                # Rebuild from the window now and then so rounding can't accumulate
+                self.mean, self.m2, count = 0.0, 0.0, 0
+                for value_in_window in self.values:
+                    count, self.mean, self.m2 = self._add(count, self.mean, self.m2, value_in_window)
+        return value
+
+
+class RollingExtreme:
+    """Max (or min) of the last `window` values via a monotonic deque"""
+
+    def __init__(self, window: int, highest: bool = True):
+        self.window = window
+        self.highest = highest
+        self.candidates = deque()  # (position, value), best first
+        self.count = 0
+
+    def _better(self, a: float, b: float) -> bool:
+        return a >= b if self.highest else a <= b
+
+    def update(self, x: float, commit: bool = False) -> float:
+        value = NAN
+        if self.count >= self.window - 1:
+            value = x
+            if self.candidates and not self._better(x, self.candidates[0][1]):
+                value = self.candidates[0][1]
+        if commit and self.window > 1:
+            while self.candidates and self._better(x, self.candidates[-1][1]):
+                self.candidates.pop()
+            self.candidates.append((self.count, x))
+            while self.candidates[0][0] <= self.count - (self.window - 1):
+                self.candidates.popleft()
+        if commit:
+            self.count += 1
+        return value
+
+
+class Ema:
+    """pandas ewm(span).mean() with the default adjust=True weighting"""
+
+    def __init__(self, span: int):
+        self.decay = 1 - 2 / (span + 1)
+        self.numerator = 0.0
+        self.weights = 0.0
+
+    def update(self, x: float, commit: bool = False) -> float:
+        numerator = x + self.decay * self.numerator
+        weights = 1 + self.decay * self.weights
+        if commit:
+            self.numerator, self.weights = numerator, weights
+        return numerator / weights
+
+    def seed(self, value: float, count: int) -> None:
+        """Continue from `value`, the EMA of `count` committed values"""
+        self.weights = (1 - self.decay ** count) / (1 - self.decay)
+        self.numerator = value * self.weights
+
+
+# Indicators over bars, matching the IndicatorEngine definitions
+
+class StreamingIndicator(ABC):
+    """update(bar, commit) previews a forming bar, or commits a completed one"""
+
+    @abstractmethod
+    def update(self, bar: Bar, commit: bool = False):
+        """The indicator's value with `bar` as the latest bar"""
+
+
+class StreamingSMA(StreamingIndicator):
+    def __init__(self, window: int = 20):
+        self.mean = RollingMean(window)
+
+    def update(self, bar: Bar, commit: bool = False):
+        return self.mean.update(bar.close, commit)
+
+
+class StreamingEMA(StreamingIndicator):
+    def __init__(self, span: int = 12):
+        self.ema = Ema(span)
+
+    def update(self, bar: Bar, commit: bool = False):
+        return self.ema.update(bar.close, commit)
+
+
+class StreamingRSI(StreamingIndicator):
+    """Simple-average RSI; the first bar counts as a zero gain and loss, as in the engine"""
+
+    def __init__(self, period: int = 14):
+        self.gain = RollingMean(period)
+        self.loss = RollingMean(period)
+        self.prev_close: Optional[float] = None
+
+    def update(self, bar: Bar, commit: bool = False):
+        delta = bar.close - self.prev_close if self.prev_close is not None else 0.0
+        gain = self.gain.update(max(delta, 0.0), commit)
+        loss = self.loss.update(max(-delta, 0.0), commit)
+        if commit:
+            self.prev_close = bar.close
+        return 100 - _ratio(100, 1 + _ratio(gain, loss))
+
+
+class StreamingMACD(StreamingIndicator):
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast, self.slow, self.signal = Ema(fast), Ema(slow), Ema(signal)
+
+    def update(self, bar: Bar, commit: bool = False):
+        line = self.fast.update(bar.close, commit) - self.slow.update(bar.close, commit)
+        signal = self.signal.update(line, commit)
+        return {"macd": line, "signal": signal, "histogram": line - signal}
+
+
+class StreamingBollinger(StreamingIndicator):
+    def __init__(self, period: int = 20, std_dev: float = 2):
+        self.mean = RollingMean(period)
+        self.variance = RollingVariance(period)
+        self.std_dev = std_dev
+
+    def update(self, bar: Bar, commit: bool = False):
+        middle = self.mean.update(bar.close, commit)
+        std = math.sqrt(self.variance.update(bar.close, commit))
+        return {"upper": middle + std * self.std_dev, "middle": middle, "lower": middle - std * self.std_dev}
+
+
+class StreamingStochastic(StreamingIndicator):
+    def __init__(self, period: int = 14, smooth_k: int = 1, smooth_d: int = 3):
+        self.highest = RollingExtreme(period, highest=True)
+        self.lowest = RollingExtreme(period, highest=False)
+        self.smooth_k = RollingMean(smooth_k)
+        self.smooth_d = RollingMean(smooth_d)
+
+    def update(self, bar: Bar, commit: bool = False):
+        highest = self.highest.update(bar.high, commit)
+        lowest = self.lowest.update(bar.low, commit)
+        k = _ratio(100 * (bar.close - lowest), highest - lowest)
+        k_smooth = self.smooth_k.update(k, commit)
+        return {"k": k, "k_smooth": k_smooth, "d": self.smooth_d.update(k_smooth, commit)}
+
+
+class StreamingATR(StreamingIndicator):
+    def __init__(self, period: int = 14):
+        self.mean = RollingMean(period)
+        self.prev_close: Optional[float] = None
+
+    def update(self, bar: Bar, commit: bool = False):
+        true_range = NAN
+        if self.prev_close is not None:
+            true_range = max(bar.high - bar.low, abs(bar.high - self.prev_close), abs(bar.low - self.prev_close))
+        value = self.mean.update(true_range, commit)
+        if commit:
+            self.prev_close = bar.close
+        return value
+
+
+class StreamingOBV(StreamingIndicator):
+    def __init__(self):
+        self.obv = 0.0
+        self.prev_close: Optional[float] = None
+
+    def update(self, bar: Bar, commit: bool = False):
+        if self.prev_close is None:
+            obv = bar.volume
+        elif bar.close > self.prev_close:
+            obv = self.obv + bar.volume
+        elif bar.close < self.prev_close:
+            obv = self.obv - bar.volume
+        else:
+            obv = self.obv
+        if commit:
+            self.obv, self.prev_close = obv, bar.close
+        return obv
+
+
+class StreamingVWAP(StreamingIndicator):
+    """Rolling volume-weighted typical price"""
+
+    def __init__(self, window: int = 20):
+        self.price_volume = RollingMean(window)
+        self.volume = RollingMean(window)
+
+    def update(self, bar: Bar, commit: bool = False):
+        typical = (bar.high + bar.low + bar.close) / 3
+        return _ratio(self.price_volume.update(typical * bar.volume, commit), self.volume.update(bar.volume, commit))
+
+
+def default_indicators() -> Dict[str, StreamingIndicator]:
+    """The /api/indicators set plus ATR, OBV and VWAP, with the same parameters"""
+    return {
+        "sma_20": StreamingSMA(20),
+        "sma_50": StreamingSMA(50),
+        "ema_12": StreamingEMA(12),
+        "ema_26": StreamingEMA(26),
+        "rsi": StreamingRSI(14),
+        "macd": StreamingMACD(12, 26, 9),
+        "bollinger": StreamingBollinger(20, 2),
+        "stochastic": StreamingStochastic(14, 1, 3),
+        "atr": StreamingATR(14),
+        "obv": StreamingOBV(),
+        "vwap": StreamingVWAP(20),
+    }
+
+
+class IndicatorStream:
+    """
+    Live indicator values for one symbol
+
+    seed() replays history once: every bar but the last is committed and
+    the last becomes the forming bar. Each tick then revises the forming
+    bar and previews all indicators from it in O(1); when a tick belongs
+    to a later bar the forming bar is committed first.
+    """
+
+    def __init__(self, interval: str = "1d", indicators: Optional[Dict[str, StreamingIndicator]] = None):
+        if interval != "1d" and interval not in INTERVAL_MINUTES:
+            raise ValueError(f"Unsupported streaming interval: {interval}")
+        self.interval = interval
+        self.indicators = indicators if indicators is not None else default_indicators()
+        self.forming: Optional[Bar] = None
+        self.forming_at: Optional[pd.Timestamp] = None
+
+    def seed(self, bars: pd.DataFrame) -> None:
+        if bars.empty:
+            return
+        rows = bars[["Open", "High", "Low", "Close", "Volume"]].astype(float).itertuples(index=False, name=None)
+        for row in list(rows)[:-1]:
+            self._commit(Bar(*row))
+        self.forming = Bar(*bars[["Open", "High", "Low", "Close", "Volume"]].iloc[-1].astype(float))
+        self.forming_at = bars.index[-1]
+
+    def _commit(self, bar: Bar) -> None:
+        for indicator in self.indicators.values():
+            indicator.update(bar, commit=True)
+
+    def _bucket(self, at: pd.Timestamp) -> pd.Timestamp:
+        if self.forming_at is not None and self.forming_at.tzinfo is not None:
+            at = at.tz_convert(self.forming_at.tzinfo)
+        if self.interval == "1d":
+            return at.normalize()
+        return at.floor(f"{INTERVAL_MINUTES[self.interval]}min")
+
+    def on_bar(self, bar: Bar, at: Optional[pd.Timestamp] = None) -> None:
+        """Commit the forming bar and start a new one"""
+        if self.forming is not None:
+            self._commit(self.forming)
+        self.forming, self.forming_at = bar, at
+
+    def on_tick(self, price: float, volume: Optional[float] = None,
+                at: Optional[pd.Timestamp] = None) -> Dict:
+        """
+        Fold a trade or quote into the forming bar and return fresh values
+
+        volume is the forming bar's cumulative volume when known (a quote's
+        day volume for daily bars). A tick in a later bar only opens that bar
+        if the price moved, so a weekend or holiday re-quote of the last
+        close doesn't create an empty session.
+        """
+        at = at or pd.Timestamp.now(tz="UTC")
+        if self.forming is None:
+            self.on_bar(Bar(price, price, price, price, volume or 0.0), self._bucket(at))
+        elif self.forming_at is not None and self._bucket(at) > self.forming_at and price != self.forming.close:
+            self.on_bar(Bar(price, price, price, price, volume or 0.0), self._bucket(at))
+        else:
+            bar = self.forming
+            self.forming = Bar(bar.open, max(bar.high, price), min(bar.low, price), price,
+                               max(bar.volume, volume) if volume is not None else bar.volume)
+        return self.values()
+
+    def values(self) -> Dict:
+        """Every indicator previewed on the forming bar, JSON-ready"""
+        if self.forming is None:
+            return {}
+        result = {}
+        for name, indicator in self.indicators.items():
+            value = indicator.update(self.forming)
+            if isinstance(value, dict):
+                result[name] = {key: _finite(v) for key, v in value.items()}
+            else:
+                result[name] = _finite(value)
+        return result
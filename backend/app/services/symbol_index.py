@@ -0,0 +1,203 @@
+"""
+In-memory symbol master for fast stock search
+
+The bundled app/config/symbols.csv only lists large caps. For the full US
+market, download Nasdaq Trader's symbol directory
+
+    https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt
+    https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt
+
+and point SYMBOL_MASTER_PATH at both files, separated by os.pathsep (":" on
+Linux). They are read as-is, alongside symbol,name,exchange CSVs.
+"""
+import csv
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "symbols.csv"
+)
+
+# Exchange codes in Nasdaq Trader's otherlisted.txt
+DIRECTORY_EXCHANGES = {
+    "A": "NYSE American", "N": "NYSE", "P": "NYSE Arca", "Z": "Cboe BZX", "V": "IEX",
+}
+
+# Words too common in company names to help fuzzy matching
+NAME_STOPWORDS = {
+    "inc", "corp", "corporation", "company", "co", "the", "plc", "ltd", "group",
+    "holdings", "incorporated", "and", "of", "sa", "ag", "nv"
+}
+
+
+def _normalise(text: str) -> str:
+    return re.sub(r"[^a-z0-9 ]+", " ", text.lower()).strip()
+
+
+def _read_listings(f) -> List[Tuple[str, str, str]]:
+    """(symbol, name, exchange) rows of a symbol,name,exchange CSV or a Nasdaq Trader directory file"""
+    header = f.readline()
+    f.seek(0)
+    if "|" not in header:
+        return [(row["symbol"], row["name"], row.get("exchange", "")) for row in csv.DictReader(f)]
+
+    rows = []
+    for row in csv.DictReader(f, delimiter="|"):
+        symbol = row.get("Symbol") or row.get("ACT Symbol")
+        # The last line is "File Creation Time: ..." with empty fields
+        if not symbol or not row.get("Security Name") or row.get("Test Issue") == "Y":
+            continue
+        exchange = DIRECTORY_EXCHANGES.get(row["Exchange"], row["Exchange"]) if "Exchange" in row else "NASDAQ"
+        rows.append((symbol, row["Security Name"], exchange))
+    return rows
+
+
+def _trigrams(word: str) -> List[str]:
+    padded = f" {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class SymbolIndex:
+    """
+    Sorted indexes over a symbol master (symbol, name, exchange)
+
+    Symbol and name lookups are bisections into sorted key lists, so a
+    prefix query costs O(log n + results). Names are indexed from every word
+    boundary ("bank of america" is also found by "america"). When prefixes
+    don't fill the result list, a trigram index over name words supplies
+    fuzzy matches for typos.
+    """
+
+    def __init__(self, path: Optional[str] = None, miss_ttl: Optional[float] = None,
+                 max_misses: int = 10_000):
+        self.path = path or os.getenv("SYMBOL_MASTER_PATH") or DEFAULT_PATH
+        self.miss_ttl = miss_ttl if miss_ttl is not None else float(os.getenv("SYMBOL_MISS_TTL_SECONDS", "3600"))
+        self.max_misses = max_misses
+        self._misses: Dict[str, float] = {}
+        self.listings: List[Dict[str, str]] = []
+        self._by_symbol: Dict[str, int] = {}
+        self._symbol_keys: List[Tuple[str, int]] = []
+        self._name_keys: List[Tuple[str, int]] = []
+        self._trigrams: Dict[str, set] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            for path in self.path.split(os.pathsep):
+                try:
+                    with open(path, newline="") as f:
+                        for symbol, name, exchange in _read_listings(f):
+                            self._add(symbol, name, exchange, keep_sorted=False)
+                except FileNotFoundError:
+                    print(f"Symbol master not found at {path}")
+            self._symbol_keys.sort()
+            self._name_keys.sort()
+            print(f"Loaded {len(self.listings)} listings into the symbol index")
+            self._loaded = True
+
+    def _add(self, symbol: str, name: str, exchange: str, keep_sorted: bool = True) -> None:
+        """Index one listing; caller holds the lock. Bulk loads sort once at the end"""
+        symbol = symbol.upper().strip()
+        if not symbol or symbol in self._by_symbol:
+            return
+        listing_id = len(self.listings)
+        self.listings.append({"symbol": symbol, "name": name, "exchange": exchange})
+        self._by_symbol[symbol] = listing_id
+        add_key = insort if keep_sorted else list.append
+        add_key(self._symbol_keys, (symbol, listing_id))
+
+        words = _normalise(name).split()
+        for i in range(len(words)):
+            add_key(self._name_keys, (" ".join(words[i:]), listing_id))
+        for word in words:
+            if word not in NAME_STOPWORDS and len(word) > 2:
+                for trigram in _trigrams(word):
+                    self._trigrams.setdefault(trigram, set()).add(listing_id)
+
+    def add(self, symbol: str, name: str, exchange: str = "") -> None:
+        """Add a listing discovered at runtime"""
+        self._ensure_loaded()
+        with self._lock:
+            self._add(symbol, name, exchange)
+
+    def add_miss(self, symbol: str) -> None:
+        """Remember that upstream had no listing for a symbol, for miss_ttl seconds"""
+        with self._lock:
+            if len(self._misses) >= self.max_misses:
+                now = time.monotonic()
+                self._misses = {key: at for key, at in self._misses.items() if now - at < self.miss_ttl}
+                if len(self._misses) >= self.max_misses:
+                    self._misses.pop(next(iter(self._misses)))
+            self._misses[symbol.upper()] = time.monotonic()
+
+    def recently_missed(self, symbol: str) -> bool:
+        at = self._misses.get(symbol.upper())
+        return at is not None and time.monotonic() - at < self.miss_ttl
+
+    def get(self, symbol: str) -> Optional[Dict[str, str]]:
+        self._ensure_loaded()
+        listing_id = self._by_symbol.get(symbol.upper())
+        return dict(self.listings[listing_id]) if listing_id is not None else None
+
+    @staticmethod
+    def _prefix_range(keys: List[Tuple[str, int]], prefix: str, limit: int) -> List[int]:
+        ids = []
+        for key, listing_id in keys[bisect_left(keys, (prefix, -1)):]:
+            if not key.startswith(prefix) or len(ids) >= limit:
+                break
+            ids.append(listing_id)
+        return ids
+
+    def _fuzzy(self, query: str, limit: int) -> List[int]:
+        words = [w for w in query.split() if w not in NAME_STOPWORDS and len(w) > 2]
+        grams = [g for w in words for g in _trigrams(w)]
+        if not grams:
+            return []
+        hits = Counter()
+        for gram in grams:
+            hits.update(self._trigrams.get(gram, ()))
+        threshold = max(2, len(grams) // 2)
+        return [listing_id for listing_id, count in hits.most_common(limit) if count >= threshold]
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, str]]:
+        """Listings matching a query: exact symbol, symbol prefix, name prefix, then fuzzy name"""
+        self._ensure_loaded()
+        symbol_query = query.strip().upper()
+        name_query = _normalise(query)
+        if not symbol_query:
+            return []
+
+        ordered: List[int] = []
+        seen = set()
+
+        def take(ids: List[int]) -> bool:
+            for listing_id in ids:
+                if listing_id not in seen:
+                    seen.add(listing_id)
+                    ordered.append(listing_id)
+            return len(ordered) >= limit
+
+        exact = self._by_symbol.get(symbol_query)
+        done = take([exact] if exact is not None else [])
+        if not done:
+            done = take(self._prefix_range(self._symbol_keys, symbol_query, limit))
+        if not done and name_query:
+            done = take(self._prefix_range(self._name_keys, name_query, limit * 2))
+        if not done and len(name_query) >= 3:
+            take(self._fuzzy(name_query, limit))
+
+        return [dict(self.listings[listing_id]) for listing_id in ordered[:limit]]
+
+
+# Global symbol index instance
+symbol_index = SymbolIndex()
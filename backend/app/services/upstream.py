@@ -0,0 +1,36 @@
+"""
+Runs blocking upstream I/O off the event loop
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+UPSTREAM_MAX_WORKERS = int(os.getenv("UPSTREAM_MAX_WORKERS", "16"))
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "20"))
+
+_executor = ThreadPoolExecutor(max_workers=UPSTREAM_MAX_WORKERS, thread_name_prefix="upstream")
+
+
+class UpstreamTimeoutError(TimeoutError):
+    """An upstream call didn't finish within its timeout"""
+
+
+async def run_upstream(func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    Await a blocking call (yfinance, requests, ...) on the bounded upstream pool
+
+    The pool size caps how many upstream calls run at once; extra calls queue
+    instead of piling threads onto the host. A call that exceeds its timeout
+    raises UpstreamTimeoutError to the awaiting route. The worker thread can't
+    be interrupted, so it finishes in the background and its result is dropped.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+    timeout = UPSTREAM_TIMEOUT_SECONDS if timeout is None else timeout
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        raise UpstreamTimeoutError(f"Upstream call {getattr(func, '__name__', func)} timed out after {timeout}s")
+
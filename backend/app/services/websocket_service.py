@@ -1,13 +1,16 @@
 import asyncio
 import json
 import websockets
-from typing import Set, Dict
+from typing import Set, Dict, Optional
 from app.services.data_service import DataService
+from app.services.streaming_indicators import IndicatorStream
+from app.services.upstream import run_upstream, UpstreamTimeoutError
 
 class WebSocketService:
     def __init__(self):
         self.connections: Set[websockets.WebSocketServerProtocol] = set()
         self.subscriptions: Dict[str, Set[websockets.WebSocketServerProtocol]] = {}
+        self.indicator_streams: Dict[str, IndicatorStream] = {}
         self.data_service = DataService()
         
     async def register(self, websocket: websockets.WebSocketServerProtocol):
@@ -23,6 +26,7 @@ class WebSocketService:
             self.subscriptions[symbol].discard(websocket)
             if not self.subscriptions[symbol]:
                 del self.subscriptions[symbol]
+                self.indicator_streams.pop(symbol, None)
         print(f"Client disconnected. Total connections: {len(self.connections)}")
         
     async def subscribe(self, websocket: websockets.WebSocketServerProtocol, symbol: str):
@@ -31,14 +35,36 @@ class WebSocketService:
             self.subscriptions[symbol] = set()
         self.subscriptions[symbol].add(websocket)
         
+        if symbol not in self.indicator_streams:
+            await self.seed_indicators(symbol)
+        
         # Send initial quote
-        quote = self.data_service.get_real_time_quote(symbol)
+        quote = await run_upstream(self.data_service.get_real_time_quote, symbol)
         if "error" not in quote:
             await websocket.send(json.dumps({
                 'type': 'quote',
                 'symbol': symbol,
-                'data': quote
+                'data': quote,
+                'indicators': self.update_indicators(symbol, quote)
             }))
+    
+    async def seed_indicators(self, symbol: str):
+        """Replay a year of daily bars into the symbol's indicator stream, once per subscription"""
+        try:
+            bars = await run_upstream(self.data_service.get_history, symbol, "1y", "1d")
+        except UpstreamTimeoutError as e:
+            print(f"Indicator seed skipped for {symbol}: {e}")
+            return
+        stream = IndicatorStream("1d")
+        stream.seed(bars)
+        self.indicator_streams[symbol] = stream
+    
+    def update_indicators(self, symbol: str, quote: dict) -> Optional[dict]:
+        """Fold a quote into the symbol's indicator stream, O(1) per indicator"""
+        stream = self.indicator_streams.get(symbol)
+        if stream is None or quote.get("price") is None:
+            return None
+        return stream.on_tick(float(quote["price"]), quote.get("volume"))
             
     async def unsubscribe(self, websocket: websockets.WebSocketServerProtocol, symbol: str):
         """Unsubscribe from updates for a symbol"""
@@ -46,14 +72,16 @@ class WebSocketService:
             self.subscriptions[symbol].discard(websocket)
             if not self.subscriptions[symbol]:
                 del self.subscriptions[symbol]
+                self.indicator_streams.pop(symbol, None)
                 
-    async def broadcast_quote(self, symbol: str, quote_data: dict):
-        """Broadcast quote update to all subscribers"""
+    async def broadcast_quote(self, symbol: str, quote_data: dict, indicators: Optional[dict] = None):
+        """Broadcast quote update, with live indicator values when available, to all subscribers"""
         if symbol in self.subscriptions:
             message = json.dumps({
                 'type': 'quote',
                 'symbol': symbol,
-                'data': quote_data
+                'data': quote_data,
+                'indicators': indicators
             })
             
             # Send to all subscribers
@@ -98,10 +126,15 @@ class WebSocketService:
     async def start_price_updates(self):
         """Start periodic price updates for subscribed symbols"""
         while True:
-            for symbol in list(self.subscriptions.keys()):
-                quote = self.data_service.get_real_time_quote(symbol)
+            symbols = list(self.subscriptions.keys())
+            try:
+                quotes = await run_upstream(self.data_service.get_many_quotes, symbols)
+            except UpstreamTimeoutError as e:
+                print(f"Price update skipped: {e}")
+                quotes = {}
+            for symbol, quote in quotes.items():
                 if "error" not in quote:
-                    await self.broadcast_quote(symbol, quote)
+                    await self.broadcast_quote(symbol, quote, self.update_indicators(symbol, quote))
             
             await asyncio.sleep(30)  # Update every 30 seconds
 
@@ -0,0 +1,193 @@
+"""
+Micro-benchmarks for IndicatorService and AdvancedIndicatorsService
+
+Every indicator runs against synthetic OHLCV series of 1k, 100k and 1M bars
+generated in-process, so no network or bar store is needed. Reports the
+best time per call and the peak traced memory of one call, and compares
+them against a saved baseline.
+
+Usage (from backend/):
+    python -m benchmarks.indicators --save              # record a baseline
+    python -m benchmarks.indicators                     # compare, exit 1 on regression, 2 without a baseline
+    python -m benchmarks.indicators --sizes 1000,100000 --threshold 0.5
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.advanced_indicators import AdvancedIndicatorsService
+from app.services.indicator_cache import indicator_cache
+from app.services.indicator_engine import IndicatorEngine
+from app.services.indicator_service import IndicatorService
+from app.services.request_frames import RequestFrames
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "indicator_baseline.json")
+
+# Every standard IndicatorEngine group, as compute() names them
+ENGINE_GROUPS = ["sma_20", "sma_50", "sma_200", "ema_12", "ema_26", "rsi", "macd", "bollinger", "stochastic",
+                 "atr", "adx", "ichimoku", "vwap", "obv"]
+
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.0005
+MIN_PEAK_MB = 0.5
+
+
+def synthetic_bars(n: int, seed: int = 0) -> pd.DataFrame:
+    """Geometric Brownian motion OHLCV bars, one per minute, identical for a given (n, seed)"""
+    rng = np.random.default_rng(seed)
+    sigma = 0.3 / np.sqrt(252 * 390)
+    log_returns = sigma * rng.standard_normal(n)
+    close = 100 * np.exp(np.cumsum(log_returns))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    wick = np.abs(rng.standard_normal((2, n))) * 0.5 * sigma
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + wick[0]),
+        "Low": np.minimum(open_, close) * (1 - wick[1]),
+        "Close": close,
+        "Volume": np.round(rng.lognormal(10, 0.5, n)).astype(np.int64),
+    }, index=pd.date_range("2000-01-03 09:30", periods=n, freq="min", name="Date"))
+
+
+class SyntheticData:
+    """DataService stand-in that answers every symbol and window with one series"""
+
+    def __init__(self, bars: pd.DataFrame):
+        self.bars = bars
+
+    def get_history(self, symbol: str, period: str = "1y", interval: str = "1d", **kwargs) -> pd.DataFrame:
+        return self.bars
+
+    def get_window(self, symbol: str, period: str = "1mo", warmup: int = 0, interval: str = "1d",
+                   last: Optional[int] = None) -> pd.DataFrame:
+        bars = self.bars.copy(deep=False)
+        bars.attrs["warmup"] = 0
+        return bars
+
+
+def cases(bars: pd.DataFrame) -> List[Tuple[str, Callable[[], object]]]:
+    """(name, call) for every indicator; each call starts cold (fresh frames, empty cache)"""
+    service = IndicatorService()
+    close = bars["Close"].tolist()
+    high = bars["High"].tolist()
+    low = bars["Low"].tolist()
+    records = bars.reset_index().to_dict("records")
+    data = SyntheticData(bars)
+
+    def advanced(method: Callable, *args):
+        return lambda: method("BENCH", *args, frames=RequestFrames(service=data))
+
+    return [
+        ("IndicatorEngine.compute", lambda: IndicatorEngine.from_bars(bars, compact=False).compute(ENGINE_GROUPS)),
+        ("IndicatorEngine.obv", lambda: IndicatorEngine.from_bars(bars, compact=False).obv()),
+        ("IndicatorEngine.heikin_ashi", lambda: IndicatorEngine.from_bars(bars, compact=False).heikin_ashi()),
+        ("IndicatorService.calculate_sma", lambda: service.calculate_sma(close, 20)),
+        ("IndicatorService.calculate_ema", lambda: service.calculate_ema(close, 20)),
+        ("IndicatorService.calculate_rsi", lambda: service.calculate_rsi(close, 14)),
+        ("IndicatorService.calculate_macd", lambda: service.calculate_macd(close)),
+        ("IndicatorService.calculate_bollinger_bands", lambda: service.calculate_bollinger_bands(close, 20)),
+        ("IndicatorService.calculate_stochastic", lambda: service.calculate_stochastic(high, low, close)),
+        ("IndicatorService.calculate_indicators", lambda: service.calculate_indicators(bars)),
+        ("IndicatorService.calculate_all_indicators", lambda: service.calculate_all_indicators(records)),
+        ("AdvancedIndicatorsService.calculate_atr", advanced(AdvancedIndicatorsService.calculate_atr, 14)),
+        ("AdvancedIndicatorsService.calculate_adx", advanced(AdvancedIndicatorsService.calculate_adx, 14)),
+        ("AdvancedIndicatorsService.calculate_ichimoku", advanced(AdvancedIndicatorsService.calculate_ichimoku)),
+        ("AdvancedIndicatorsService.calculate_obv", advanced(AdvancedIndicatorsService.calculate_obv)),
+        ("AdvancedIndicatorsService.calculate_vwap", advanced(AdvancedIndicatorsService.calculate_vwap)),
+        ("AdvancedIndicatorsService.calculate_macd", advanced(AdvancedIndicatorsService.calculate_macd)),
+        ("AdvancedIndicatorsService.calculate_stochastic", advanced(AdvancedIndicatorsService.calculate_stochastic)),
+        ("AdvancedIndicatorsService.calculate_bollinger_bands",
+         advanced(AdvancedIndicatorsService.calculate_bollinger_bands)),
+    ]
+
+
+def measure(call: Callable[[], object], repeats: int) -> Dict[str, float]:
+    """Best wall time of `repeats` cold calls, and peak traced allocation of one more"""
+    best = float("inf")
+    for _ in range(repeats):
+        indicator_cache.clear()
+        started = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - started)
+
+    indicator_cache.clear()
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": best, "peak_mb": peak / 2 ** 20}
+
+
+def run(sizes: List[int], repeats: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for size in sizes:
+        bars = synthetic_bars(size)
+        for name, call in cases(bars):
+            key = f"{name}[{size}]"
+            results[key] = measure(call, repeats or (5 if size <= 100_000 else 2))
+            print(f"{key:<62} {results[key]['seconds'] * 1000:>10.2f} ms {results[key]['peak_mb']:>9.1f} MB")
+    return results
+
+
+def regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                threshold: float) -> List[str]:
+    """Cases slower, or peaking higher, than the baseline by more than `threshold` (0.25 = 25%)"""
+    found = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric, floor in (("seconds", MIN_SECONDS), ("peak_mb", MIN_PEAK_MB)):
+            before, after = baseline[key][metric], result[metric]
+            if after > before * (1 + threshold) and after - before > floor:
+                found.append(f"{key} {metric}: {before:.4g} -> {after:.4g} (+{(after / before - 1) * 100:.0f}%)")
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated bar counts")
+    parser.add_argument("--repeats", type=int, help="Timed calls per case (default 5, 2 above 100k bars)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown or memory growth over the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = run([int(size) for size in args.sizes.split(",")], args.repeats)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "machine": platform.machine(),
+                "results": results
+            }, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save first")
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    found = regressions(results, baseline, args.threshold)
+    for line in found:
+        print(f"REGRESSION {line}")
+    print(f"{len(found)} regression(s) over {args.threshold:.0%}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.controllers import auth, stocks, indicators, forecasts, watchlist, alerts, currency
+from fastapi.responses import JSONResponse
+from app.controllers import auth, stocks, indicators, forecasts, watchlist, alerts, currency, patterns
+from app.services.indicator_store import indicator_store
+from app.services.pattern_scan import pattern_scanner
+from app.services.upstream import UpstreamTimeoutError
+import asyncio
+import os
 import uvicorn
 
 # Try importing new controllers with error handling
@@ -50,6 +56,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(UpstreamTimeoutError)
+async def upstream_timeout_handler(request: Request, exc: UpstreamTimeoutError):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+@app.on_event("startup")
+async def start_indicator_precompute():
+    """Keep standard indicator columns next to the stored bars up to date"""
+    if os.getenv("PRECOMPUTE_INDICATORS", "0") == "1":
+        asyncio.create_task(indicator_store.run_forever())
+
+@app.on_event("startup")
+async def start_pattern_scan_pool():
+    """Spawn the pattern scan workers now rather than on the first scan, which would wait for their imports"""
+    if os.getenv("PATTERN_SCAN_PREWARM", "1") == "1":
+        pattern_scanner.start()
+
+@app.on_event("shutdown")
+async def stop_pattern_scan_pool():
+    pattern_scanner.shutdown()
+
 # Include routers with trailing slashes
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(stocks.router, prefix="/api/stocks", tags=["stocks"])
@@ -58,6 +84,7 @@ app.include_router(forecasts.router, prefix="/api/forecasts", tags=["forecasts"]
 app.include_router(watchlist.router, prefix="/api/watchlist", tags=["watchlist"])
 app.include_router(alerts.router, prefix="/api/alerts", tags=["alerts"])
 app.include_router(currency.router, prefix="/api/currency", tags=["currency"])
+app.include_router(patterns.router, prefix="/api/patterns", tags=["patterns"])
 
 # Include new routers if available
 if HAS_CHARTING:
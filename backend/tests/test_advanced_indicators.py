@@ -0,0 +1,66 @@
+"""
+AdvancedIndicatorsService series alignment and batches
+"""
+from typing import Optional
+
+import pandas as pd
+import pytest
+
+from app.services.advanced_indicators import AdvancedIndicatorsService
+from app.services.indicator_cache import indicator_cache
+from app.services.request_frames import RequestFrames
+from benchmarks.indicators import synthetic_bars
+
+DISPLAY = 120
+
+
+class WindowData:
+    """DataService stand-in: the last DISPLAY bars plus the asked-for warm-up before them"""
+
+    def __init__(self, bars: pd.DataFrame):
+        self.bars = bars
+
+    def get_history(self, symbol: str, period: str = "1y", interval: str = "1d", **kwargs) -> pd.DataFrame:
+        return self.bars.iloc[-DISPLAY:]
+
+    def get_window(self, symbol: str, period: str = "1mo", warmup: int = 0, interval: str = "1d",
+                   last: Optional[int] = None) -> pd.DataFrame:
+        display = last or DISPLAY
+        bars = self.bars.iloc[-(display + warmup):].copy()
+        bars.attrs["warmup"] = len(bars) - display
+        return bars
+
+
+@pytest.fixture
+def data():
+    indicator_cache.clear()
+    return WindowData(synthetic_bars(1_000, seed=8))
+
+
+def test_ichimoku_series_line_up_with_dates(data):
+    result = AdvancedIndicatorsService.calculate_ichimoku("TEST", frames=RequestFrames(service=data))
+    dates = result["dates"]
+    assert len(dates) == DISPLAY
+    for key in ("tenkan", "kijun", "senkou_a", "senkou_b", "chikou"):
+        assert len(result[key]) == len(dates), key
+
+    close = data.bars["Close"]
+    assert result["chikou"][-26:] == [None] * 26
+    for i, date in enumerate(dates[:-26]):
+        assert result["chikou"][i] == close.iloc[close.index.get_loc(date) + 26]
+
+
+def test_batch_leaves_callers_frames_alone(data):
+    frames = RequestFrames(service=data)
+    results = AdvancedIndicatorsService.calculate_batch("TEST", [{"name": "atr"}, {"name": "ichimoku"}],
+                                                        frames=frames)
+    assert frames.warmup == 0
+    assert results[0]["data"] == AdvancedIndicatorsService.calculate_atr("TEST", frames=RequestFrames(service=data))
+    assert results[1]["data"] == AdvancedIndicatorsService.calculate_ichimoku("TEST",
+                                                                              frames=RequestFrames(service=data))
+
+
+def test_batch_rejects_unknown_parameters(data):
+    with pytest.raises(ValueError):
+        AdvancedIndicatorsService.calculate_batch("TEST", [{"name": "atr", "params": {"window": 5}}],
+                                                  frames=RequestFrames(service=data))
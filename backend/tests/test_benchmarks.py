@@ -0,0 +1,15 @@
+"""
+Benchmark runner exit codes
+"""
+from benchmarks.indicators import main
+
+
+def test_compare_without_baseline_fails(tmp_path):
+    assert main(["--sizes", "300", "--repeats", "1", "--baseline", str(tmp_path / "missing.json")]) == 2
+
+
+def test_compare_against_saved_baseline(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    assert main(["--sizes", "300", "--repeats", "1", "--baseline", baseline, "--save"]) == 0
+    # A generous threshold keeps timing noise between the two runs from failing it
+    assert main(["--sizes", "300", "--repeats", "1", "--baseline", baseline, "--threshold", "100"]) == 0
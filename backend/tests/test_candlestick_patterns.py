@@ -0,0 +1,62 @@
+"""
+Candlestick pattern catalogue and bitmask decoding
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.candlestick_patterns import PATTERN_BITS, PATTERNS, Candles, decode, pattern_mask
+from benchmarks.indicators import synthetic_bars
+
+# A hammer-shaped candle: small body at the top, long lower shadow
+HAMMER = (100.0, 100.6, 97.0, 100.5)
+
+
+def _candles(closes, last):
+    """Plain one-point candles along `closes`, then `last` as (open, high, low, close)"""
+    rows = [(close, close + 0.2, close - 0.2, close + 0.1) for close in closes] + [last]
+    return Candles(*np.array(rows).T)
+
+
+def _matches(candles):
+    return decode(pattern_mask(candles))
+
+
+def test_hammer_needs_a_downtrend():
+    after_fall = _matches(_candles([110, 108, 106, 104, 102, 101], HAMMER))
+    assert 6 in after_fall.get("hammer", [])
+    assert 6 not in after_fall.get("hanging_man", [])
+
+
+def test_hanging_man_needs_an_uptrend():
+    after_rise = _matches(_candles([90, 92, 94, 96, 98, 99], HAMMER))
+    assert 6 in after_rise.get("hanging_man", [])
+    assert 6 not in after_rise.get("hammer", [])
+
+
+def test_hammer_and_hanging_man_never_coincide():
+    matches = _matches(Candles.from_bars(synthetic_bars(20_000, seed=10)))
+    assert matches["hammer"] and matches["hanging_man"]
+    assert not set(matches["hammer"]) & set(matches["hanging_man"])
+
+
+def test_decode_matches_each_pattern():
+    candles = Candles.from_bars(synthetic_bars(5_000, seed=11))
+    with np.errstate(invalid="ignore"):
+        expected = {pattern.name: np.flatnonzero(pattern.detect(candles)[100:]) + 100 for pattern in PATTERNS}
+    decoded = decode(pattern_mask(candles), start=100)
+    assert decoded.keys() == {name for name, indices in expected.items() if len(indices)}
+    for name, indices in decoded.items():
+        assert indices == expected[name].tolist()
+
+
+def test_bits_follow_catalogue_order():
+    assert list(PATTERN_BITS) == [pattern.name for pattern in PATTERNS]
+    assert len(PATTERNS) <= 64
+
+
+@pytest.mark.parametrize("bars", [0, 1, 3])
+def test_short_series(bars):
+    candles = Candles.from_bars(synthetic_bars(bars) if bars else pd.DataFrame(
+        {"Open": [], "High": [], "Low": [], "Close": []}))
+    assert len(pattern_mask(candles)) == bars
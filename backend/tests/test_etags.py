@@ -0,0 +1,50 @@
+"""
+Conditional GETs share the route's bars instead of reading them twice
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.controllers import indicators, stocks
+from app.services import request_frames
+from benchmarks.indicators import synthetic_bars
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    bars = synthetic_bars(300, seed=12)
+    calls = []
+
+    def get_history(symbol, period="1y", interval="1d", **kwargs):
+        calls.append((symbol, period, interval))
+        return bars
+
+    monkeypatch.setattr(request_frames.data_service, "get_history", get_history)
+    monkeypatch.setattr(stocks.data_service, "get_history", get_history)
+    monkeypatch.setattr(stocks.data_service.provider, "info", lambda symbol: {})
+    return calls
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(stocks.router, prefix="/api/stocks")
+    app.include_router(indicators.router, prefix="/api/indicators")
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", [
+    "/api/indicators/TEST?indicators=sma,rsi",
+    "/api/indicators/TEST/all",
+    "/api/indicators/TEST/expr?expr=close-sma(close,20)",
+    "/api/stocks/TEST",
+    "/api/stocks/TEST/history",
+    "/api/stocks/TEST/history?since=2026-01-01",
+])
+def test_one_read_per_request(reads, client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert len(reads) == 1
+
+    assert client.get(path, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert len(reads) == 2
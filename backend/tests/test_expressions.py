@@ -0,0 +1,102 @@
+"""
+Expression compilation, evaluation and JSON output
+"""
+import json
+
+import numpy as np
+import pytest
+
+from app.services.expressions import ExpressionError, compile_expressions, to_json
+from app.services.indicator_engine import IndicatorEngine
+
+OPEN = [10.0, 11.0, 12.0, 11.5, 11.5]
+CLOSE = [11.0, 10.5, 12.5, 11.0, 11.5]
+HIGH = [11.5, 11.2, 12.8, 11.9, 11.5]
+VOLUME = [100, 300, 200, 50, 80]
+
+
+def evaluate(text, compact=False):
+    engine = IndicatorEngine(CLOSE, high=HIGH, low=OPEN, open=OPEN, volume=VOLUME, compact=compact)
+    return compile_expressions([text]).evaluate(engine)[text]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_negated_comparison(compact):
+    assert evaluate("-(close > open)", compact).tolist() == [-1.0, 0.0, -1.0, 0.0, 0.0]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_comparison_arithmetic(compact):
+    assert evaluate("(close > open) - (open > close)", compact).tolist() == [1.0, -1.0, 1.0, -1.0, 0.0]
+    assert evaluate("(close > open) + (close > open)", compact).tolist() == [2.0, 0.0, 2.0, 0.0, 0.0]
+
+
+def test_compact_volume_goes_negative():
+    assert evaluate("-volume", compact=True).tolist() == [-v for v in VOLUME]
+    assert evaluate("volume - 2 * volume", compact=True).tolist() == [-v for v in VOLUME]
+
+
+def test_comparisons_stay_boolean():
+    values = evaluate("close > open and volume > 90")
+    assert values.dtype == bool
+    assert to_json(values) == [True, False, True, False, False]
+
+
+def test_shared_subexpressions_are_one_node():
+    plan = compile_expressions({"a": "ema(close, 12) - ema(close, 26)", "b": "ema(close, 26) - ema(close, 12)",
+                                "c": "ema(close, 12) + 1"})
+    assert sum(node.op == "ema" for node in plan.nodes) == 2
+
+
+@pytest.mark.parametrize("text", [
+    "close ** 2",
+    "__import__('os').system('true')",
+    "close.__class__",
+    "open[0]",
+    "lambda: 1",
+    "sma(close, 0)",
+    "sma(close, window=5)",
+    "sma(close, 2.5)",
+    "unknown(close)",
+    "price",
+    "close +",
+    "x" * 501,
+])
+def test_rejected(text):
+    with pytest.raises(ExpressionError):
+        compile_expressions([text])
+
+
+@pytest.mark.parametrize("text", ["close / 0", "close / (high - high)", "-close / 0", "0 / (high - high)"])
+def test_non_finite_values_serialize_as_none(text):
+    values = to_json(evaluate(text))
+    assert values == [None] * len(CLOSE)
+    json.dumps(values, allow_nan=False)
+
+
+def test_to_json_widens_compact_values():
+    values = to_json(np.array([1.25, np.nan, np.inf], dtype=np.float32))
+    assert values == [1.25, None, None]
+    assert type(values[0]) is float
+
+
+@pytest.mark.parametrize("text", [
+    "not close < sma(close, 3)",
+    "not (close < sma(close, 3) or close > sma(close, 3))",
+    "close != sma(close, 3)",
+    "sma(close, 3) and close",
+    "not crossover(close, sma(close, 3))",
+])
+def test_conditions_are_false_during_warm_up(text):
+    assert evaluate(text)[:2].tolist() == [False, False]
+
+
+def test_missing_conditions_are_nan_in_arithmetic():
+    values = evaluate("(close > sma(close, 3)) * 2")
+    assert np.isnan(values[:2]).all()
+    assert values[2:].tolist() == [2.0, 0.0, 0.0]
+
+
+def test_not_after_warm_up():
+    # sma(close, 3) = 11.333.., 11.333.., 11.666..
+    assert evaluate("not close < sma(close, 3)").tolist() == [False, False, True, False, False]
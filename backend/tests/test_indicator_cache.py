@@ -0,0 +1,127 @@
+"""
+IndicatorCache extensions against recomputing from scratch
+"""
+import numpy as np
+import pytest
+
+from app.services import indicator_cache as cache_module
+from app.services.bar_store import BarStore
+from app.services.indicator_cache import CACHEABLE, IndicatorCache
+from app.services.indicator_engine import IndicatorEngine
+from benchmarks.indicators import synthetic_bars
+
+PARAMS = {
+    "sma": (20,),
+    "ema": (12,),
+    "rsi": (14,),
+    "macd": (12, 26, 9),
+    "bollinger": (20, 2),
+    "stochastic": (14, 1, 3),
+    "atr": (14,),
+    "obv": (),
+    "vwap": (20,),
+}
+
+
+def _get(cache, bars, name):
+    return cache.get("TEST", "max", "5m", name, PARAMS[name], bars, IndicatorEngine.from_bars(bars, compact=False))
+
+
+def _assert_same(actual, expected):
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            _assert_same(actual[key], expected[key])
+        return
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_every_cacheable_indicator_is_covered():
+    assert PARAMS.keys() == CACHEABLE.keys()
+
+
+@pytest.mark.parametrize("name", list(PARAMS))
+def test_extension_matches_recompute(name):
+    bars = synthetic_bars(3_000, seed=4)
+    cache = IndicatorCache()
+    _get(cache, bars.iloc[:2_000], name)
+
+    # A revised last bar plus appended ones, then one more append on the warm stream
+    revised = bars.iloc[:2_010].copy()
+    revised.iloc[-1, revised.columns.get_loc("Close")] *= 1.001
+    for window in (bars.iloc[:2_005], revised, bars.iloc[:2_020]):
+        expected = getattr(IndicatorEngine.from_bars(window, compact=False), name)(*PARAMS[name])
+        _assert_same(_get(cache, window, name), expected)
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["extensions"], stats["hits"]) == (1, 3, 0)
+    assert stats["hit_rate"] == 0
+
+
+def test_hit_rate_counts_exact_hits_only():
+    bars = synthetic_bars(500, seed=5)
+    cache = IndicatorCache()
+    _get(cache, bars.iloc[:400], "sma")
+    _get(cache, bars.iloc[:400], "sma")
+    _get(cache, bars.iloc[:401], "sma")
+    stats = cache.stats()
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+    assert stats["extension_rate"] == pytest.approx(1 / 3)
+
+
+def test_earlier_start_is_a_miss():
+    bars = synthetic_bars(500, seed=6)
+    cache = IndicatorCache()
+    _get(cache, bars.iloc[1:401], "ema")
+    _get(cache, bars.iloc[:401], "ema")
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.parametrize("name", list(PARAMS))
+def test_window_moving_forward_extends(name):
+    """A daily "1y" window starts a bar later each session; the new bar extends yesterday's entry"""
+    bars = synthetic_bars(300, seed=13)
+    cache = IndicatorCache()
+    _get(cache, bars.iloc[:252], name)
+    today = _get(cache, bars.iloc[1:253], name)
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["extensions"]) == (1, 1)
+    # Computed over the series the entry started with, then sliced to the window
+    expected = getattr(IndicatorEngine.from_bars(bars.iloc[:253], compact=False), name)(*PARAMS[name])
+    if isinstance(expected, dict):
+        expected = {key: values[1:] for key, values in expected.items()}
+    else:
+        expected = expected[1:]
+    _assert_same(today, expected)
+
+
+def test_windows_of_stored_bars_share_their_entries(tmp_path):
+    bars = synthetic_bars(1_000, seed=14)
+    store = BarStore(str(tmp_path), compact=False)
+    store.write("TEST", "1d", bars)
+    cache = IndicatorCache(store=store)
+    full = IndicatorEngine.from_bars(bars, compact=False)
+
+    for last in (250, 120):
+        values = cache.view("TEST", f"{last} bars", "1d", bars.iloc[-last:]).ema(26)
+        np.testing.assert_allclose(values, full.ema(26)[-last:], rtol=1e-12)
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 1)
+
+
+def test_streams_never_replay_history(monkeypatch):
+    replayed = []
+    bar_rows = cache_module._bar_rows
+
+    def counting(bars, start, stop):
+        replayed.append(stop - start)
+        return bar_rows(bars, start, stop)
+
+    monkeypatch.setattr(cache_module, "_bar_rows", counting)
+    bars = synthetic_bars(20_001, seed=7)
+    for name in PARAMS:
+        cache = IndicatorCache()
+        _get(cache, bars.iloc[:20_000], name)
+        _get(cache, bars, name)
+    # Warm-ups replay at most a LOOKBACK, extensions only the revised and new bars
+    assert max(replayed) <= 20
@@ -0,0 +1,233 @@
+"""
+IndicatorEngine against the pandas implementations it replaced
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.indicator_engine import IndicatorEngine
+from benchmarks.indicators import synthetic_bars
+
+TOLERANCE = dict(rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def assert_matches(actual, expected):
+    expected = np.asarray(expected, dtype=np.float64)
+    # NaNs (warm-up bars, gaps) have to sit at exactly the same positions
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, **TOLERANCE)
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return synthetic_bars(5_000, seed=1)
+
+
+@pytest.fixture
+def engine(bars):
+    return IndicatorEngine.from_bars(bars, compact=False)
+
+
+def _true_range(df):
+    return np.maximum(df["High"] - df["Low"], np.maximum(abs(df["High"] - df["Close"].shift()),
+                                                         abs(df["Low"] - df["Close"].shift())))
+
+
+def obv_loop(close, volume):
+    """The row-by-row OBV the engine replaced"""
+    obv = np.zeros(len(close))
+    obv[0] = volume[0]
+    for i in range(1, len(close)):
+        if close[i] > close[i - 1]:
+            obv[i] = obv[i - 1] + volume[i]
+        elif close[i] < close[i - 1]:
+            obv[i] = obv[i - 1] - volume[i]
+        else:
+            obv[i] = obv[i - 1]
+    return obv
+
+
+def heikin_ashi_loop(df):
+    """The row-by-row Heikin Ashi open the engine replaced"""
+    ha_close = ((df["Open"] + df["High"] + df["Low"] + df["Close"]) / 4).to_numpy()
+    ha_open = np.zeros(len(df))
+    ha_open[0] = (df["Open"].iloc[0] + df["Close"].iloc[0]) / 2
+    for i in range(1, len(df)):
+        ha_open[i] = (ha_open[i - 1] + ha_close[i - 1]) / 2
+    return ha_open, ha_close
+
+
+@pytest.mark.parametrize("window", [1, 20, 200])
+def test_sma(engine, bars, window):
+    assert_matches(engine.sma(window), bars["Close"].rolling(window=window).mean())
+
+
+@pytest.mark.parametrize("span", [12, 26])
+def test_ema(engine, bars, span):
+    assert_matches(engine.ema(span), bars["Close"].ewm(span=span).mean())
+
+
+def test_rsi(engine, bars):
+    delta = bars["Close"].diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    assert_matches(engine.rsi(14), 100 - 100 / (1 + gain / loss))
+
+
+def test_macd(engine, bars):
+    line = bars["Close"].ewm(span=12).mean() - bars["Close"].ewm(span=26).mean()
+    signal = line.ewm(span=9).mean()
+    result = engine.macd(12, 26, 9)
+    assert_matches(result["macd"], line)
+    assert_matches(result["signal"], signal)
+    assert_matches(result["histogram"], line - signal)
+
+
+def test_bollinger(engine, bars):
+    sma = bars["Close"].rolling(window=20).mean()
+    std = bars["Close"].rolling(window=20).std()
+    result = engine.bollinger(20, 2)
+    assert_matches(result["upper"], sma + std * 2)
+    assert_matches(result["middle"], sma)
+    assert_matches(result["lower"], sma - std * 2)
+
+
+def test_stochastic(engine, bars):
+    lowest = bars["Low"].rolling(window=14).min()
+    highest = bars["High"].rolling(window=14).max()
+    k = 100 * (bars["Close"] - lowest) / (highest - lowest)
+    k_smooth = k.rolling(window=3).mean()
+    result = engine.stochastic(14, 3, 3)
+    assert_matches(result["k"], k)
+    assert_matches(result["k_smooth"], k_smooth)
+    assert_matches(result["d"], k_smooth.rolling(window=3).mean())
+
+
+def test_atr(engine, bars):
+    tr = _true_range(bars)
+    assert_matches(engine.true_range(), tr)
+    assert_matches(engine.atr(14), tr.rolling(window=14).mean())
+
+
+def test_adx(engine, bars):
+    up = bars["High"].diff()
+    down = -bars["Low"].diff()
+    plus_dm = np.where((up > down) & (up > 0), up, 0)
+    minus_dm = np.where((down > up) & (down > 0), down, 0)
+    atr = _true_range(bars).rolling(window=14).mean()
+    plus_di = 100 * (pd.Series(plus_dm, index=bars.index).rolling(window=14).mean() / atr)
+    minus_di = 100 * (pd.Series(minus_dm, index=bars.index).rolling(window=14).mean() / atr)
+    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
+    result = engine.adx(14)
+    assert_matches(result["plus_di"], plus_di)
+    assert_matches(result["minus_di"], minus_di)
+    assert_matches(result["adx"], dx.rolling(window=14).mean())
+
+
+def test_ichimoku(engine, bars):
+    def midpoint(window):
+        return (bars["High"].rolling(window=window).max() + bars["Low"].rolling(window=window).min()) / 2
+
+    result = engine.ichimoku()
+    assert_matches(result["tenkan"], midpoint(9))
+    assert_matches(result["kijun"], midpoint(26))
+    assert_matches(result["senkou_a"], ((midpoint(9) + midpoint(26)) / 2).shift(26))
+    assert_matches(result["senkou_b"], midpoint(52).shift(26))
+    assert_matches(result["chikou"], bars["Close"].shift(-26))
+
+
+def test_vwap(engine, bars):
+    typical = (bars["High"] + bars["Low"] + bars["Close"]) / 3
+    expected = (typical * bars["Volume"]).rolling(window=20).sum() / bars["Volume"].rolling(window=20).sum()
+    assert_matches(engine.vwap(20), expected)
+
+
+def test_obv_matches_loop(engine, bars):
+    assert_matches(engine.obv(), obv_loop(bars["Close"].to_numpy(), bars["Volume"].to_numpy()))
+
+
+def test_obv_flat_closes():
+    # Unchanged closes carry the previous OBV; the first bar starts at its volume
+    close = [10.0, 10.0, 11.0, 11.0, 10.5, 10.5]
+    volume = [100, 200, 300, 400, 500, 600]
+    engine = IndicatorEngine(close, volume=volume, compact=False)
+    assert engine.obv().tolist() == obv_loop(close, volume).tolist() == [100, 100, 400, 400, -100, -100]
+
+
+def test_heikin_ashi_matches_loop(engine, bars):
+    ha_open, ha_close = heikin_ashi_loop(bars)
+    result = engine.heikin_ashi()
+    assert_matches(result["open"], ha_open)
+    assert_matches(result["close"], ha_close)
+    assert_matches(result["high"], np.maximum(np.maximum(ha_open, ha_close), bars["High"]))
+    assert_matches(result["low"], np.minimum(np.minimum(ha_open, ha_close), bars["Low"]))
+
+
+def test_gaps_match_pandas(bars):
+    close = bars["Close"].copy()
+    close.iloc[[0, 100, 101, 2_500]] = np.nan
+    engine = IndicatorEngine(close.to_numpy(), compact=False)
+    assert_matches(engine.sma(20), close.rolling(window=20).mean())
+    assert_matches(engine.ema(12), close.ewm(span=12).mean())
+    assert_matches(engine.rolling_std(20), close.rolling(window=20).std())
+
+
+def test_panel_columns_match_single_series():
+    a, b = synthetic_bars(300, seed=2), synthetic_bars(300, seed=3)
+    engine = IndicatorEngine(np.column_stack([a["Close"], b["Close"]]), compact=False)
+    for column, frame in enumerate((a, b)):
+        assert_matches(engine.rsi(14)[:, column], IndicatorEngine(frame["Close"], compact=False).rsi(14))
+        assert_matches(engine.macd()["signal"][:, column],
+                       IndicatorEngine(frame["Close"], compact=False).macd()["signal"])
+
+
+def test_short_series():
+    engine = IndicatorEngine([1.0, 2.0, 3.0], high=[1.5, 2.5, 3.5], low=[0.5, 1.5, 2.5], compact=False)
+    assert np.isnan(engine.sma(20)).all()
+    assert np.isnan(engine.atr(14)).all()
+    assert np.isnan(engine.ichimoku()["senkou_b"]).all()
+
+
+
+def _ragged_panel():
+    """Three symbols: a late listing, one with missing days mid-series, one full history"""
+    bars = {symbol: synthetic_bars(600, seed=seed) for seed, symbol in enumerate(["LATE", "GAPS", "FULL"], 20)}
+    bars["LATE"] = bars["LATE"].iloc[250:]
+    gaps = bars["GAPS"].copy()
+    gaps.iloc[[100, 101, 102, 340, 599 - 5], :] = np.nan
+    bars["GAPS"] = gaps
+    return pd.concat(bars, axis=1, sort=True)
+
+
+@pytest.mark.parametrize("call", [
+    lambda engine: engine.sma(50),
+    lambda engine: engine.ema(26),
+    lambda engine: engine.rsi(14),
+    lambda engine: engine.macd()["signal"],
+    lambda engine: engine.atr(14),
+    lambda engine: engine.stochastic(14, 3, 3)["d"],
+    lambda engine: engine.obv(),
+], ids=["sma", "ema", "rsi", "macd", "atr", "stochastic", "obv"])
+def test_panel_matches_each_symbol_alone(call):
+    panel = _ragged_panel()
+    engine = IndicatorEngine.from_panel(panel, ["late", "GAPS", "FULL", "NONE"], compact=False)
+    assert engine.symbols == ["LATE", "GAPS", "FULL"]
+
+    values = call(engine)
+    for column, symbol in enumerate(engine.symbols):
+        alone = call(IndicatorEngine.from_bars(panel[symbol].dropna(), compact=False))
+        # Right-aligned: the symbol's own series ends on the last row, NaN above its first bar
+        assert_matches(values[-len(alone):, column], alone)
+        assert np.isnan(values[:-len(alone), column]).all()
+
+
+def test_calculate_technicals_matches_each_symbol_alone():
+    from app.services.screener_service import ScreenerService
+    panel = _ragged_panel()
+    technicals = ScreenerService.calculate_technicals(["LATE", "GAPS", "FULL"], panel=panel)
+    for symbol in ("LATE", "GAPS", "FULL"):
+        alone = IndicatorEngine.from_bars(panel[symbol].dropna(), compact=False)
+        assert technicals[symbol]["rsi"] == pytest.approx(alone.rsi(14)[-1], rel=1e-6)
+        assert technicals[symbol]["sma_200"] == pytest.approx(alone.sma(200)[-1], rel=1e-6)
+        assert technicals[symbol]["atr"] == pytest.approx(alone.atr(14)[-1], rel=1e-6)
+        assert technicals[symbol]["price"] == panel[symbol]["Close"].dropna().iloc[-1]
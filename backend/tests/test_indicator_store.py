@@ -0,0 +1,83 @@
+"""
+Precomputed indicator columns and the version responses are tagged with
+"""
+import asyncio
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from app.services import upstream
+from app.services.bar_store import BarStore
+from app.services.indicator_engine import IndicatorEngine
+from app.services.indicator_store import IndicatorStore
+from benchmarks.indicators import synthetic_bars
+
+
+@pytest.fixture
+def store(tmp_path):
+    bars = synthetic_bars(600, seed=9)
+    bars.index = bars.index.tz_localize("America/New_York")
+    bar_store = BarStore(str(tmp_path), compact=False)
+    bar_store.write("TEST", "1d", bars)
+    return IndicatorStore(bar_store)
+
+
+def test_precomputed_columns_match_full_history(store):
+    assert store.materialize("TEST")
+    assert not store.materialize("TEST")
+    bars = store.bars.read("TEST", "1d")
+    window = bars.iloc[-250:]
+    engine = store.engine(window, "TEST")
+    full = IndicatorEngine.from_bars(bars, compact=False)
+    np.testing.assert_allclose(engine.ema(26), full.ema(26)[-250:], rtol=1e-12)
+    np.testing.assert_allclose(engine.macd()["signal"], full.macd()["signal"][-250:], rtol=1e-12)
+    with pytest.raises(KeyError):
+        engine.sma(7)
+
+
+def test_version_follows_the_source(store):
+    bars = store.bars.read("TEST", "1d")
+    window = bars.iloc[-250:]
+    assert store.version(window, "TEST") == "window"
+
+    store.materialize("TEST")
+    stored = store.version(window, "TEST")
+    assert stored.startswith("stored@")
+    # Same bars, different numbers: the window computation has a shorter EMA warm-up
+    assert store.engine(window, "TEST").ema(26)[0] != IndicatorEngine.from_bars(window, compact=False).ema(26)[0]
+
+    # A bar the columns haven't seen yet falls back to the window
+    appended = bars.iloc[[-1]].copy()
+    appended.index = appended.index + (bars.index[-1] - bars.index[-2])
+    store.bars.append("TEST", "1d", appended)
+    newer = store.bars.read("TEST", "1d").iloc[-250:]
+    assert store.version(newer, "TEST") == "window"
+
+    store.materialize("TEST")
+    os.utime(store.path("TEST", "1d"), (1, 1))
+    assert store.version(newer, "TEST") not in ("window", stored)
+
+
+def test_background_job_skips_the_upstream_pool(store, monkeypatch):
+    threads = []
+    materialize = store.materialize
+
+    def recording(symbol, interval="1d"):
+        result = materialize(symbol, interval)
+        threads.append(threading.current_thread().name)
+        return result
+
+    async def run_once():
+        task = asyncio.create_task(store.run_forever())
+        while not threads:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    monkeypatch.setattr(store, "materialize", recording)
+    monkeypatch.setattr(store, "symbols", lambda interval="1d": ["TEST"])
+    monkeypatch.setattr(upstream, "UPSTREAM_TIMEOUT_SECONDS", 0)
+    asyncio.run(run_once())
+    assert threads[0].startswith("indicator-precompute")
+    assert store.read("TEST") is not None
@@ -0,0 +1,80 @@
+"""
+/api/patterns/scan streaming, filtering and summary counts
+"""
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.controllers import patterns
+from app.services.bar_store import BarStore
+from app.services.pattern_scan import PatternScanner, scan_chunk
+from benchmarks.indicators import synthetic_bars
+
+RESULTS = [
+    {"symbol": "AAA", "date": "2026-10-16", "candlestick": {"doji": ["2026-10-16"]}},
+    {"symbol": "BBB", "date": "2026-10-16", "candlestick": {}},
+    {"symbol": "CCC", "error": "No stored bars"},
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def scan(symbols, *args, **kwargs):
+        for result in RESULTS:
+            yield result
+
+    monkeypatch.setattr(patterns.pattern_scanner, "scan", scan)
+    app = FastAPI()
+    app.include_router(patterns.router, prefix="/api/patterns")
+    return TestClient(app)
+
+
+def _scan(client, query):
+    response = client.get(f"/api/patterns/scan?symbols=AAA&symbols=BBB&symbols=CCC{query}")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return lines[:-1], lines[-1]
+
+
+def test_matches_only_keeps_errors(client):
+    results, summary = _scan(client, "")
+    assert [result["symbol"] for result in results] == ["AAA", "CCC"]
+    assert (summary["scanned"], summary["matched"], summary["errors"]) == (3, 1, 1)
+
+
+def test_everything_counts_only_real_matches(client):
+    results, summary = _scan(client, "&matches_only=false")
+    assert [result["symbol"] for result in results] == ["AAA", "BBB", "CCC"]
+    assert (summary["matched"], summary["errors"]) == (1, 1)
+
+
+def test_rejects_unknown_names(client):
+    assert client.get("/api/patterns/scan?detectors=nope").status_code == 400
+    assert client.get("/api/patterns/scan?patterns=nope").status_code == 400
+
+
+def test_pool_scans_stored_bars(tmp_path):
+    store = BarStore(str(tmp_path), compact=False)
+    bars = synthetic_bars(300, seed=16)
+    bars.index = pd.bdate_range("2025-06-02", periods=len(bars), tz="America/New_York", name="Date")
+    store.write("AAA", "1d", bars)
+    options = dict(interval="1d", period="max", detectors=["candlestick", "support_resistance"],
+                   patterns=None, lookback=100)
+
+    async def collect(scanner):
+        return [result async for result in scanner.scan(["AAA", "NONE"], **options)]
+
+    scanner = PatternScanner(store, workers=1)
+    try:
+        scanner.start()
+        results = asyncio.run(collect(scanner))
+    finally:
+        scanner.shutdown()
+
+    expected = scan_chunk(store.root, ["AAA", "NONE"], *options.values())
+    assert sorted(results, key=lambda result: result["symbol"]) == expected
+    assert expected[0]["candlestick"] and expected[1] == {"symbol": "NONE", "error": "No stored bars"}
@@ -0,0 +1,52 @@
+"""
+Support/resistance detection against the per-index loop it replaced
+"""
+import numpy as np
+import pytest
+
+from app.services.pattern_service import PatternService
+
+
+def support_resistance_loop(prices, window=20):
+    """The original O(n * window) implementation"""
+    prices_array = np.array(prices)
+
+    def strength(level, tolerance=0.02):
+        return sum(1 for price in prices_array if abs(price - level) / level <= tolerance)
+
+    support_levels, resistance_levels = [], []
+    for i in range(window, len(prices_array) - window):
+        if prices_array[i] == min(prices_array[i - window:i + window + 1]):
+            support_levels.append({"level": prices_array[i], "index": i, "strength": strength(prices_array[i])})
+        if prices_array[i] == max(prices_array[i - window:i + window + 1]):
+            resistance_levels.append({"level": prices_array[i], "index": i, "strength": strength(prices_array[i])})
+    return {"support": support_levels[-5:], "resistance": resistance_levels[-5:]}
+
+
+def _series(rng):
+    n = int(rng.integers(10, 400))
+    prices = 100 + np.cumsum(rng.normal(0, 1, n))
+    # Coarse rounding makes ties, within windows and between levels
+    prices = np.round(prices, int(rng.integers(0, 2)))
+    if rng.random() < 0.3:
+        # Prices exactly on a level's 2% tolerance edge
+        prices[rng.integers(0, n, 5)] = prices[rng.integers(0, n)] * 1.02
+    return prices
+
+
+def test_matches_loop_on_random_series():
+    rng = np.random.default_rng(23)
+    service = PatternService()
+    mismatches = 0
+    for _ in range(300):
+        prices = _series(rng)
+        window = int(rng.integers(1, 25))
+        if service.detect_support_resistance(prices.tolist(), window) != support_resistance_loop(prices, window):
+            mismatches += 1
+    assert mismatches == 0
+
+
+@pytest.mark.parametrize("n", [0, 5, 41])
+def test_short_series(n):
+    prices = [100.0 + i % 3 for i in range(n)]
+    assert PatternService().detect_support_resistance(prices) == support_resistance_loop(prices)
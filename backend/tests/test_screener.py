@@ -0,0 +1,46 @@
+"""
+ScreenerService filters over a batched panel
+"""
+import pandas as pd
+import pytest
+
+from app.services import screener_service
+from app.services.screener_service import ScreenerService
+from benchmarks.indicators import synthetic_bars
+
+
+@pytest.fixture
+def info_calls(monkeypatch):
+    bars = {symbol: synthetic_bars(300, seed=seed) for seed, symbol in enumerate(["AAA", "BBB", "CCC"])}
+    panel = pd.concat(bars, axis=1)
+    calls = []
+
+    def get_stock_info(symbol):
+        calls.append(symbol)
+        return {"symbol": symbol, "name": f"{symbol} Inc", "price": 0, "marketCap": 2e9, "pe_ratio": 20}
+
+    monkeypatch.setattr(screener_service.data_service, "get_many", lambda *args, **kwargs: panel)
+    monkeypatch.setattr(screener_service.data_service, "get_many_quotes",
+                        lambda symbols: {symbol.upper(): {"error": "no quote"} for symbol in symbols})
+    monkeypatch.setattr(ScreenerService, "get_stock_info", staticmethod(get_stock_info))
+    return calls, bars
+
+
+def test_price_and_volume_come_from_the_panel(info_calls):
+    calls, bars = info_calls
+    price = bars["BBB"]["Close"].iloc[-1]
+    results = ScreenerService.screen_by_criteria(["AAA", "BBB", "CCC", "ZZZ"],
+                                                 {"price_min": price, "price_max": price})
+    assert [result["symbol"] for result in results] == ["BBB"]
+    assert results[0]["price"] == price
+    assert results[0]["volume"] == bars["BBB"]["Volume"].iloc[-1]
+    assert calls == []
+
+
+def test_fundamentals_only_for_survivors(info_calls):
+    calls, bars = info_calls
+    price = bars["BBB"]["Close"].iloc[-1]
+    results = ScreenerService.screen_by_criteria(["AAA", "BBB", "CCC"],
+                                                 {"price_min": price, "price_max": price, "pe_ratio_max": 25})
+    assert calls == ["BBB"]
+    assert results[0]["name"] == "BBB Inc" and results[0]["price"] == price
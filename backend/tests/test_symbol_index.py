@@ -0,0 +1,65 @@
+"""
+Symbol master loading and the upstream lookups stock search falls back to
+"""
+import os
+
+import pytest
+
+from app.services import data_service as data_module
+from app.services.data_service import DataService
+from app.services.symbol_index import SymbolIndex
+
+NASDAQ_LISTED = """Symbol|Security Name|Market Category|Test Issue|Financial Status|Round Lot Size|ETF|NextShares
+AAPL|Apple Inc. - Common Stock|Q|N|N|100|N|N
+ZAZZT|Tick Pilot Test Stock Class A Common Stock|G|Y|N|100|N|N
+File Creation Time: 1016202622:01|||||||
+"""
+
+OTHER_LISTED = """ACT Symbol|Security Name|Exchange|CQS Symbol|ETF|Round Lot Size|Test Issue|NASDAQ Symbol
+BAC|Bank of America Corporation Common Stock|N|BAC|N|100|N|BAC
+SPY|SPDR S&P 500 ETF Trust|P|SPY|Y|100|N|SPY
+File Creation Time: 1016202622:01|||||||
+"""
+
+
+def test_reads_nasdaq_trader_directory(tmp_path):
+    paths = []
+    for name, text in (("nasdaqlisted.txt", NASDAQ_LISTED), ("otherlisted.txt", OTHER_LISTED)):
+        path = tmp_path / name
+        path.write_text(text)
+        paths.append(str(path))
+    index = SymbolIndex(os.pathsep.join(paths))
+
+    assert index.get("AAPL")["exchange"] == "NASDAQ"
+    assert index.get("BAC")["exchange"] == "NYSE"
+    assert index.get("SPY")["exchange"] == "NYSE Arca"
+    assert index.get("ZAZZT") is None
+    assert len(index.listings) == 3
+    assert index.search("america")[0]["symbol"] == "BAC"
+
+
+class CountingProvider:
+    def __init__(self):
+        self.calls = 0
+
+    def info(self, symbol):
+        self.calls += 1
+        return {}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    master = tmp_path / "symbols.csv"
+    master.write_text("symbol,name,exchange\nAAPL,Apple Inc.,NASDAQ\n")
+    monkeypatch.setattr(data_module, "symbol_index", SymbolIndex(str(master), miss_ttl=60))
+    return DataService(provider=CountingProvider())
+
+
+def test_unknown_tickers_are_looked_up_once(service):
+    assert service.search_stocks("QQQZ") == []
+    assert service.search_stocks("qqqz") == []
+    assert service.provider.calls == 1
+
+    data_module.symbol_index.miss_ttl = 0
+    service.search_stocks("QQQZ")
+    assert service.provider.calls == 2
@@ -0,0 +1,89 @@
+"""
+Coarser timeframes aligned to the base bars as of each bar's close
+"""
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.controllers import indicators
+from app.services.indicator_service import IndicatorService
+from app.services.periods import asof_positions, resample_bars
+from benchmarks.indicators import synthetic_bars
+
+GOOD_FRIDAY = pd.Timestamp("2026-04-03", tz="America/New_York")
+
+
+def _daily(start, end, seed=15, holidays=()):
+    days = pd.bdate_range(start, end, tz="America/New_York").drop(list(holidays))
+    bars = synthetic_bars(len(days), seed=seed)
+    bars.index = pd.DatetimeIndex(days, name="Date")
+    return bars
+
+
+def _weeks(bars):
+    weekly = resample_bars(bars, "1wk")
+    return weekly, asof_positions(bars.index, weekly.index)
+
+
+def test_weekly_values_wait_for_the_week_to_close():
+    bars = _daily("2026-03-02", "2026-03-27")
+    weekly, positions = _weeks(bars)
+
+    def closes(position):
+        """Last daily bar of a week"""
+        if position + 1 == len(weekly):
+            return bars.index[-1]
+        return bars.index[bars.index < weekly.index[position + 1]][-1]
+
+    assert (positions[:4] == -1).all()
+    for day, position in zip(bars.index[4:], positions[4:]):
+        # The latest week that has closed by this day's close
+        assert closes(position) <= day
+        assert position + 1 == len(weekly) or closes(position + 1) > day
+
+
+def test_holiday_short_week_closes_on_its_last_session():
+    bars = _daily("2026-03-23", "2026-04-10", holidays=[GOOD_FRIDAY])
+    weekly, positions = _weeks(bars)
+    by_day = dict(zip(bars.index.strftime("%Y-%m-%d"), positions))
+    # Week of 2026-03-30 ends on Thursday 04-02
+    assert by_day["2026-04-01"] == by_day["2026-03-31"] == 0
+    assert by_day["2026-04-02"] == 1
+    assert by_day["2026-04-06"] == 1
+
+
+def test_forming_last_week_counts_at_the_latest_bar():
+    bars = _daily("2026-03-23", "2026-04-07")
+    weekly, positions = _weeks(bars)
+    assert len(weekly) == 3
+    # Monday 04-06 still shows the previous week; Tuesday, the latest bar, the forming one
+    assert positions[-2] == 1
+    assert positions[-1] == 2
+
+
+def test_weekly_indicator_matches_weekly_bars():
+    bars = _daily("2025-01-06", "2026-04-07", holidays=[GOOD_FRIDAY])
+    service = IndicatorService()
+    result = service.calculate_timeframes(bars, ["1d", "1wk"], ["rsi"])
+    weekly, positions = _weeks(bars)
+    rsi = service.calculate_indicators(weekly, ["rsi"])["rsi"]
+    assert len(result["1wk"]["rsi"]) == len(bars)
+    for value, position in zip(result["1wk"]["rsi"], positions):
+        if position < 0:
+            assert value is None
+        else:
+            assert value == pytest.approx(rsi[position], rel=1e-6)
+
+
+def test_unknown_indicators_are_rejected(monkeypatch):
+    bars = _daily("2026-01-05", "2026-04-07")
+    with pytest.raises(ValueError):
+        IndicatorService().calculate_timeframes(bars, ["1wk"], ["rsi", "nope"])
+
+    monkeypatch.setattr(indicators.RequestFrames, "bars", lambda self, *args, **kwargs: bars)
+    app = FastAPI()
+    app.include_router(indicators.router, prefix="/api/indicators")
+    response = TestClient(app).get("/api/indicators/TEST/timeframes?timeframes=1d,1wk&indicators=rsi,nope")
+    assert response.status_code == 400
+    assert "nope" in response.json()["detail"]
@@ -0,0 +1,26 @@
+"""
+Upstream timeouts surface as 504s rather than the routes' generic 500s
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.controllers import screener, stocks
+from app.services.upstream import UpstreamTimeoutError
+from main import upstream_timeout_handler
+
+
+async def timed_out(func, *args, **kwargs):
+    raise UpstreamTimeoutError(f"{func.__name__} timed out")
+
+
+def test_timeouts_skip_the_catch_all(monkeypatch):
+    monkeypatch.setattr(screener, "run_upstream", timed_out)
+    monkeypatch.setattr(stocks, "run_upstream", timed_out)
+    app = FastAPI()
+    app.add_exception_handler(UpstreamTimeoutError, upstream_timeout_handler)
+    app.include_router(screener.router)
+    app.include_router(stocks.router, prefix="/api/stocks")
+    client = TestClient(app)
+
+    assert client.get("/api/screener/stock-info/AAPL").status_code == 504
+    assert client.get("/api/stocks/search?query=apple").status_code == 504